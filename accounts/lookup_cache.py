@@ -0,0 +1,147 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import upstream
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.025
+LOCK_TTL = 30
+
+_caches = []
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _refresh_pool() -> ThreadPoolExecutor:
+    # Separate from upstream's fetch pool: a refresh may itself fan out there and wait.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "LOOKUP_REFRESH_WORKERS", 4), thread_name_prefix="lookup-refresh"
+            )
+    return _pool
+
+
+class LookupCache:
+    """Stale-while-revalidate cache for upstream lookups in one key namespace.
+
+    Entries are fresh for ``ttl`` (``negative_ttl`` for None, i.e. "not found"),
+    jittered by ``LOOKUP_TTL_JITTER`` so keys filled together don't expire
+    together, and are served stale for ``LOOKUP_STALE_TTL`` more seconds while a
+    single background refresh runs. On a miss only the request holding the
+    per-key lock calls the upstream; the others wait for its result.
+
+    ``version`` is part of every key: bump it when the cached value's shape
+    changes and entries written by older code are never read back.
+    """
+
+    def __init__(self, namespace: str, negative_ttl: float | None = None, version: int | None = None):
+        self.namespace = namespace
+        self.negative_ttl = negative_ttl
+        self.version = version
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        _caches.append(self)
+
+    def key(self, ident) -> str:
+        if self.version is None:
+            return f"{self.namespace}:{ident}"
+        return f"{self.namespace}:v{self.version}:{ident}"
+
+    def _count(self, event: str):
+        with self._lock:
+            self.counts[event] += 1
+
+    def _acquire(self, key: str):
+        token = uuid.uuid4().hex
+        return token if cache.add(f"{key}:lock", token, LOCK_TTL) else None
+
+    def _release(self, key: str, token: str):
+        if cache.get(f"{key}:lock") == token:
+            cache.delete(f"{key}:lock")
+
+    def _store(self, key: str, value, ttl: float):
+        if value is None:
+            ttl = getattr(settings, "LOOKUP_NEGATIVE_TTL", 60) if self.negative_ttl is None else self.negative_ttl
+        jitter = getattr(settings, "LOOKUP_TTL_JITTER", 0.1)
+        fresh = ttl * random.uniform(1 - jitter, 1 + jitter)
+        cache.set(key, (value, time.time() + fresh), fresh + getattr(settings, "LOOKUP_STALE_TTL", 600))
+
+    def _refresh(self, key: str, token: str, loader, ttl: float):
+        try:
+            value = loader()
+            self._store(key, value, ttl)
+            return value
+        finally:
+            self._release(key, token)
+
+    def _refresh_in_background(self, key: str, token: str, loader, ttl: float):
+        try:
+            self._refresh(key, token, loader, ttl)
+        except Exception:
+            self._count("refresh_errors")
+            log.warning("Background refresh of %s failed; still serving the stale value", key, exc_info=True)
+
+    def get(self, ident, loader, ttl: float, deadline: float | None = None):
+        """Cached ``loader()`` for ``ident``. With a ``deadline`` (time.monotonic())
+        a miss raises TimeoutError once it passes; the load keeps going and fills
+        the cache. Loader errors on a miss propagate and are not cached."""
+        key = self.key(ident)
+        waiting = False
+        while True:
+            entry = cache.get(key)
+            if entry is not None and time.time() < entry[1]:
+                self._count("negative_hits" if entry[0] is None else "hits")
+                return entry[0]
+            token = self._acquire(key)
+            if token:
+                latest = cache.get(key)
+                if latest is not None and time.time() < latest[1]:
+                    # Refreshed between our read and taking the lock.
+                    self._release(key, token)
+                    continue
+
+            if entry is not None:
+                if token:
+                    _refresh_pool().submit(self._refresh_in_background, key, token, loader, ttl)
+                self._count("stale")
+                return entry[0]
+            if token:
+                self._count("misses")
+                if deadline is None:
+                    return self._refresh(key, token, loader, ttl)
+                return upstream.wait(_refresh_pool().submit(self._refresh, key, token, loader, ttl), deadline)
+            # Someone else is loading this key: wait for their entry rather than calling out too.
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{key} is still loading")
+            if not waiting:
+                self._count("coalesced")
+                waiting = True
+            time.sleep(POLL_SECONDS)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        served = sum(counts.get(k, 0) for k in ("hits", "negative_hits", "stale", "misses"))
+        return {
+            **{k: counts.get(k, 0) for k in ("hits", "negative_hits", "stale", "misses", "coalesced", "refresh_errors")},
+            "hit_rate": round((served - counts.get("misses", 0)) / served, 3) if served else 0.0,
+        }
+
+
+def stats() -> dict:
+    return {c.namespace: c.stats() for c in _caches}
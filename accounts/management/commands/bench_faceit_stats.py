@@ -0,0 +1,81 @@
+import pickle
+import random
+import time
+import tracemalloc
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.services import compact_faceit_stats
+
+MAPS = ("de_mirage", "de_inferno", "de_nuke", "de_ancient", "de_anubis", "de_vertigo", "de_dust2",
+        "de_overpass", "de_train", "cs_office", "cs_italy", "de_cache", "de_tuscan", "de_thera")
+MAP_STATS = ("Matches", "Wins", "Win Rate %", "Kills", "Deaths", "Assists", "K/D Ratio", "Average K/D Ratio",
+             "Headshots", "Average Headshots %", "Total Headshots %", "MVPs", "Average MVPs", "Triple Kills",
+             "Quadro Kills", "Penta Kills", "Average Triple Kills", "Average Quadro Kills", "Average Penta Kills",
+             "Rounds", "K/R Ratio", "Average K/R Ratio", "Average Kills", "Average Deaths", "Average Assists")
+
+
+def fake_payload(maps: int, rng: random.Random) -> dict:
+    """A stats payload shaped like Faceit's /players/{id}/stats/cs2 answer."""
+    def stats():
+        return {
+            name: f"{rng.uniform(0, 100):.2f}" if ("Average" in name or "Ratio" in name or "%" in name)
+            else str(rng.randint(1, 2000))
+            for name in MAP_STATS
+        }
+
+    segments = [
+        {
+            "type": "Map", "mode": "5v5", "label": f"{MAPS[i % len(MAPS)]}{'' if i < len(MAPS) else i}",
+            "img_small": f"https://distribution.faceit-cdn.net/images/{rng.getrandbits(128):032x}.jpeg",
+            "img_regular": f"https://distribution.faceit-cdn.net/images/{rng.getrandbits(128):032x}.jpeg",
+            "stats": stats(),
+        }
+        for i in range(maps)
+    ]
+    return {
+        "player_id": f"{rng.getrandbits(128):032x}",
+        "game_id": "cs2",
+        "lifetime": {
+            **stats(),
+            "Recent Results": [str(rng.randint(0, 1)) for _ in range(5)],
+            "Longest Win Streak": "9",
+            "Current Win Streak": "1",
+        },
+        "segments": segments,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares the cached size and per-view cost of raw Faceit stats payloads and their compact form"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--maps", type=int, default=20)
+        parser.add_argument("--players", type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        payloads = [fake_payload(options["maps"], rng) for _ in range(options["players"])]
+        local_limit = settings.CACHES["default"].get("OPTIONS", {}).get("LOCAL_MAX_VALUE_BYTES")
+
+        self.stdout.write(f"{'form':>8} {'pickled B':>10} {'resident B':>11} {'view us':>9} {'local':>6}")
+        for label, values, on_view in (
+            ("raw", payloads, compact_faceit_stats),
+            ("compact", [compact_faceit_stats(p) for p in payloads], lambda stats: stats),
+        ):
+            blobs = [pickle.dumps(v, pickle.HIGHEST_PROTOCOL) for v in values]
+            pickled = sum(map(len, blobs)) / len(blobs)
+
+            tracemalloc.start()
+            loaded = [pickle.loads(b) for b in blobs]
+            resident = tracemalloc.get_traced_memory()[0] / len(blobs)
+            tracemalloc.stop()
+            del loaded
+
+            # What a profile view pays per cache hit: unpickle, then shape for the template.
+            started = time.perf_counter()
+            for blob in blobs:
+                on_view(pickle.loads(blob))
+            view_us = (time.perf_counter() - started) * 1e6 / len(blobs)
+
+            fits = "-" if local_limit is None else ("yes" if pickled <= local_limit else "no")
+            self.stdout.write(f"{label:>8} {pickled:>10.0f} {resident:>11.0f} {view_us:>9.1f} {fits:>6}")
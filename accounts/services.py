@@ -5,24 +5,37 @@ from django.core.cache import cache
 from urllib.parse import urlparse
 import re
 import hashlib
+from typing import NamedTuple
+from . import upstream
+from .lookup_cache import LookupCache
+from .upstream import CircuitOpen, faceit, steam
 log = logging.getLogger(__name__)
 
 BASE = "https://open.faceit.com/data/v4"
 HEADERS = {"Authorization": f"Bearer {settings.FACEIT_API_KEY}"}
 
-def _get(url, params=None):
-    r = requests.get(url, headers=HEADERS, params=params, timeout=8)
+def _get(url, params=None, endpoint=None):
+    r = faceit.get(url, params=params, headers=HEADERS, endpoint=endpoint)
     if r.status_code == 404:
         return None
     r.raise_for_status()
     return r.json()
 
-def get_faceit_profile_by_steam(steam_id64: str):
-    for game in ("cs2", "csgo"):
+FACEIT_GAMES = ("cs2", "csgo")
+
+def get_faceit_profile_by_steam(steam_id64: str, deadline: float | None = None):
+    # Both games are probed at once; cs2 still wins when both know the player.
+    probes = {
+        game: upstream.submit(_get, f"{BASE}/players", params={"game": game, "game_player_id": steam_id64}, endpoint="players")
+        for game in FACEIT_GAMES
+    }
+    for game, probe in probes.items():
         try:
-            data = _get(f"{BASE}/players", params={"game": game, "game_player_id": steam_id64})
+            data = upstream.wait(probe, deadline)
             if data and data.get("player_id"):
                 data["_matched_game"] = game
+                for other in probes.values():
+                    other.cancel()
                 return data
         except requests.HTTPError as e:
             if e.response is not None and e.response.status_code == 404:
@@ -30,6 +43,8 @@ def get_faceit_profile_by_steam(steam_id64: str):
             else:
                 log.warning(f"Faceit lookup failed for {steam_id64} ({game}): {e}")
                 continue
+        except (CircuitOpen, TimeoutError):
+            raise
         except Exception:
             log.exception("Faceit lookup error")
     return None
@@ -37,53 +52,110 @@ def get_faceit_profile_by_steam(steam_id64: str):
 def get_faceit_stats(player_id: str):
 
     try:
-        data = _get(f"{BASE}/players/{player_id}/stats/cs2")
+        data = _get(f"{BASE}/players/{player_id}/stats/cs2", endpoint="players/stats")
         if data:
             return data
     except requests.HTTPError:
         pass
-    return _get(f"{BASE}/players/{player_id}/stats/csgo")
+    return _get(f"{BASE}/players/{player_id}/stats/csgo", endpoint="players/stats")
+
+class Lifetime(NamedTuple):
+    matches: int | None
+    kd_avg: float | None
+    winrate: float | None
+
+class MapStats(NamedTuple):
+    name: str
+    matches: int
+    winrate: float | None
+    kd: float | None
+
+class FaceitStats(NamedTuple):
+    lifetime: Lifetime
+    maps: tuple[MapStats, ...]
+
+# Bump whenever Lifetime/MapStats/FaceitStats change: it is part of the cache key.
+FACEIT_STATS_SCHEMA = 1
+MAX_MAPS = 12
+EMPTY_FACEIT_STATS = FaceitStats(Lifetime(None, None, None), ())
+MAP_SEGMENT_TYPES = ("map", "maps", "csgo_map", "cs2_map")
+
+def _to_float(x):
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return None
 
-def get_faceit_profile_by_steam_cached(steam_id64: str, ttl=300):
-    key = f"faceit:profile:{steam_id64}"
-    _MISSING = object()
-    cached = cache.get(key, _MISSING)
-    if cached is not _MISSING:
-        return cached
-    data = get_faceit_profile_by_steam(steam_id64)
-    cache.set(key, data, ttl)
-    return data
+def _to_int(x):
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_maps(stats_raw):
+    maps = []
+    for seg in (stats_raw or {}).get("segments") or []:
+        if (seg.get("type") or "").lower() not in MAP_SEGMENT_TYPES:
+            continue
+
+        label = seg.get("label") or seg.get("mode") or seg.get("map") or ""
+        name = label.replace("de_", "").replace("cs_", "").strip().capitalize() or "—"
+
+        st = seg.get("stats") or {}
+        matches = _to_int(st.get("Matches"))
+        kd = (_to_float(st.get("Average K/D Ratio"))
+              or _to_float(st.get("K/D Ratio"))
+              or _to_float(st.get("K/D")))
+        if matches:
+            maps.append(MapStats(name, matches, _to_float(st.get("Win Rate %")), kd))
+
+    maps.sort(key=lambda m: m.matches, reverse=True)
+    return tuple(maps[:MAX_MAPS])
+
+def compact_faceit_stats(stats_raw):
+    """The parts of a Faceit stats payload the profile page shows: lifetime
+    numbers and the most played maps, parsed once instead of on every view."""
+    if stats_raw is None:
+        return None
+    lifetime = stats_raw.get("lifetime") or {}
+    return FaceitStats(
+        Lifetime(
+            _to_int(lifetime.get("Matches")),
+            _to_float(lifetime.get("Average K/D Ratio")),
+            _to_float(lifetime.get("Win Rate %")),
+        ),
+        _parse_maps(stats_raw),
+    )
+
+faceit_profiles = LookupCache("faceit:profile")
+faceit_stats = LookupCache("faceit:stats", version=FACEIT_STATS_SCHEMA)
+steam_profiles = LookupCache("steam:profile")
+
+def get_faceit_profile_by_steam_cached(steam_id64: str, ttl=300, deadline: float | None = None):
+    return faceit_profiles.get(steam_id64, lambda: get_faceit_profile_by_steam(steam_id64), ttl, deadline=deadline)
 
 def get_faceit_stats_cached(player_id: str, ttl=300):
-    key = f"faceit:stats:{player_id}"
-    _MISSING = object()
-    cached = cache.get(key, _MISSING)
-    if cached is not _MISSING:
-        return cached
-    data = get_faceit_stats(player_id)
-    cache.set(key, data, ttl)
-    return data
+    """``FaceitStats`` for the player, or None when Faceit has no stats."""
+    return faceit_stats.get(player_id, lambda: compact_faceit_stats(get_faceit_stats(player_id)), ttl)
 
 def get_steam_profile(steam_id64: str):
     key = settings.STEAM_WEB_API_KEY
     if not key:
         return None
     url = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-    r = requests.get(url, params={"key": key, "steamids": steam_id64}, timeout=8)
+    r = steam.get(url, params={"key": key, "steamids": steam_id64}, endpoint="GetPlayerSummaries")
     r.raise_for_status()
     players = (r.json() or {}).get("response", {}).get("players", [])
     return players[0] if players else None
 
+def _steam_profile_or_none(steam_id64: str):
+    try:
+        return get_steam_profile(steam_id64)
+    except Exception:
+        return None
+
 def get_steam_profile_cached(steam_id64: str, ttl=600):
-    cache_key = f"steam:profile:{steam_id64}"
-    data = cache.get(cache_key)
-    if data is None:
-        try:
-            data = get_steam_profile(steam_id64)
-        except Exception:
-            data = None
-        cache.set(cache_key, data, ttl)
-    return data
+    return steam_profiles.get(steam_id64, lambda: _steam_profile_or_none(steam_id64), ttl)
 
 STEAM_PROFILES_RE = re.compile(r"(?:https?://)?steamcommunity\.com/profiles/(\d+)", re.I)
 STEAM_ID_RE       = re.compile(r"(?:https?://)?steamcommunity\.com/id/([^/?#]+)", re.I)
@@ -107,7 +179,7 @@ def resolve_vanity_to_steam64(vanity: str) -> str | None:
     if not key:
         return None
     url = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v1/"
-    r = requests.get(url, params={"key": key, "vanityurl": vanity, "url_type": 1}, timeout=8)
+    r = steam.get(url, params={"key": key, "vanityurl": vanity, "url_type": 1}, endpoint="ResolveVanityURL")
     r.raise_for_status()
     resp = (r.json() or {}).get("response", {})
     if resp.get("success") == 1 and resp.get("steamid"):
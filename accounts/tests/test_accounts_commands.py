@@ -0,0 +1,13 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+
+def test_bench_faceit_stats_reports_raw_and_compact():
+    out = StringIO()
+    call_command("bench_faceit_stats", "--players", "5", stdout=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].split() == ["form", "pickled", "B", "resident", "B", "view", "us", "local"]
+    raw, compact = (line.split() for line in lines[1:3])
+    assert (raw[0], compact[0]) == ("raw", "compact")
+    assert float(compact[1]) < float(raw[1]) / 5
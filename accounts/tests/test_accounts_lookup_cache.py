@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from accounts.lookup_cache import LookupCache
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def lookups():
+    return LookupCache("test:lookup", negative_ttl=5)
+
+
+def _expire(key):
+    value, _ = cache.get(key)
+    cache.set(key, (value, time.time() - 1), 60)
+
+
+def _wait_for(predicate, timeout=2):
+    stop = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_fresh_entries_are_hits_and_ttl_is_jittered(lookups):
+    calls = []
+    assert lookups.get("a", lambda: calls.append(1) or {"v": 1}, 100) == {"v": 1}
+    assert lookups.get("a", lambda: calls.append(1) or {"v": 2}, 100) == {"v": 1}
+    assert len(calls) == 1
+    _, fresh_until = cache.get("test:lookup:a")
+    assert 90 - 1 <= fresh_until - time.time() <= 110
+    assert lookups.stats() == {**lookups.stats(), "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_not_found_is_cached_with_the_shorter_negative_ttl(lookups):
+    calls = []
+    assert lookups.get("gone", lambda: calls.append(1), 300) is None
+    assert lookups.get("gone", lambda: calls.append(1), 300) is None
+    assert len(calls) == 1
+    _, fresh_until = cache.get("test:lookup:gone")
+    assert fresh_until - time.time() <= 5 * 1.1
+    assert lookups.stats()["negative_hits"] == 1
+
+
+def test_loader_errors_propagate_and_are_not_cached(lookups):
+    def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        lookups.get("x", boom, 60)
+    assert cache.get("test:lookup:x") is None
+    assert lookups.get("x", lambda: "ok", 60) == "ok"
+
+
+def test_stale_entry_is_served_while_one_background_refresh_runs(lookups):
+    lookups.get("s", lambda: "old", 60)
+    _expire("test:lookup:s")
+    release = threading.Event()
+    calls = []
+
+    def slow_reload():
+        calls.append(1)
+        release.wait(2)
+        return "new"
+
+    assert lookups.get("s", slow_reload, 60) == "old"
+    assert lookups.get("s", slow_reload, 60) == "old"
+    release.set()
+    assert _wait_for(lambda: lookups.get("s", slow_reload, 60) == "new")
+    assert len(calls) == 1
+    assert lookups.stats()["stale"] >= 2
+
+
+def test_failed_background_refresh_keeps_serving_stale(lookups):
+    lookups.get("s", lambda: "old", 60)
+    _expire("test:lookup:s")
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    assert lookups.get("s", boom, 60) == "old"
+    assert _wait_for(lambda: lookups.stats()["refresh_errors"] == 1)
+    assert _wait_for(lambda: cache.get("test:lookup:s:lock") is None)
+    assert lookups.get("s", lambda: "new", 60) == "old"
+
+
+def test_concurrent_misses_call_the_upstream_once(lookups):
+    calls = []
+    start = threading.Barrier(8)
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"player_id": "P"}
+
+    results = []
+
+    def request():
+        start.wait()
+        results.append(lookups.get("hot", slow_load, 60))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"player_id": "P"}] * 8
+    assert lookups.stats()["coalesced"] == 7
+
+
+def test_waiting_for_another_load_honours_the_deadline(lookups):
+    cache.add("test:lookup:busy:lock", "someone-else", 30)
+    with pytest.raises(TimeoutError):
+        lookups.get("busy", lambda: "never", 60, deadline=time.monotonic() + 0.05)
+
+
+@override_settings(LOOKUP_TTL_JITTER=0, LOOKUP_NEGATIVE_TTL=7)
+def test_negative_ttl_falls_back_to_settings():
+    LookupCache("test:defaults").get("none", lambda: None, 300)
+    _, fresh_until = cache.get("test:defaults:none")
+    assert 6 <= fresh_until - time.time() <= 7
+
+
+@pytest.mark.django_db
+def test_ops_metrics_reports_lookup_cache_stats(client, django_user_model):
+    client.force_login(django_user_model.objects.create_user("admin", password="x", is_staff=True))
+    data = client.get(reverse("ops_metrics")).json()
+    assert {"faceit:profile", "faceit:stats", "steam:profile"} <= set(data["lookup_cache"])
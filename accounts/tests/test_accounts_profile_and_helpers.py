@@ -1,10 +1,12 @@
+import threading
+import time
 from unittest.mock import patch
 import pytest
 from django.test import TestCase, override_settings
 from django.http import HttpResponse
 from django.urls import path, reverse
 from django.contrib.auth import get_user_model
-from accounts import views
+from accounts import services, views
 
 User = get_user_model()
 
@@ -12,7 +14,7 @@ LOC_TEMPLATES = {
     "accounts/profile.html": """
         {% if faceit_error %}FE:{{ faceit_error }}{% endif %}
         {% if faceit %}FACEIT_OK{% endif %}
-        {% if steam %}STEAM_OK{% endif %}
+        {% if steam %}STEAM_OK{% if steam.name %}:{{ steam.name }}{% endif %}{% endif %}
         {% if used_steam_id %}USED:{{ used_steam_id }}{% endif %}
     """,
 }
@@ -56,12 +58,12 @@ class AccountsProfileAndHelpersTests(TestCase):
         )
 
     def test__to_float_and__to_int(self):
-        assert views._to_float("1.5") == 1.5
-        assert views._to_float("bad") is None
-        assert views._to_float(None) is None
-        assert views._to_int("7") == 7
-        assert views._to_int("x") is None
-        assert views._to_int(None) is None
+        assert services._to_float("1.5") == 1.5
+        assert services._to_float("bad") is None
+        assert services._to_float(None) is None
+        assert services._to_int("7") == 7
+        assert services._to_int("x") is None
+        assert services._to_int(None) is None
 
     def test__game_node(self):
         assert views._game_node({"games": {"cs2": {"lvl": 10}}}) == {"lvl": 10}
@@ -80,12 +82,12 @@ class AccountsProfileAndHelpersTests(TestCase):
                 {"type": "queue", "label": "de_nuke", "stats": {"Matches": "99"}},
             ]
         }
-        maps = views._parse_maps(stats_raw)
+        maps = services._parse_maps(stats_raw)
         assert len(maps) == 2
-        assert maps[0]["name"] == "Mirage" and maps[0]["matches"] == 10
-        assert maps[1]["name"] == "Inferno" and maps[1]["matches"] == 5
-        assert maps[0]["winrate"] == 66.6 and maps[0]["kd"] == 1.20
-        assert maps[1]["winrate"] is None and maps[1]["kd"] == 1.10
+        assert maps[0].name == "Mirage" and maps[0].matches == 10
+        assert maps[1].name == "Inferno" and maps[1].matches == 5
+        assert maps[0].winrate == 66.6 and maps[0].kd == 1.20
+        assert maps[1].winrate is None and maps[1].kd == 1.10
 
     @patch("accounts.views.get_faceit_stats_cached")
     @patch("accounts.views.get_faceit_profile_by_steam_cached")
@@ -118,16 +120,19 @@ class AccountsProfileAndHelpersTests(TestCase):
             "games": {"cs2": {"skill_level": 10, "faceit_elo": 2200}},
             "_matched_game": "cs2",
         }
-        get_faceit_stats.return_value = {
+        get_faceit_stats.return_value = services.compact_faceit_stats({
             "lifetime": {"Matches": "100", "Average K/D Ratio": "1.3", "Win Rate %": "52.5"},
             "segments": [
                 {"type": "map", "label": "de_mirage", "stats": {"Matches": "20", "Average K/D Ratio": "1.1", "Win Rate %": "60"}}
             ],
-        }
+        })
 
         resp = self.client.post(reverse("profile"), data={"steam_id": "whatever"})
         body = resp.content.decode()
         assert "FACEIT_OK" in body and "STEAM_OK" in body and "USED:76561198000000000" in body
+        faceit = resp.context["faceit"]
+        assert faceit["lifetime"] == (100, 1.3, 52.5)
+        assert faceit["maps"] == (("Mirage", 20, 60.0, 1.1),)
 
     @patch("accounts.views.get_faceit_profile_by_steam_cached", return_value={"player_id": None})
     @patch("accounts.views.get_steam_profile_cached", return_value={})
@@ -197,4 +202,34 @@ class AccountsProfileAndHelpersTests(TestCase):
         resp = self.client.post(reverse("profile"), data={"steam_id": "whatever"})
         body = resp.content.decode()
         assert "USED:1234567890" in body
-        assert getattr(holder.get("inst"), "_had_error", False) is True
\ No newline at end of file
+        assert getattr(holder.get("inst"), "_had_error", False) is True
+
+    @override_settings(PROFILE_UPSTREAM_DEADLINE=0.3)
+    @patch("accounts.views.get_faceit_stats_cached", return_value={})
+    @patch("accounts.views.get_faceit_profile_by_steam_cached", return_value={"player_id": "PID", "nickname": "N"})
+    @patch("accounts.views.get_steam_profile_cached")
+    def test_profile_renders_partial_results_within_the_deadline(self, get_steam, get_faceit_prof, _stats):
+        self.client.force_login(self.user)
+        self.user.steam_id = "555"; self.user.save()
+        release = threading.Event()
+        get_steam.side_effect = lambda *a, **k: release.wait(5) and {"personaname": "late"}
+
+        started = time.monotonic()
+        try:
+            body = self.client.get(reverse("profile")).content.decode()
+        finally:
+            release.set()
+        assert time.monotonic() - started < 2
+        assert "FACEIT_OK" in body and "STEAM_OK" in body and "late" not in body
+        get_faceit_prof.assert_called_once()
+        assert get_faceit_prof.call_args.kwargs["deadline"] is not None
+
+    @override_settings(PROFILE_UPSTREAM_DEADLINE=0.2)
+    @patch("accounts.views.get_faceit_profile_by_steam_cached", side_effect=TimeoutError)
+    @patch("accounts.views.get_steam_profile_cached", return_value={"personaname": "Gabe"})
+    def test_profile_slow_faceit_still_shows_steam(self, _get_steam, _get_faceit_prof):
+        self.client.force_login(self.user)
+        self.user.steam_id = "555"; self.user.save()
+        body = self.client.get(reverse("profile")).content.decode()
+        assert "STEAM_OK:Gabe" in body
+        assert "FE:⚠️ Faceit is slow to respond" in body
@@ -1,4 +1,6 @@
 import json
+import threading
+import time
 import pytest
 from unittest.mock import patch, MagicMock
 from django.core.cache import cache
@@ -27,39 +29,57 @@ class _Resp:
             err.response = self
             raise err
 
-@patch("accounts.services.requests.get")
+@patch("accounts.services.faceit.get")
 def test__get_ok(req_get):
     req_get.return_value = _Resp(200, {"hello": "world"})
     out = S._get("https://x/api", params={"a": 1})
     assert out == {"hello": "world"}
     req_get.assert_called_once()
 
-@patch("accounts.services.requests.get")
+@patch("accounts.services.faceit.get")
 def test__get_404_returns_none(req_get):
     req_get.return_value = _Resp(404, {"detail": "not found"})
     out = S._get("https://x/api")
     assert out is None
 
-@patch("accounts.services.requests.get")
+@patch("accounts.services.faceit.get")
 def test__get_500_raises(req_get):
     req_get.return_value = _Resp(500, {"err": "boom"})
     with pytest.raises(requests.HTTPError):
         S._get("https://x/api")
     req_get.assert_called_once()
 
+def _by_game(**answers):
+    def fake_get(url, params=None, endpoint=None):
+        answer = answers[params["game"]]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return fake_get
+
 @patch("accounts.services._get")
 def test_get_faceit_profile_by_steam_hits_cs2_first(_get):
-    _get.return_value = {"player_id": "PID"}
+    csgo_asked = threading.Event()
+
+    def fake_get(url, params=None, endpoint=None):
+        if params["game"] == "csgo":
+            csgo_asked.set()
+            return {"player_id": "OLD"}
+        # Both games are probed concurrently: csgo is asked before cs2 answers.
+        csgo_asked.wait(2)
+        return {"player_id": "PID"}
+
+    _get.side_effect = fake_get
     out = S.get_faceit_profile_by_steam("7656")
     assert out["player_id"] == "PID"
     assert out["_matched_game"] == "cs2"
-    _get.assert_called_once()
+    assert csgo_asked.is_set()
 
 @patch("accounts.services._get")
 def test_get_faceit_profile_by_steam_cs2_404_then_csgo_ok(_get):
     e = requests.HTTPError("404")
     e.response = MagicMock(status_code=404)
-    _get.side_effect = [e, {"player_id": "X"}]
+    _get.side_effect = _by_game(cs2=e, csgo={"player_id": "X"})
 
     out = S.get_faceit_profile_by_steam("7656")
     assert out and out["player_id"] == "X"
@@ -70,22 +90,46 @@ def test_get_faceit_profile_by_steam_cs2_404_then_csgo_ok(_get):
 def test_get_faceit_profile_by_steam_cs2_http_error_non404_then_continue(_get, caplog):
     e = requests.HTTPError("500")
     e.response = MagicMock(status_code=500)
-    _get.side_effect = [e, None]
+    _get.side_effect = _by_game(cs2=e, csgo=None)
     out = S.get_faceit_profile_by_steam("7656")
     assert out is None 
 
 @patch("accounts.services._get")
 def test_get_faceit_profile_by_steam_generic_exception_then_none(_get):
-    _get.side_effect = [Exception("boom"), None]
+    _get.side_effect = _by_game(cs2=Exception("boom"), csgo=None)
     out = S.get_faceit_profile_by_steam("7656")
     assert out is None
 
+@patch("accounts.services._get")
+def test_get_faceit_profile_by_steam_deadline_raises_and_load_fills_cache_later(_get):
+    release = threading.Event()
+    _get.side_effect = lambda *a, **k: release.wait(2) and {"player_id": "LATE"}
+    try:
+        with pytest.raises(TimeoutError):
+            S.get_faceit_profile_by_steam_cached("7656", deadline=time.monotonic() + 0.05)
+        assert cache.get("faceit:profile:7656", "miss") == "miss"
+    finally:
+        release.set()
+    for _ in range(100):
+        if cache.get("faceit:profile:7656") is not None:
+            break
+        time.sleep(0.02)
+    assert S.get_faceit_profile_by_steam_cached("7656")["player_id"] == "LATE"
+    assert _get.call_count == 2
+
+@patch("accounts.services._get")
+def test_get_faceit_profile_by_steam_circuit_open_propagates_uncached(_get):
+    _get.side_effect = S.CircuitOpen("faceit is unavailable")
+    with pytest.raises(S.CircuitOpen):
+        S.get_faceit_profile_by_steam_cached("7656")
+    assert cache.get("faceit:profile:7656", "miss") == "miss"
+
 @patch("accounts.services._get")
 def test_get_faceit_stats_cs2_ok(_get):
     _get.return_value = {"k": "v"}
     out = S.get_faceit_stats("PID")
     assert out == {"k": "v"}
-    _get.assert_called_once_with(f"{S.BASE}/players/PID/stats/cs2")
+    _get.assert_called_once_with(f"{S.BASE}/players/PID/stats/cs2", endpoint="players/stats")
 
 @patch("accounts.services._get")
 def test_get_faceit_stats_cs2_http_error_fallback_csgo(_get):
@@ -113,26 +157,49 @@ def test_get_faceit_profile_by_steam_cached_miss_then_hit(func):
     assert out2 == {"player_id": "P"}
     assert func.call_count == 1
 
-@patch("accounts.services.get_faceit_stats", return_value={"stats": 1})
+@patch("accounts.services.get_faceit_stats", return_value={"lifetime": {"Matches": "3"}, "segments": []})
 def test_get_faceit_stats_cached_miss_then_hit(func):
     cache.clear()
     out = S.get_faceit_stats_cached("PID", ttl=1)
-    assert out == {"stats": 1}
+    assert out == S.FaceitStats(S.Lifetime(3, None, None), ())
     out2 = S.get_faceit_stats_cached("PID", ttl=1)
-    assert out2 == {"stats": 1}
+    assert out2 == out
     assert func.call_count == 1
 
+def test_compact_faceit_stats_keeps_lifetime_and_top_maps_only():
+    raw = {
+        "player_id": "PID",
+        "lifetime": {"Matches": "250", "Average K/D Ratio": "1.05", "Win Rate %": "51", "Recent Results": ["1", "0"]},
+        "segments": [
+            {"type": "Map", "label": f"de_map{i}", "img_regular": "https://cdn/x.jpeg",
+             "stats": {"Matches": str(i), "Win Rate %": "50", "K/D Ratio": "1.0", "Headshots": "99"}}
+            for i in range(1, 21)
+        ],
+    }
+    stats = S.compact_faceit_stats(raw)
+    assert stats.lifetime == S.Lifetime(250, 1.05, 51.0)
+    assert len(stats.maps) == S.MAX_MAPS
+    assert [m.matches for m in stats.maps] == list(range(20, 8, -1))
+    assert stats.maps[0] == S.MapStats("Map20", 20, 50.0, 1.0)
+    assert S.compact_faceit_stats(None) is None
+
+@patch("accounts.services.get_faceit_stats", return_value={"lifetime": {"Matches": "3"}})
+def test_faceit_stats_cache_key_carries_the_schema_version(func):
+    S.get_faceit_stats_cached("PID", ttl=60)
+    assert cache.get(f"faceit:stats:v{S.FACEIT_STATS_SCHEMA}:PID") is not None
+    assert cache.get("faceit:stats:PID") is None
+
 def _mk_players(payload):
     return {"response": {"players": payload}}
 
 @override_settings(STEAM_WEB_API_KEY="")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_get_steam_profile_no_key_returns_none(req_get):
     assert S.get_steam_profile("7656") is None
     req_get.assert_not_called()
 
 @override_settings(STEAM_WEB_API_KEY="KEY")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_get_steam_profile_ok_and_empty(req_get):
     req_get.return_value = _Resp(200, _mk_players([{"id": 1}]))
     out = S.get_steam_profile("7656")
@@ -143,7 +210,7 @@ def test_get_steam_profile_ok_and_empty(req_get):
     assert req_get.call_count == 2
 
 @override_settings(STEAM_WEB_API_KEY="KEY")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_get_steam_profile_http_error(req_get):
     req_get.return_value = _Resp(500, {})
     with pytest.raises(requests.HTTPError):
@@ -173,13 +240,13 @@ def test__parse_steam_input_variants():
     assert f("nickname") == ("vanity", "nickname")
 
 @override_settings(STEAM_WEB_API_KEY="")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_resolve_vanity_to_steam64_no_key(req_get):
     assert S.resolve_vanity_to_steam64("alias") is None
     req_get.assert_not_called()
 
 @override_settings(STEAM_WEB_API_KEY="KEY")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_resolve_vanity_to_steam64_success(req_get):
     req_get.return_value = _Resp(200, {"response": {"success": 1, "steamid": "765"}})
     out = S.resolve_vanity_to_steam64("alias")
@@ -187,14 +254,14 @@ def test_resolve_vanity_to_steam64_success(req_get):
     req_get.assert_called_once()
 
 @override_settings(STEAM_WEB_API_KEY="KEY")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_resolve_vanity_to_steam64_failure(req_get):
     req_get.return_value = _Resp(200, {"response": {"success": 42}})
     out = S.resolve_vanity_to_steam64("alias")
     assert out is None
 
 @override_settings(STEAM_WEB_API_KEY="KEY")
-@patch("accounts.services.requests.get")
+@patch("accounts.services.steam.get")
 def test_resolve_vanity_to_steam64_http_error(req_get):
     req_get.return_value = _Resp(500, {})
     with pytest.raises(requests.HTTPError):
@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from django.urls import reverse
+
+from accounts.upstream import CircuitBreaker, CircuitOpen, UpstreamClient
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.client_address))
+        status, headers = server.script.pop(0) if server.script else (200, {})
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.requests, server.script = [], []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(**kwargs):
+    return UpstreamClient("stub", **{"retries": 2, "backoff": 0, "breaker_threshold": 2, "breaker_reset": 60, **kwargs})
+
+
+def test_reuses_one_keep_alive_connection(stub):
+    client = _client()
+    for i in range(3):
+        assert client.get(f"{stub.url}/players/{i}", endpoint="players").json() == {"path": f"/players/{i}"}
+    assert len({addr for _, addr in stub.requests}) == 1
+    assert client.stats()["endpoints"]["players"]["calls"] == 3
+
+
+def test_retries_429_and_5xx_then_succeeds(stub):
+    stub.script = [(503, {}), (429, {"Retry-After": "0"}), (200, {})]
+    client = _client()
+
+    assert client.get(f"{stub.url}/stats", endpoint="stats").status_code == 200
+    assert len(stub.requests) == 3
+    stats = client.stats()
+    assert stats["retried"] == 2
+    assert stats["endpoints"]["stats"] == {**stats["endpoints"]["stats"], "calls": 1, "errors": 0}
+
+
+def test_404_is_returned_without_retry_or_breaker_failure(stub):
+    stub.script = [(404, {})] * 3
+    client = _client(breaker_threshold=1)
+
+    assert client.get(f"{stub.url}/missing").status_code == 404
+    assert client.get(f"{stub.url}/missing").status_code == 404
+    assert len(stub.requests) == 2
+    assert client.stats()["circuit"] == "closed"
+
+
+def test_breaker_opens_after_failed_calls_and_fails_fast(stub):
+    stub.script = [(500, {})] * 6
+    client = _client()
+
+    assert client.get(f"{stub.url}/a").status_code == 500
+    assert client.get(f"{stub.url}/a").status_code == 500
+    assert len(stub.requests) == 6
+    with pytest.raises(CircuitOpen):
+        client.get(f"{stub.url}/a")
+    assert len(stub.requests) == 6
+    stats = client.stats()
+    assert stats["circuit"] == "open"
+    assert stats["short_circuited"] == 1
+    assert stats["endpoints"][f"{stub.url}/a"]["errors"] == 2
+
+
+def test_connection_errors_are_retried_and_raised():
+    client = _client(retries=1, timeout=(0.2, 0.2))
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:9/down", endpoint="down")
+    assert client.stats()["retried"] == 1
+    assert client.stats()["endpoints"]["down"]["errors"] == 1
+
+
+def test_breaker_half_opens_after_reset_and_closes_on_success():
+    breaker = CircuitBreaker(threshold=2, reset_after=10)
+    breaker.failure(now=0)
+    assert breaker.allow(now=1)
+    breaker.failure(now=1)
+    assert not breaker.allow(now=5)
+    # One trial call once reset_after has passed; others keep failing fast.
+    assert breaker.allow(now=12)
+    assert not breaker.allow(now=13)
+    breaker.failure(now=13)
+    assert not breaker.allow(now=20)
+    assert breaker.allow(now=23)
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow(now=24)
+
+
+@pytest.mark.django_db
+def test_ops_metrics_reports_upstream_stats_to_staff(client, django_user_model):
+    url = reverse("ops_metrics")
+    client.force_login(django_user_model.objects.create_user("user", password="x"))
+    assert client.get(url).status_code == 302
+    client.force_login(django_user_model.objects.create_user("admin", password="x", is_staff=True))
+    data = client.get(url).json()
+    assert set(data["upstream"]) == {"faceit", "steam"}
+    assert data["upstream"]["faceit"]["circuit"] == "closed"
@@ -0,0 +1,194 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpen(requests.RequestException):
+    """The upstream failed repeatedly; calls fail fast until the breaker resets."""
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failed calls and lets one trial call
+    through every ``reset_after`` seconds; a successful trial closes it again."""
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if now - self.opened_at < self.reset_after:
+                return False
+            # Half-open: this caller is the trial, the rest keep failing fast.
+            self.opened_at = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self, now: float | None = None):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic() if now is None else now
+
+
+class UpstreamClient:
+    """Pooled, retrying HTTP client for one third-party API.
+
+    One keep-alive ``requests.Session`` per upstream; 429/5xx answers and
+    connection errors are retried up to ``UPSTREAM_RETRIES`` times with jittered
+    exponential backoff (honouring ``Retry-After``), and a call that still fails
+    counts towards the circuit breaker. Latency and errors are kept per endpoint
+    label, so ids in the URL don't multiply the metrics.
+    """
+
+    def __init__(self, name: str, *, retries=None, backoff=None, timeout=None,
+                 breaker_threshold=None, breaker_reset=None, pool_size=None):
+        self.name = name
+        self.retries = getattr(settings, "UPSTREAM_RETRIES", 2) if retries is None else retries
+        self.backoff = getattr(settings, "UPSTREAM_BACKOFF", 0.2) if backoff is None else backoff
+        self.timeout = timeout or (
+            getattr(settings, "UPSTREAM_CONNECT_TIMEOUT", 3), getattr(settings, "UPSTREAM_TIMEOUT", 8)
+        )
+        self.breaker = CircuitBreaker(
+            getattr(settings, "UPSTREAM_BREAKER_THRESHOLD", 5) if breaker_threshold is None else breaker_threshold,
+            getattr(settings, "UPSTREAM_BREAKER_RESET", 30) if breaker_reset is None else breaker_reset,
+        )
+        pool_size = pool_size or getattr(settings, "UPSTREAM_POOL_SIZE", 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.retried = 0
+        self.short_circuited = 0
+
+    def _delay(self, attempt: int, response) -> float:
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            return min(float(retry_after), 10 * self.backoff)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def get(self, url: str, params=None, headers=None, endpoint: str | None = None) -> requests.Response:
+        """GET ``url``; returns the final response (the caller checks its status) or
+        raises the last connection error, or ``CircuitOpen`` without calling out."""
+        endpoint = endpoint or url
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise CircuitOpen(f"{self.name} is unavailable, failing fast")
+
+        started = time.perf_counter()
+        response = error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self._delay(attempt - 1, response))
+                with self._lock:
+                    self.retried += 1
+            try:
+                response, error = self.session.get(url, params=params, headers=headers, timeout=self.timeout), None
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                response, error = None, exc
+                continue
+            if response.status_code not in RETRY_STATUSES:
+                break
+
+        failed = error is not None or response.status_code in RETRY_STATUSES
+        if failed:
+            self.breaker.failure()
+            log.warning("%s %s failed after %d attempt(s): %s", self.name, endpoint, attempt + 1,
+                        error or response.status_code)
+        else:
+            self.breaker.success()
+        self._record(endpoint, time.perf_counter() - started, failed)
+        if error is not None:
+            raise error
+        return response
+
+    def _record(self, endpoint: str, seconds: float, failed: bool):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["errors"] += failed
+            entry["total_ms"] += 1000 * seconds
+            entry["max_ms"] = max(entry["max_ms"], 1000 * seconds)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.retried = 0
+            self.short_circuited = 0
+        self.breaker.success()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "circuit": self.breaker.state,
+                "retried": self.retried,
+                "short_circuited": self.short_circuited,
+                "endpoints": {
+                    name: {
+                        "calls": e["calls"],
+                        "errors": e["errors"],
+                        "avg_ms": round(e["total_ms"] / e["calls"], 3),
+                        "max_ms": round(e["max_ms"], 3),
+                    }
+                    for name, e in self._endpoints.items()
+                },
+            }
+
+
+faceit = UpstreamClient("faceit")
+steam = UpstreamClient("steam")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run one upstream call on the shared fetch pool (``UPSTREAM_FETCH_WORKERS``
+    threads). Tasks must not wait on other tasks; callers fan out and collect."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "UPSTREAM_FETCH_WORKERS", 16), thread_name_prefix="upstream"
+            )
+    return _pool.submit(fn, *args, **kwargs)
+
+
+def wait(future: Future, deadline: float | None):
+    """The future's result; raises TimeoutError once ``deadline`` (time.monotonic())
+    has passed. The call itself keeps running and still fills its cache."""
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    return future.result(timeout=timeout)
+
+
+def stats() -> dict:
+    return {client.name: client.stats() for client in (faceit, steam)}
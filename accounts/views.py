@@ -1,4 +1,6 @@
 import re
+import time
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from .forms import SteamLookupForm, CustomUserCreationForm, ProfileEditForm
@@ -7,21 +9,10 @@ from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from django.contrib import messages
 from urllib.parse import urlencode
-from .services import get_faceit_profile_by_steam, get_faceit_stats, get_faceit_profile_by_steam_cached, get_faceit_stats_cached, get_steam_profile_cached, resolve_steam_input_to_steam64_cached
+from . import upstream
+from .services import EMPTY_FACEIT_STATS, get_faceit_profile_by_steam, get_faceit_stats, get_faceit_profile_by_steam_cached, get_faceit_stats_cached, get_steam_profile_cached, resolve_steam_input_to_steam64_cached
 from .forms import SignUpForm
 
-def _to_float(x):
-    try:
-        return float(x)
-    except (TypeError, ValueError):
-        return None
-
-def _to_int(x):
-    try:
-        return int(x)
-    except (TypeError, ValueError):
-        return None
-
 def _game_node(prof: dict):
     games = (prof or {}).get("games", {})
     return games.get("cs2") or games.get("csgo") or {}
@@ -61,20 +52,19 @@ def profile_view(request):
         used_steam_id = connected_id
 
     if used_steam_id:
-        sp = get_steam_profile_cached(used_steam_id)
-        steam = {
-            "id": used_steam_id,
-            "name": (sp or {}).get("personaname"),
-            "avatar": (sp or {}).get("avatarfull") or ((sp or {}).get("avatar")),
-            "url": (sp or {}).get("profileurl") or f"https://steamcommunity.com/profiles/{used_steam_id}",
-            "source": "manual" if (used_steam_id and used_steam_id != connected_id) else "connected",
-        }
+        # Steam and Faceit are fetched side by side; whatever isn't back by the
+        # deadline is left out and lands in the cache for the next visit.
+        deadline = time.monotonic() + getattr(settings, "PROFILE_UPSTREAM_DEADLINE", 4)
+        steam_future = upstream.submit(get_steam_profile_cached, used_steam_id)
 
         try:
-            prof = get_faceit_profile_by_steam_cached(used_steam_id)
+            prof = get_faceit_profile_by_steam_cached(used_steam_id, deadline=deadline)
             if prof and prof.get("player_id"):
-                stats_raw = get_faceit_stats_cached(prof["player_id"]) or {}
-                lifetime = stats_raw.get("lifetime", {}) or {}
+                try:
+                    stats = upstream.wait(upstream.submit(get_faceit_stats_cached, prof["player_id"]), deadline)
+                except TimeoutError:
+                    stats = None
+                stats = stats or EMPTY_FACEIT_STATS
                 games = (prof or {}).get("games", {})
                 game = games.get("cs2") or games.get("csgo") or {}
 
@@ -84,17 +74,27 @@ def profile_view(request):
                     "level": game.get("skill_level"),
                     "elo": game.get("faceit_elo"),
                     "game": prof.get("_matched_game"),
-                    "lifetime": {
-                        "matches": _to_int(lifetime.get("Matches")),
-                        "kd_avg": _to_float(lifetime.get("Average K/D Ratio")),
-                        "winrate": _to_float(lifetime.get("Win Rate %")),
-                    },
-                    "maps": _parse_maps(stats_raw),
+                    "lifetime": stats.lifetime,
+                    "maps": stats.maps,
                 }
             else:
                 faceit_error = "⚠️ Faceit profile not found for this SteamID"
+        except TimeoutError:
+            faceit_error = "⚠️ Faceit is slow to respond right now, try again in a moment"
         except Exception:
             faceit_error = "⚠️ Error while requesting the Faceit API. Check the API key and rate limits"
+
+        try:
+            sp = upstream.wait(steam_future, deadline)
+        except TimeoutError:
+            sp = None
+        steam = {
+            "id": used_steam_id,
+            "name": (sp or {}).get("personaname"),
+            "avatar": (sp or {}).get("avatarfull") or ((sp or {}).get("avatar")),
+            "url": (sp or {}).get("profileurl") or f"https://steamcommunity.com/profiles/{used_steam_id}",
+            "source": "manual" if (used_steam_id and used_steam_id != connected_id) else "connected",
+        }
     else:
         faceit_error = "Connect Steam or enter a SteamID / link / alias manually"
 
@@ -195,32 +195,3 @@ def faceit_stats_view(request):
         "profile": profile,
         "stats": stats,
     })
-
-def _parse_maps(stats_raw):
-    segs = (stats_raw or {}).get("segments") or []
-    maps = []
-    for seg in segs:
-        t = (seg.get("type") or "").lower()
-        if t not in ("map", "maps", "csgo_map", "cs2_map"):
-            continue
-
-        label = seg.get("label") or seg.get("mode") or seg.get("map") or ""
-        name = label.replace("de_", "").replace("cs_", "").strip().capitalize() or "—"
-
-        st = seg.get("stats") or {}
-        matches = _to_int(st.get("Matches"))
-        winrate = _to_float(st.get("Win Rate %"))
-        kd = (_to_float(st.get("Average K/D Ratio"))
-              or _to_float(st.get("K/D Ratio"))
-              or _to_float(st.get("K/D")))
-
-        if matches:
-            maps.append({
-                "name": name,
-                "matches": matches,
-                "winrate": winrate,
-                "kd": kd,
-            })
-
-    maps.sort(key=lambda m: m["matches"], reverse=True)
-    return maps[:12]
\ No newline at end of file
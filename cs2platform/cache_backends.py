@@ -0,0 +1,270 @@
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # redis-py is only needed when LOCATION is set
+    RedisError = OSError
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+COUNTS = ("local_hits", "local_misses", "shared_hits", "shared_misses", "shared_errors")
+
+
+def raw_key(key, key_prefix, version):
+    """KEY_FUNCTION for the inner tiers: TieredCache has already built the key."""
+    return key
+
+
+class LocalLRU:
+    """Bounded, short-lived in-process copies of small values."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        ttl = self.ttl if timeout is None else min(self.ttl, timeout)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _TierState:
+    """What TieredCache instances share per process: Django builds one backend
+    instance per thread, but the local tier, the counters and the Redis health
+    belong to the process."""
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.local = LocalLRU(max_entries, ttl)
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(COUNTS, 0)
+        self.redis_down_until = 0.0
+
+    @classmethod
+    def get(cls, name: str, max_entries: int, ttl: float) -> "_TierState":
+        with cls._registry_lock:
+            if name not in cls._registry:
+                cls._registry[name] = cls(max_entries, ttl)
+            return cls._registry[name]
+
+
+class TieredCache(BaseCache):
+    """Project cache: an in-process LRU in front of a shared Redis.
+
+    ``LOCATION`` is the Redis URL; without one, or while Redis is failing, the
+    second tier is a per-process LocMemCache, so the site keeps working and only
+    loses sharing. Values of keys starting with one of ``LOCAL_PREFIXES`` that
+    pickle to at most ``LOCAL_MAX_VALUE_BYTES`` are also kept locally for
+    ``LOCAL_TTL`` seconds; another process's write shows up once that copy
+    expires, so coordination keys (locks, counters) must stay out of them.
+    Keys ending in ``:lock`` never use the local tier, whatever their prefix.
+
+    ``NAMESPACES`` maps the part of a key before the first ``:`` to a version;
+    bumping one orphans every key in that namespace at once.
+
+    OPTIONS: LOCAL_MAX_ENTRIES, LOCAL_TTL, LOCAL_MAX_VALUE_BYTES, LOCAL_PREFIXES,
+    NAMESPACES, REDIS_RETRY_SECONDS, and REDIS (client options such as
+    socket_timeout).
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        name = f"{server}|{params.get('KEY_PREFIX', '')}"
+        self.state = _TierState.get(name, options.get("LOCAL_MAX_ENTRIES", 1000), options.get("LOCAL_TTL", 5))
+        self.local = self.state.local
+        self.local_max_bytes = options.get("LOCAL_MAX_VALUE_BYTES", 2048)
+        self.local_prefixes = tuple(options.get("LOCAL_PREFIXES", ()))
+        self.namespaces = dict(options.get("NAMESPACES", {}))
+        self.redis_retry = options.get("REDIS_RETRY_SECONDS", 10)
+        inner = {"TIMEOUT": params.get("TIMEOUT", 300), "KEY_FUNCTION": raw_key}
+        self.fallback = LocMemCache(f"tiered:{name}", {**inner, "OPTIONS": {"MAX_ENTRIES": 10_000}})
+        self.redis = RedisCache(server, {**inner, "OPTIONS": options.get("REDIS", {})}) if server else None
+
+    # -- keys -------------------------------------------------------------
+
+    def make_key(self, key, version=None):
+        namespace, sep, _ = key.partition(":")
+        if sep and namespace in self.namespaces:
+            key = f"{namespace}@{self.namespaces[namespace]}{key[len(namespace):]}"
+        return super().make_key(key, version)
+
+    def _local_key(self, key) -> bool:
+        return bool(self.local_prefixes) and key.startswith(self.local_prefixes) and not key.endswith(":lock")
+
+    def _keep_local(self, full_key, key, value, timeout):
+        if not self._local_key(key) or timeout == 0:
+            return
+        try:
+            small = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) <= self.local_max_bytes
+        except Exception:
+            small = False
+        if small:
+            self.local.set(full_key, value, None if timeout is None else timeout)
+        else:
+            self.local.delete(full_key)
+
+    # -- second tier -------------------------------------------------------
+
+    def _count(self, name, n=1):
+        with self.state.lock:
+            self.state.counts[name] += n
+
+    @property
+    def _shared(self):
+        if self.redis is not None and time.monotonic() >= self.state.redis_down_until:
+            return self.redis
+        return self.fallback
+
+    def _call(self, method, *args, **kwargs):
+        tier = self._shared
+        if tier is self.fallback:
+            return getattr(tier, method)(*args, **kwargs)
+        try:
+            return getattr(tier, method)(*args, **kwargs)
+        except RedisError:
+            self._count("shared_errors")
+            self.state.redis_down_until = time.monotonic() + self.redis_retry
+            log.warning("Redis cache %s failed; using the local fallback for %ss", method, self.redis_retry,
+                        exc_info=True)
+            return getattr(self.fallback, method)(*args, **kwargs)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # -- cache API ---------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_key(key, version)
+        if self._local_key(key):
+            value = self.local.get(full_key)
+            if value is not _MISSING:
+                self._count("local_hits")
+                return value
+            self._count("local_misses")
+        value = self._call("get", full_key, _MISSING)
+        if value is _MISSING:
+            self._count("shared_misses")
+            return default
+        self._count("shared_hits")
+        self._keep_local(full_key, key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remaining = {}, {}
+        for key in keys:
+            full_key = self.make_key(key, version)
+            value = self.local.get(full_key) if self._local_key(key) else _MISSING
+            if value is _MISSING:
+                remaining[full_key] = key
+            else:
+                found[key] = value
+        self._count("local_hits", len(found))
+        if remaining:
+            shared = self._call("get_many", list(remaining))
+            self._count("shared_hits", len(shared))
+            self._count("shared_misses", len(remaining) - len(shared))
+            for full_key, value in shared.items():
+                found[remaining[full_key]] = value
+                self._keep_local(full_key, remaining[full_key], value, None)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_key(key, version)
+        self._call("set", full_key, value, timeout)
+        self._keep_local(full_key, key, value, self._timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # add() is how locks are taken, so its answer always comes from the shared tier.
+        return self._call("add", self.make_key(key, version), value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("touch", self.make_key(key, version), timeout)
+
+    def delete(self, key, version=None):
+        full_key = self.make_key(key, version)
+        self.local.delete(full_key)
+        return self._call("delete", full_key)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_key(key, version)
+        self.local.delete(full_key)
+        return self._call("incr", full_key, delta)
+
+    def clear(self):
+        self.local.clear()
+        self.fallback.clear()
+        if self.redis is not None:
+            self._call("clear")
+
+    def close(self, **kwargs):
+        if self.redis is not None:
+            self.redis.close(**kwargs)
+
+    def reset_stats(self):
+        with self.state.lock:
+            self.state.counts = dict.fromkeys(COUNTS, 0)
+
+    def stats(self) -> dict:
+        with self.state.lock:
+            c = dict(self.state.counts)
+        local_total = c["local_hits"] + c["local_misses"]
+        shared_total = c["shared_hits"] + c["shared_misses"]
+        return {
+            **c,
+            "shared_tier": "redis" if self._shared is self.redis else "local",
+            "local_entries": len(self.local),
+            "local_hit_rate": round(c["local_hits"] / local_total, 3) if local_total else 0.0,
+            "shared_hit_rate": round(c["shared_hits"] / shared_total, 3) if shared_total else 0.0,
+        }
@@ -34,8 +34,52 @@ AUTH_USER_MODEL = "accounts.User"
 # ================== Third-party keys ==================
 FACEIT_API_KEY = os.getenv("FACEIT_API_KEY", "")
 STEAM_WEB_API_KEY = os.getenv("STEAM_WEB_API_KEY", "")
+# Faceit/Steam HTTP clients (accounts.upstream): timeouts in seconds, retries on 429/5xx
+# with exponential backoff, and consecutive failed calls before failing fast for a while.
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "8"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.2"))
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "10"))
+# Threads for concurrent upstream fetches, and the profile page's overall budget in seconds.
+UPSTREAM_FETCH_WORKERS = int(os.getenv("UPSTREAM_FETCH_WORKERS", "16"))
+PROFILE_UPSTREAM_DEADLINE = float(os.getenv("PROFILE_UPSTREAM_DEADLINE", "4"))
+# Faceit/Steam lookup cache (accounts.lookup_cache): seconds a "not found" stays fresh,
+# seconds an expired entry is still served while one request refreshes it, TTL jitter.
+LOOKUP_NEGATIVE_TTL = float(os.getenv("LOOKUP_NEGATIVE_TTL", "60"))
+LOOKUP_STALE_TTL = float(os.getenv("LOOKUP_STALE_TTL", "600"))
+LOOKUP_TTL_JITTER = float(os.getenv("LOOKUP_TTL_JITTER", "0.1"))
+LOOKUP_REFRESH_WORKERS = int(os.getenv("LOOKUP_REFRESH_WORKERS", "4"))
 
 TOURNAMENT_MIN_TEAMS = int(os.getenv("TOURNAMENT_MIN_TEAMS", "4"))
+# Worker threads for websocket consumers' ORM/template work (tournaments.db_executor).
+CONSUMER_DB_POOL_SIZE = int(os.getenv("CONSUMER_DB_POOL_SIZE", "8"))
+# Window in which view publishes to the same group/match are merged (tournaments.publisher).
+WS_PUBLISH_COALESCE_MS = int(os.getenv("WS_PUBLISH_COALESCE_MS", "50"))
+# Events kept per group for websocket resume (tournaments.replay); older gaps get a snapshot.
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", "256"))
+# Frames/second and burst allowed per match websocket and per user (tournaments.ratelimit).
+WS_FRAME_RATE = float(os.getenv("WS_FRAME_RATE", "5"))
+WS_FRAME_BURST = int(os.getenv("WS_FRAME_BURST", "10"))
+WS_USER_FRAME_RATE = float(os.getenv("WS_USER_FRAME_RATE", "10"))
+WS_USER_FRAME_BURST = int(os.getenv("WS_USER_FRAME_BURST", "20"))
+WS_MAX_FRAME_SIZE = int(os.getenv("WS_MAX_FRAME_SIZE", "1024"))
+# Seconds the ?since= high-water mark of the matches API trails the database clock; must
+# exceed the longest transaction that changes matches (tournaments.api_views).
+MATCHES_DELTA_WINDOW = float(os.getenv("MATCHES_DELTA_WINDOW", "5"))
+# Queries per request / websocket handler above which a warning is logged
+# (tournaments.instrumentation); keys are URL names or "ws:<Consumer>.<method>".
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "50"))
+QUERY_BUDGETS = {
+    "tournaments:overview": 12,
+    "tournaments:teams": 12,
+    "tournaments:bracket": 15,
+    "tournaments:matches": 15,
+    "tournaments:match_detail": 20,
+    "ws:MatchConsumer.receive": 8,
+}
 SITE_ID = int(os.getenv("DJANGO_SITE_ID", "1"))
 
 # ================== Apps ==================
@@ -66,6 +110,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "tournaments.instrumentation.QueryBudgetMiddleware",
 ]
 
 REST_FRAMEWORK = {
@@ -118,6 +163,28 @@ else:
             "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
         }
 
+# ================== Cache ==================
+# cs2platform.cache_backends.TieredCache: small "faceit:"/"steam:" values are also kept
+# in-process for a few seconds in front of Redis (REDIS_URL); without Redis the shared
+# tier is process-local. Bump a NAMESPACES version to drop every key under it.
+CACHES = {
+    "default": {
+        "BACKEND": "cs2platform.cache_backends.TieredCache",
+        "LOCATION": REDIS_URL or "",
+        "KEY_PREFIX": "cs2",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "2000")),
+            "LOCAL_TTL": float(os.getenv("CACHE_LOCAL_TTL", "5")),
+            "LOCAL_MAX_VALUE_BYTES": 2048,
+            "LOCAL_PREFIXES": ("faceit:", "steam:"),
+            "NAMESPACES": {"faceit": 1, "steam": 1, "bracket": 1},
+            "REDIS_RETRY_SECONDS": 10,
+            "REDIS": {"socket_connect_timeout": 0.5, "socket_timeout": 0.5},
+        },
+    }
+}
+
 # ================== Database ==================
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -7,6 +7,7 @@ SECRET_KEY = "test-secret-key"
 DEBUG = True
 ALLOWED_HOSTS = ["*"]
 TOURNAMENT_MIN_TEAMS = 4
+WS_PUBLISH_COALESCE_MS = 0
 FACEIT_API_KEY = os.getenv("FACEIT_API_KEY", "dummy")
 STEAM_WEB_API_KEY = os.getenv("STEAM_WEB_API_KEY", "dummy")
 
@@ -27,6 +28,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tournaments.instrumentation.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'cs2platform.urls'
@@ -56,6 +58,14 @@ CHANNEL_LAYERS = {
     "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
 }
 
+# No LOCATION: the shared tier falls back to process-local memory.
+CACHES = {
+    "default": {
+        "BACKEND": "cs2platform.cache_backends.TieredCache",
+        "OPTIONS": {"LOCAL_PREFIXES": ("faceit:", "steam:"), "NAMESPACES": {"faceit": 1, "steam": 1}},
+    }
+}
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -0,0 +1,100 @@
+# cs2platform/tests/test_cache_backends.py
+import itertools
+import time
+
+from django.core.cache import cache
+
+from cs2platform.cache_backends import TieredCache
+
+_names = itertools.count()
+
+
+def _cache(location="", **options):
+    # A fresh KEY_PREFIX per cache: the local tier is shared per process and prefix.
+    options = {"LOCAL_PREFIXES": ("faceit:",), "LOCAL_TTL": 60, **options}
+    return TieredCache(location, {"KEY_PREFIX": f"t{next(_names)}", "OPTIONS": options})
+
+
+def test_small_prefixed_values_are_served_from_the_local_tier():
+    c = _cache()
+    c.set("faceit:profile:1", {"elo": 2000})
+    c.set("faceit:stats:1", "x" * 5000)
+    c.set("ws:seq:1", 1)
+
+    assert c.get("faceit:profile:1") == {"elo": 2000}
+    assert c.get("faceit:stats:1") == "x" * 5000
+    assert c.get("ws:seq:1") == 1
+    assert c.get("faceit:missing") is None
+
+    stats = c.stats()
+    assert (stats["local_hits"], stats["local_misses"]) == (1, 2)
+    assert (stats["shared_hits"], stats["shared_misses"]) == (2, 1)
+    assert stats["shared_tier"] == "local"
+    assert stats["local_entries"] == 1
+
+
+def test_local_copy_is_bounded_and_short_lived():
+    c = _cache(LOCAL_MAX_ENTRIES=2, LOCAL_TTL=0.05)
+    for i in range(3):
+        c.set(f"faceit:p:{i}", i)
+    assert c.stats()["local_entries"] == 2
+
+    # Another process rewrites the shared entry; ours is picked up once the copy expires.
+    c.fallback.set(c.make_key("faceit:p:2"), "new")
+    assert c.get("faceit:p:2") == 2
+    time.sleep(0.06)
+    assert c.get("faceit:p:2") == "new"
+
+
+def test_lock_keys_under_a_local_prefix_stay_in_the_shared_tier():
+    c = _cache()
+    key = "faceit:stats:v1:42:lock"
+    c.set(key, "mine", 30)
+    assert c.get(key) == "mine"
+    assert c.stats()["local_entries"] == 0
+
+    # Another process takes the lock over; we must see it at once, not after LOCAL_TTL.
+    c.fallback.set(c.make_key(key), "theirs")
+    assert c.get(key) == "theirs"
+    assert c.get_many([key]) == {key: "theirs"}
+
+
+def test_delete_incr_and_add_go_through_the_shared_tier():
+    c = _cache()
+    c.set("faceit:p:1", 1)
+    c.delete("faceit:p:1")
+    assert c.get("faceit:p:1") is None
+
+    assert c.add("faceit:lock", "me", 30) is True
+    assert c.add("faceit:lock", "other", 30) is False
+    c.set("faceit:n", 1)
+    assert c.incr("faceit:n") == 2
+    assert c.get("faceit:n") == 2
+    assert c.get_many(["faceit:n", "faceit:lock", "nope"]) == {"faceit:n": 2, "faceit:lock": "me"}
+
+
+def test_namespace_versions_orphan_old_keys():
+    old = _cache(NAMESPACES={"faceit": 1})
+    new = TieredCache("", {"KEY_PREFIX": old.key_prefix, "OPTIONS": {"NAMESPACES": {"faceit": 2}}})
+    old.set("faceit:profile:1", "v1")
+    old.set("ws:seq:1", 7)
+
+    assert new.make_key("faceit:profile:1") != old.make_key("faceit:profile:1")
+    assert new.get("faceit:profile:1") is None
+    assert new.get("ws:seq:1") == 7
+
+
+def test_unreachable_redis_falls_back_to_local_memory():
+    c = _cache("redis://127.0.0.1:1/0", REDIS={"socket_connect_timeout": 0.2}, REDIS_RETRY_SECONDS=60)
+    c.set("faceit:profile:1", "kept")
+    assert c.get("ws:seq:1") is None
+    c.set("ws:seq:1", 3)
+    assert c.get("ws:seq:1") == 3
+
+    stats = c.stats()
+    assert stats["shared_errors"] == 1
+    assert stats["shared_tier"] == "local"
+
+
+def test_project_cache_is_tiered():
+    assert "local_hit_rate" in cache.stats()
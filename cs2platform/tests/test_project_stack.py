@@ -44,6 +44,16 @@ def test_home_url_and_template(client):
     assert b"OK HOME" in resp.content
 
 
+@pytest.mark.django_db
+def test_ops_metrics_is_staff_only_and_reports_cache_tiers(client, django_user_model):
+    url = reverse("ops_metrics")
+    client.force_login(django_user_model.objects.create_user("user", password="x"))
+    assert client.get(url).status_code == 302
+    client.force_login(django_user_model.objects.create_user("admin", password="x", is_staff=True))
+    data = client.get(url).json()
+    assert {"local_hit_rate", "shared_hit_rate", "shared_tier"} <= set(data["cache"])
+
+
 def test_included_namespaces_resolve():
     """
     Проверяем, что ключевые namespace подключены.
@@ -2,14 +2,29 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import render
 from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.http import JsonResponse
+from django.core.cache import cache
+from accounts import lookup_cache, upstream
 
 def home(request):
     return render(request, "home.html")
 
 
+@user_passes_test(lambda u: u.is_staff)
+def ops_metrics(request):
+    # Project-wide counters; tournament-specific ones live at tournaments:ops_metrics.
+    return JsonResponse({
+        "upstream": upstream.stats(),
+        "lookup_cache": lookup_cache.stats(),
+        "cache": cache.stats() if hasattr(cache, "stats") else {},
+    })
+
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", home, name="home"),
+    path("ops/metrics/", ops_metrics, name="ops_metrics"),
     path("teams/", include("teams.urls", namespace="teams")),
     path("servers/", include("servers.urls", namespace="servers")),
     path("tournaments/", include("tournaments.urls", namespace="tournaments")),
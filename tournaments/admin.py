@@ -23,5 +23,6 @@ class TournamentAdmin(admin.ModelAdmin):
     admins_count.short_description = "Admins"
 
     def participants_count(self, obj):
-        return obj.participants.count()
+        return obj.participants_count
     participants_count.short_description = "Teams"
+    participants_count.admin_order_field = "participants_count"
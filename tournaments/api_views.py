@@ -1,17 +1,97 @@
 from rest_framework import generics, status, permissions
-from .models import Tournament, Match
-from .serializers import TournamentSerializer, ReportMatchSerializer
+from rest_framework.pagination import CursorPagination
+from django.conf import settings
+from .models import DbClockMicros, Tournament, Match
+from .serializers import (
+    TournamentListSerializer, TournamentHeaderSerializer, MatchListSerializer, ReportMatchSerializer,
+    snapshot_match_data,
+)
+from .snapshots import get_bracket_snapshot
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+class TournamentCursorPagination(CursorPagination):
+    ordering = ("-start_date", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+class MatchCursorPagination(CursorPagination):
+    ordering = ("round", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
 class TournamentListAPIView(generics.ListAPIView):
+    """Tournament headers only; matches live under /matches/."""
     queryset = Tournament.objects.all()
-    serializer_class = TournamentSerializer
+    serializer_class = TournamentListSerializer
+    pagination_class = TournamentCursorPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        status_ = self.request.query_params.get("status")
+        return qs.filter(status=status_) if status_ else qs
+
+class TournamentMatchesAPIView(generics.ListAPIView):
+    """Matches of one tournament, filterable by ``?round=`` and ``?status=``.
+
+    ``?since=<version>`` returns only the matches changed after that version,
+    unpaginated, with the new high-water mark. ``reset`` means the bracket was
+    regenerated (or ``since`` was 0) and the list is complete.
+
+    Versions are change times on the database clock (models.match_stamp), so the
+    mark handed back is ``MATCHES_DELTA_WINDOW`` seconds old: a change that commits
+    up to that long after it was stamped is still returned, and clients must
+    accept repeats.
+    """
+    serializer_class = MatchListSerializer
+    pagination_class = MatchCursorPagination
+
+    def get_queryset(self):
+        self.tournament = get_object_or_404(
+            Tournament.objects.only("id", "matches_reset_version").annotate(db_now=DbClockMicros()),
+            pk=self.kwargs["pk"],
+        )
+        qs = Match.objects.filter(tournament_id=self.kwargs["pk"]).select_related("team_a", "team_b")
+        params = self.request.query_params
+        if params.get("round", "").isdigit():
+            qs = qs.filter(round=int(params["round"]))
+        if params.get("status"):
+            qs = qs.filter(status=params["status"])
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get("since", "")
+        if not since.isdigit():
+            return super().list(request, *args, **kwargs)
+        since = int(since)
+        qs = self.get_queryset()
+        # The high-water mark is read with the tournament, before the matches.
+        window = getattr(settings, "MATCHES_DELTA_WINDOW", 5)
+        high_water = self.tournament.db_now - int(window * 1_000_000)
+        reset = since == 0 or since < self.tournament.matches_reset_version
+        if not reset:
+            qs = qs.filter(version__gt=since)
+        return Response({
+            "version": max(high_water, self.tournament.matches_reset_version),
+            "reset": reset,
+            "results": self.get_serializer(qs.order_by("version", "id"), many=True).data,
+        })
 
 class TournamentDetailAPIView(generics.RetrieveAPIView):
     queryset = Tournament.objects.all()
-    serializer_class = TournamentSerializer
+    serializer_class = TournamentHeaderSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        tournament = self.get_object()
+        data = self.get_serializer(tournament).data
+        snapshot = get_bracket_snapshot(tournament)
+        data["matches"] = [
+            snapshot_match_data(m) for rnd in snapshot["rounds"] for m in rnd["matches"]
+        ]
+        return Response(data)
 
 class ReportMatchAPIView(APIView):
     permission_classes = [permissions.IsAdminUser]
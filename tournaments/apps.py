@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
 
 class TournamentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tournaments'
+
+    def ready(self):
+        from .instrumentation import install
+        connection_created.connect(install, dispatch_uid="tournaments.instrumentation")
+        from .models import TournamentTeam, release_participant_slot
+        post_delete.connect(release_participant_slot, sender=TournamentTeam, dispatch_uid="tournaments.participant_slot")
@@ -1,43 +1,94 @@
 import json
-from asgiref.sync import sync_to_async
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.template.loader import render_to_string
-from tournaments.models import Match, MAP_POOL
-from tournaments.services import perform_ban, get_final_map, get_available_maps
+from django.conf import settings
+from tournaments.db_executor import db_sync_to_async
+from tournaments.instrumentation import instrument_handler
+from tournaments.models import BanResult, Match, MAP_BITS
+from tournaments.ratelimit import frame_limiter
+from tournaments.replay import current_seq, missed_events, stamp
+from tournaments.snapshots import get_bracket_snapshot_by_id
+from tournaments.veto_protocol import (
+    VETO_PROTOCOL_VERSION, build_match_update, fragment_cache, fragment_key, veto_state_event,
+)
+from tournaments.veto_scheduler import running_deadline, veto_scheduler
+
+def _query_param(scope, name):
+    return parse_qs(scope.get("query_string", b"").decode()).get(name, [None])[0]
+
+
+def _resume_from(scope) -> int | None:
+    raw = _query_param(scope, "resume_from")
+    return int(raw) if raw and raw.isdigit() else None
+
+
+MATCH_FRAME_TYPES = {"ban_map", "veto_html", "heartbeat"}
+
+
+def _parse_match_frame(text_data) -> dict | None:
+    """Decode a MatchConsumer frame, or None when it isn't one we'd act on."""
+    try:
+        data = json.loads(text_data)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get("type") not in MATCH_FRAME_TYPES:
+        return None
+    if data["type"] == "ban_map" and data.get("map_name") not in MAP_BITS:
+        return None
+    return data
+
 
 class BracketConsumer(AsyncWebsocketConsumer):
+    @instrument_handler
     async def connect(self):
         self.tournament_id = self.scope["url_route"]["kwargs"]["tournament_id"]
         self.group_name = f"tournament_{self.tournament_id}"
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        resume_from = _resume_from(self.scope)
+        if resume_from is not None:
+            missed = await db_sync_to_async(missed_events)(self.group_name, resume_from)
+            if missed is not None:
+                for event in missed:
+                    await getattr(self, event["type"])(event)
+                return
+        snapshot = await self.get_snapshot()
+        if snapshot is not None:
+            await self.send(text_data=json.dumps({"type": "bracket_snapshot", **snapshot}))
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def bracket_update(self, event):
-        match_id = event["match_id"]
-
-        match = await self.get_match(match_id)
-
-        html = await sync_to_async(render_to_string)(
-            "tournaments/_match.html",
-            {"match": match},
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "bracket_update",
+                    "match_id": event["match_id"],
+                    "html": event.get("html", ""),
+                    "match": event.get("match"),
+                    "seq": event.get("seq"),
+                }
+            )
         )
 
+    async def bracket_batch_update(self, event):
         await self.send(
             text_data=json.dumps(
                 {
-                    "type": "bracket_update",
-                    "match_id": match_id,
-                    "html": html,
+                    "type": "bracket_batch_update",
+                    "updates": event.get("updates", []),
+                    "seq": event.get("seq"),
                 }
             )
         )
 
-    @sync_to_async
-    def get_match(self, match_id):
-        return Match.objects.select_related("team_a", "team_b", "winner").get(pk=match_id)
+    @db_sync_to_async
+    def get_snapshot(self):
+        # Read the sequence first: events racing the snapshot are replayed, never lost.
+        seq = current_seq(self.group_name)
+        snapshot = get_bracket_snapshot_by_id(self.tournament_id)
+        return None if snapshot is None else {**snapshot, "seq": seq}
 
 class MatchesConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -57,124 +108,120 @@ class MatchesConsumer(AsyncWebsocketConsumer):
                     "type": "matches_update",
                     "action": event["action"],
                     "message": event.get("message", ""),
+                    "seq": event.get("seq"),
                 }
             )
         )
 
 class MatchConsumer(AsyncWebsocketConsumer):
+    @instrument_handler
     async def connect(self):
         self.tournament_id = int(self.scope["url_route"]["kwargs"]["tournament_id"])
         self.match_id = int(self.scope["url_route"]["kwargs"]["match_id"])
         self.group_name = f"match_{self.match_id}"
+        self.wants_state = _query_param(self.scope, "v") == str(VETO_PROTOCOL_VERSION)
+        self.frame_bucket = frame_limiter.connection_bucket()
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        resume_from = _resume_from(self.scope)
+        if resume_from is not None:
+            await self._catch_up(resume_from)
+        await veto_scheduler.ensure(self.match_id)
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    async def receive(self, text_data):
-        try:
-            data = json.loads(text_data)
-        except Exception:
+    @instrument_handler
+    async def receive(self, text_data=None, bytes_data=None):
+        # Everything up to _get_match() is in-memory: floods and junk never reach the DB.
+        if not text_data or len(text_data) > getattr(settings, "WS_MAX_FRAME_SIZE", 1024):
+            frame_limiter.drop("invalid")
+            return
+        user = self.scope.get("user")
+        authenticated = getattr(user, "is_authenticated", False)
+        if not frame_limiter.allow(self.frame_bucket, user.id if authenticated else None):
+            await self._send_error("rate_limited", "Too many messages, slow down")
             return
 
-        msg_type = data.get("type")
-        if msg_type == "heartbeat":
-            match = await self._get_match()
-            changed = await sync_to_async(match.auto_ban_if_expired)()  # bool
-            if changed:
-                await self._broadcast_update()
+        data = _parse_match_frame(text_data)
+        if data is None:
+            frame_limiter.drop("invalid")
             return
 
+        msg_type = data["type"]
+        if msg_type == "veto_html":
+            await self._send_html()
+            return
+        # Expiry is owned by veto_scheduler; heartbeats from old clients are dropped here.
         if msg_type != "ban_map":
             return
-
-        map_name = data.get("map_name")
-        if not map_name:
+        if not authenticated:
+            frame_limiter.drop("unauthenticated")
+            await self._send_error("unauthenticated", "Log in to ban maps")
             return
 
+        map_name = data["map_name"]
         match = await self._get_match()
-        await sync_to_async(match.auto_ban_if_expired)()
-        ban_count = await self._ban_count(match)
-        current_team = match.team_a if (ban_count % 2 == 0) else match.team_b
-        user = self.scope.get("user")
+        current_team = match.team_a if (match.ban_count % 2 == 0) else match.team_b
         is_allowed = (
-            getattr(user, "is_authenticated", False)
-            and (
-                getattr(user, "is_staff", False) or
-                (current_team is not None and getattr(current_team, "captain_id", None) == user.id)
-            )
+            getattr(user, "is_staff", False) or
+            (current_team is not None and getattr(current_team, "captain_id", None) == user.id)
         )
 
         if not is_allowed or current_team is None:
-            await self.send(text_data=json.dumps({
-                "type": "error",
-                "message": "Insufficient permissions or no team assigned for banning"
-            }))
+            await self._send_error("forbidden", "Insufficient permissions or no team assigned for banning")
             return
 
-        ok = await sync_to_async(match.ban_map)(map_name, current_team, action="ban")
-        if not ok:
-            await self.send(text_data=json.dumps({
-                "type": "error",
-                "message": "This map is no longer available for banning or it is not your turn"
-            }))
+        result = await db_sync_to_async(match.apply_ban)(map_name, current_team, action="ban")
+        if result is not BanResult.APPLIED:
+            await self._send_error(result.value, result.label)
             return
+        veto_scheduler.schedule(self.match_id, running_deadline(match))
         await self._broadcast_update()
 
+    async def _send_error(self, code, message):
+        await self.send(text_data=json.dumps({"type": "error", "code": code, "message": message}))
+
+    async def _catch_up(self, resume_from):
+        missed = await db_sync_to_async(missed_events)(self.group_name, resume_from)
+        if missed is None:
+            await self.veto_state(await self._state_snapshot())
+            return
+        # Every message carries the full veto state, so the newest of each type is enough.
+        latest = {event["type"]: event for event in missed}
+        for event in latest.values():
+            await getattr(self, event["type"])(event)
+
     async def _broadcast_update(self):
         match = await self._get_match()
-        available_codes = await sync_to_async(get_available_maps)(match)
-        code = match.final_map_code
-        if not code and len(available_codes) == 1:
-            code = available_codes[0]
-
-        final_map = None
-        if code:
-            label = dict(MAP_POOL).get(code, code)
-            final_map = (code, label)
-
-        bans = await self._get_bans(match)
-        ban_count = await self._ban_count(match)
-        current_team = match.team_a if (ban_count % 2 == 0) else match.team_b
-
-        html = await sync_to_async(render_to_string)(
-            "tournaments/match_detail_inner.html",
-            {
-                "tournament": match.tournament,
-                "match": match,
-                "bans": bans,
-                "map_pool": MAP_POOL,
-                "available_codes": available_codes,
-                "final_map": final_map,
-                "current_team": current_team,
-            },
-        )
-
-        veto_html = await sync_to_async(render_to_string)(
-            "tournaments/_veto_panel.html",
-            {
-                "tournament": match.tournament,
-                "match": match,
-                "bans": bans,
-                "map_pool": MAP_POOL,
-                "available_codes": available_codes,
-                "final_map": final_map,
-                "current_team": current_team,
-            },
-        )
+        event = await db_sync_to_async(lambda: stamp(self.group_name, veto_state_event(match)))()
+        await self.channel_layer.group_send(self.group_name, event)
 
-        show_veto_btn = bool(final_map)
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "match_update",
-                "html": html,
-                "veto_html": veto_html,
-                "show_veto_btn": show_veto_btn,
-            },
-        )
+    async def _send_html(self, seq=None):
+        match = await self._get_match()
+        payload = await db_sync_to_async(build_match_update)(match)
+        await self.match_update({**payload, "seq": seq})
+
+    async def veto_state(self, event):
+        seq = event.get("seq")
+        state = event["state"]
+        if self.wants_state:
+            await self.send(text_data=json.dumps({"type": "veto_state", **state, "seq": seq}))
+            # The final map isn't expressible as a patch; ship the markup along.
+            if state.get("final_map"):
+                await self.match_update({**await self._fragments(state), "seq": seq})
+        else:
+            await self.match_update({**await self._fragments(state), "seq": seq})
+
+    async def _fragments(self, state):
+        # Rendered once per veto step in this process, however many subscribers ask.
+        key = fragment_key(self.match_id, state)
+        fragments = fragment_cache.peek(key)
+        if fragments is None:
+            match = await self._get_match()
+            fragments = await db_sync_to_async(fragment_cache.get)(key, match)
+        return fragments
 
     async def match_update(self, event):
         await self.send(text_data=json.dumps({
@@ -182,16 +229,15 @@ class MatchConsumer(AsyncWebsocketConsumer):
             "html": event.get("html", ""),
             "veto_html": event.get("veto_html", ""),
             "show_veto_btn": event.get("show_veto_btn"),
+            "seq": event.get("seq"),
         }))
 
-    @sync_to_async
+    @db_sync_to_async
     def _get_match(self):
         return Match.objects.select_related("tournament", "team_a", "team_b").get(pk=self.match_id)
 
-    @sync_to_async
-    def _ban_count(self, match):
-        return match.map_bans.count()
-
-    @sync_to_async
-    def _get_bans(self, match):
-        return list(match.map_bans.select_related("team").order_by("order"))
+    @db_sync_to_async
+    def _state_snapshot(self):
+        seq = current_seq(self.group_name)
+        match = Match.objects.select_related("tournament", "team_a", "team_b").get(pk=self.match_id)
+        return {**veto_state_event(match), "seq": seq}
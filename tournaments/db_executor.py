@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+
+
+class ConsumerDBExecutor(Executor):
+    """Bounded thread pool for the ORM and template work of websocket consumers.
+
+    asgiref's default ``thread_sensitive=True`` runs every such call on one shared
+    thread, so one slow query stalls every match. The pool is created on first use
+    with ``CONSUMER_DB_POOL_SIZE`` workers, each keeping its own DB connection.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.started = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def size(self) -> int:
+        return getattr(settings, "CONSUMER_DB_POOL_SIZE", 8)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="consumer-db")
+            return self._pool
+
+    def submit(self, fn, /, *args, **kwargs):
+        pool = self._get_pool()
+        enqueued = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.started += 1
+                self.wait_seconds += time.perf_counter() - enqueued
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return pool.submit(run)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.size,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.started, 3) if self.started else 0.0,
+            }
+
+
+consumer_db_executor = ConsumerDBExecutor()
+
+
+def db_sync_to_async(func):
+    """``database_sync_to_async`` on the consumer pool; usable as a decorator."""
+    return DatabaseSyncToAsync(func, thread_sensitive=False, executor=consumer_db_executor)
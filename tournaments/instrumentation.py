@@ -0,0 +1,155 @@
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("query_recorder", default=None)
+
+
+class QueryRecorder:
+    __slots__ = ("count", "seconds", "statements", "slowest", "slowest_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.slowest = ""
+        self.slowest_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.statements[sql] += 1
+            if elapsed >= self.slowest_seconds:
+                self.slowest, self.slowest_seconds = sql, elapsed
+
+    @property
+    def duplicates(self) -> int:
+        return self.count - len(self.statements)
+
+
+def _dispatch(execute, sql, params, many, context):
+    recorder = _current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(sender=None, connection=None, **kwargs):
+    """``connection_created`` receiver: route the connection's queries to the active recorder."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+class QueryStats:
+    """Per-view / per-handler SQL totals, reported by ``ops/metrics``.
+
+    A label that runs more queries than its ``QUERY_BUDGETS`` entry (or
+    ``QUERY_BUDGET_DEFAULT``) logs a warning with the slowest and most repeated
+    statement.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def budget(self, label: str) -> int | None:
+        return getattr(settings, "QUERY_BUDGETS", {}).get(label, getattr(settings, "QUERY_BUDGET_DEFAULT", None))
+
+    def record(self, label: str, recorder: QueryRecorder):
+        budget = self.budget(label)
+        over = budget is not None and recorder.count > budget
+        with self._lock:
+            entry = self._labels.setdefault(label, {
+                "calls": 0, "queries": 0, "max_queries": 0, "sql_ms": 0.0,
+                "duplicates": 0, "over_budget": 0, "slowest_ms": 0.0, "slowest_sql": "",
+            })
+            entry["calls"] += 1
+            entry["queries"] += recorder.count
+            entry["max_queries"] = max(entry["max_queries"], recorder.count)
+            entry["sql_ms"] += 1000 * recorder.seconds
+            entry["duplicates"] += recorder.duplicates
+            entry["over_budget"] += over
+            if 1000 * recorder.slowest_seconds >= entry["slowest_ms"]:
+                entry["slowest_ms"] = 1000 * recorder.slowest_seconds
+                entry["slowest_sql"] = recorder.slowest[:300]
+        if over:
+            repeated, times = recorder.statements.most_common(1)[0]
+            logger.warning(
+                "%s ran %d queries (budget %d) in %.1f ms; slowest %.1f ms: %s; repeated %dx: %s",
+                label, recorder.count, budget, 1000 * recorder.seconds,
+                1000 * recorder.slowest_seconds, recorder.slowest[:300], times, repeated[:300],
+            )
+
+    def reset(self):
+        with self._lock:
+            self._labels.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                label: {
+                    **entry,
+                    "avg_queries": round(entry["queries"] / entry["calls"], 2),
+                    "sql_ms": round(entry["sql_ms"], 3),
+                    "slowest_ms": round(entry["slowest_ms"], 3),
+                }
+                for label, entry in self._labels.items()
+            }
+
+
+query_stats = QueryStats()
+
+
+@contextmanager
+def record_queries(label: str):
+    recorder = QueryRecorder()
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+        query_stats.record(label, recorder)
+
+
+def instrument_handler(func):
+    """Record the queries of an async consumer handler, including its pool calls."""
+    label = f"ws:{func.__qualname__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with record_queries(label):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+class QueryBudgetMiddleware:
+    """Records the queries of each request under its URL name (``app:view``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = _current.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            query_stats.record(match.view_name, recorder)
+        return response
@@ -0,0 +1,48 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from teams.models import Team
+from tournaments.models import Tournament, TournamentTeam
+from tournaments.services import generate_full_bracket
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measures query count and wall time of bracket generation (all data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[8, 64, 512, 1024])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'teams':>6} {'matches':>8} {'queries':>8} {'ms':>9}")
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    tournament = self._seed(size)
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.perf_counter()
+                        by_round = generate_full_bracket(tournament)
+                        elapsed = (time.perf_counter() - started) * 1000
+                    matches = sum(len(ms) for ms in by_round.values())
+                    self.stdout.write(f"{size:>6} {matches:>8} {len(ctx.captured_queries):>8} {elapsed:>9.1f}")
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _seed(self, size):
+        captain = get_user_model().objects.create_user(f"bench_{size}_{time.time_ns()}")
+        teams = Team.objects.bulk_create(
+            Team(name=f"Bench {size}-{i}", tag=f"B{i}", slug=f"bench-{size}-{i}", captain=captain)
+            for i in range(size)
+        )
+        tournament = Tournament.objects.create(
+            name=f"Bench {size}", start_date=timezone.now(), max_teams=size, participants_count=size
+        )
+        TournamentTeam.objects.bulk_create(TournamentTeam(tournament=tournament, team=t) for t in teams)
+        return tournament
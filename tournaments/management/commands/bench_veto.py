@@ -0,0 +1,74 @@
+import asyncio
+import statistics
+import time
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from teams.models import Team
+from tournaments.db_executor import consumer_db_executor, db_sync_to_async
+from tournaments.models import Tournament, Match
+from tournaments.veto_protocol import build_match_update
+
+
+def _veto_step(match_id):
+    match = Match.objects.select_related("tournament", "team_a", "team_b").get(pk=match_id)
+    match.apply_ban(match.available_map_codes()[0], match.current_team)
+    return build_match_update(match)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures veto step latency (load, ban, render) for concurrent matches on the shared "
+        "sync_to_async thread versus the consumer DB pool. Seeded data is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--matches", type=int, default=50)
+
+    def handle(self, *args, **options):
+        captain, tournament, match_ids = self._seed(options["matches"])
+        try:
+            self.stdout.write(f"{'executor':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+            for label, wrap in (
+                ("shared", sync_to_async(_veto_step)),
+                ("pool", db_sync_to_async(_veto_step)),
+            ):
+                latencies = asyncio.run(self._run(wrap, match_ids))
+                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+                self.stdout.write(
+                    f"{label:>8} {statistics.median(latencies):>8.1f} {p95:>8.1f} {max(latencies):>8.1f}"
+                )
+            self.stdout.write(f"pool stats: {consumer_db_executor.stats()}")
+        finally:
+            tournament.delete()
+            Team.objects.filter(captain=captain).delete()
+            captain.delete()
+
+    async def _run(self, step, match_ids):
+        async def timed(match_id):
+            started = time.perf_counter()
+            await step(match_id)
+            return (time.perf_counter() - started) * 1000
+
+        return await asyncio.gather(*(timed(mid) for mid in match_ids))
+
+    def _seed(self, count):
+        stamp = time.time_ns()
+        captain = get_user_model().objects.create_user(f"bench_veto_{stamp}")
+        teams = Team.objects.bulk_create(
+            Team(name=f"Veto {stamp}-{i}", tag=f"V{i}", slug=f"veto-{stamp}-{i}", captain=captain)
+            for i in range(count * 2)
+        )
+        tournament = Tournament.objects.create(name=f"Veto bench {stamp}", start_date=timezone.now())
+        now = timezone.now()
+        matches = Match.objects.bulk_create(
+            Match(
+                tournament=tournament, round=1, slot=i,
+                team_a=teams[2 * i], team_b=teams[2 * i + 1],
+                veto_state="running", veto_started_at=now,
+                veto_deadline=now + timezone.timedelta(minutes=5),
+            )
+            for i in range(count)
+        )
+        return captain, tournament, [m.pk for m in matches]
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from tournaments.models import Tournament
+from tournaments.services import update_bracket_progression
+
+
+class Command(BaseCommand):
+    help = "Re-runs bracket progression for tournaments whose brackets drifted from their results"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tournament_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Reconcile every tournament, not only running ones",
+        )
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.all()
+        if options["tournament_ids"]:
+            tournaments = tournaments.filter(pk__in=options["tournament_ids"])
+        elif not options["all"]:
+            tournaments = tournaments.filter(status="running")
+
+        fixed = 0
+        for t in tournaments.order_by("id"):
+            changed = update_bracket_progression(t)
+            if changed:
+                fixed += 1
+                self.stdout.write(self.style.WARNING(f"FIXED: {t} ({len(changed)} matches)"))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} tournament(s)"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from tournaments.models import Tournament, TournamentTeam
+
+
+class Command(BaseCommand):
+    help = "Resets Tournament.participants_count where it drifted from the registered teams"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tournament_ids", nargs="*", type=int)
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.annotate(actual=Count("participants"))
+        if options["tournament_ids"]:
+            tournaments = tournaments.filter(pk__in=options["tournament_ids"])
+
+        actual = Coalesce(
+            Subquery(
+                TournamentTeam.objects.filter(tournament_id=OuterRef("pk"))
+                .order_by().values("tournament_id").annotate(n=Count("id")).values("n"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        fixed = 0
+        for t in tournaments.exclude(participants_count=F("actual")).order_by("id"):
+            # Recount inside the UPDATE so registrations racing the reconcile aren't lost.
+            Tournament.objects.filter(pk=t.pk).update(participants_count=actual)
+            fixed += 1
+            self.stdout.write(self.style.WARNING(f"FIXED: {t} ({t.participants_count} -> {t.actual})"))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} tournament(s)"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+def backfill_slots(apps, schema_editor):
+    Match = apps.get_model("tournaments", "Match")
+    position = {}
+    changed = []
+    for m in Match.objects.filter(slot__isnull=True).order_by("tournament_id", "round", "id"):
+        key = (m.tournament_id, m.round)
+        m.slot = position.get(key, 0)
+        position[key] = m.slot + 1
+        changed.append(m)
+    Match.objects.bulk_update(changed, ["slot"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_teaminvite'),
+        ('tournaments', '0008_alter_match_status_alter_tournament_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='slot',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'round', 'slot'], name='tournaments_tournam_c91440_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0009_match_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='bracket_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:30
+
+from django.db import migrations, models
+
+# MAP_POOL order at the time of this migration; bit i stands for MAP_CODES[i].
+MAP_CODES = ["de_mirage", "de_dust2", "de_ancient", "de_train", "de_nuke", "de_inferno", "de_overpass"]
+
+
+def backfill_veto_state(apps, schema_editor):
+    Match = apps.get_model("tournaments", "Match")
+    MapBan = apps.get_model("tournaments", "MapBan")
+    state = {}
+    for match_id, map_name in MapBan.objects.values_list("match_id", "map_name"):
+        mask, count = state.get(match_id, (0, 0))
+        bit = 1 << MAP_CODES.index(map_name) if map_name in MAP_CODES else 0
+        state[match_id] = (mask | bit, count + 1)
+    changed = []
+    for m in Match.objects.filter(pk__in=state):
+        m.banned_mask, m.ban_count = state[m.pk]
+        changed.append(m)
+    Match.objects.bulk_update(changed, ["banned_mask", "ban_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0010_tournament_bracket_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='ban_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='banned_mask',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_veto_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:14
+
+from django.db import migrations, models
+
+
+def backfill_participants_count(apps, schema_editor):
+    Tournament = apps.get_model("tournaments", "Tournament")
+    TournamentTeam = apps.get_model("tournaments", "TournamentTeam")
+    rows = TournamentTeam.objects.order_by().values_list("tournament_id").annotate(models.Count("id"))
+    for tournament_id, n in rows:
+        Tournament.objects.filter(pk=tournament_id).update(participants_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournaments', '0011_match_veto_bitmask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='participants_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_participants_count, migrations.RunPython.noop),
+    ]
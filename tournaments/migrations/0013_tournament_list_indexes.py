@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_teaminvite'),
+        ('tournaments', '0012_tournament_participants_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['-start_date', '-id'], name='tournament_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['status', '-start_date', '-id'], name='tournament_status_start_idx'),
+        ),
+    ]
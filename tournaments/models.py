@@ -1,5 +1,6 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, NotSupportedError, models, transaction
+from django.db.models.functions import Now
 from django.utils import timezone
 import random
 from teams.models import Team
@@ -14,6 +15,38 @@ MAP_POOL = [
     ("de_overpass", "Overpass"),
 ]
 
+MAP_BITS = {code: 1 << i for i, (code, _) in enumerate(MAP_POOL)}
+
+
+class BanResult(models.TextChoices):
+    APPLIED = "applied", "Ban applied"
+    NOT_YOUR_TURN = "not_your_turn", "It is not your turn to ban"
+    STALE = "stale", "This map is no longer available for banning"
+    FINISHED = "finished", "Map veto is not running"
+
+
+class RegistrationResult(models.TextChoices):
+    REGISTERED = "registered", "Team registered"
+    ALREADY_REGISTERED = "already_registered", "This team is already registered"
+    FULL = "full", "No more slots available"
+    CLOSED = "closed", "Registration is closed"
+
+
+class CounterFieldsMixin:
+    """COUNTER_FIELDS are maintained with F() updates; a full save() of a stale
+    instance must not roll them back."""
+
+    COUNTER_FIELDS: tuple[str, ...] = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
 class MapBan(models.Model):
     class Action(models.TextChoices):
         BAN = "ban", "Ban"
@@ -42,7 +75,22 @@ class MapBan(models.Model):
     def __str__(self):
         return f"{self.team} {self.get_action_display()} {self.get_map_name_display()} (#{self.order})"
 
-class Tournament(models.Model):
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # Keep Match.banned_mask/ban_count in step with the audit log.
+        bit = MAP_BITS.get(self.map_name, 0)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Match.objects.filter(pk=self.match_id).update(
+                banned_mask=models.F("banned_mask").bitor(bit),
+                ban_count=models.F("ban_count") + 1,
+            )
+        if MapBan.match.is_cached(self):
+            self.match.banned_mask |= bit
+            self.match.ban_count += 1
+
+class Tournament(CounterFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("upcoming", "Upcoming"),
         ("running", "Running"),
@@ -70,9 +118,21 @@ class Tournament(models.Model):
     admins = models.ManyToManyField(
         settings.AUTH_USER_MODEL, blank=True, related_name="managed_tournaments"
     )
+    bracket_version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Maintained by TournamentTeam.save()/delete() and register_team(); see reconcile_participants.
+    participants_count = models.PositiveIntegerField(default=0, editable=False)
+    # Match.version of the last bracket regeneration; older matches were replaced.
+    matches_reset_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ("bracket_version", "participants_count", "matches_reset_version")
 
     class Meta:
         ordering = ("-start_date", "id")
+        # Keyset pagination of the tournament list (views.tournament_list).
+        indexes = [
+            models.Index(fields=["-start_date", "-id"], name="tournament_start_id_idx"),
+            models.Index(fields=["status", "-start_date", "-id"], name="tournament_status_start_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -82,12 +142,70 @@ class Tournament(models.Model):
         return (
             self.status == "upcoming"
             and self.registration_open
-            and self.participants.count() < self.max_teams
+            and self.participants_count < self.max_teams
         )
 
     @property
     def slots_left(self):
-        return max(self.max_teams - self.participants.count(), 0)
+        return max(self.max_teams - self.participants_count, 0)
+
+    def register_team(self, team) -> RegistrationResult:
+        """Take a slot and register ``team`` in one transaction.
+
+        The slot is claimed with a conditional UPDATE on participants_count, so
+        concurrent registrations can never push it past max_teams.
+        """
+        try:
+            with transaction.atomic():
+                claimed = Tournament.objects.filter(
+                    pk=self.pk, status="upcoming", registration_open=True,
+                    participants_count__lt=models.F("max_teams"),
+                ).update(participants_count=models.F("participants_count") + 1)
+                if claimed:
+                    # bulk_create skips TournamentTeam.save(): the slot is already counted.
+                    TournamentTeam.objects.bulk_create([TournamentTeam(tournament=self, team=team)])
+        except IntegrityError:
+            return RegistrationResult.ALREADY_REGISTERED
+        if claimed:
+            self.participants_count += 1
+            return RegistrationResult.REGISTERED
+        self.refresh_from_db(fields=["status", "registration_open", "max_teams", "participants_count"])
+        if self.participants.filter(team=team).exists():
+            return RegistrationResult.ALREADY_REGISTERED
+        if self.status != "upcoming" or not self.registration_open:
+            return RegistrationResult.CLOSED
+        return RegistrationResult.FULL
+
+class DbClockMicros(models.Func):
+    """The database server's clock, in microseconds since the epoch.
+
+    Match versions are compared across every app server, so they are taken from
+    the one clock they all share. SQLite keeps its clock in milliseconds.
+    """
+    output_field = models.BigIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"DbClockMicros is not implemented for {connection.vendor}")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return "CAST(EXTRACT(EPOCH FROM STATEMENT_TIMESTAMP()) * 1000000 AS BIGINT)", []
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return (
+            "((CAST(STRFTIME('%%s', 'now') AS INTEGER) * 1000"
+            " + CAST(SUBSTR(STRFTIME('%%f', 'now'), 4) AS INTEGER)) * 1000)"
+        ), []
+
+def match_stamp() -> dict:
+    """UPDATE kwargs that mark a match as changed for delta polling.
+
+    The version is the change time on the database clock, in microseconds, so
+    stamping needs no shared counter row, concurrent vetoes don't serialize on the
+    tournament, and app servers' clocks don't matter. A stamp may commit after a
+    later one; readers cover that by holding their high-water mark
+    ``MATCHES_DELTA_WINDOW`` seconds behind (see TournamentMatchesAPIView).
+    """
+    return {"version": DbClockMicros(), "updated_at": Now()}
 
 class TournamentTeam(models.Model):
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="participants")
@@ -100,7 +218,29 @@ class TournamentTeam(models.Model):
     def __str__(self):
         return f"{self.team} → {self.tournament}"
 
-class Match(models.Model):
+    def _bump_tournament(self, delta):
+        Tournament.objects.filter(pk=self.tournament_id).update(
+            participants_count=models.F("participants_count") + delta
+        )
+        if TournamentTeam.tournament.is_cached(self):
+            self.tournament.participants_count += delta
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._bump_tournament(1)
+
+
+
+def release_participant_slot(sender, instance, **kwargs):
+    """post_delete for TournamentTeam: gives the slot back however the row went,
+    including cascades from Team or queryset deletes. Runs inside the deleting
+    transaction."""
+    instance._bump_tournament(-1)
+
+class Match(CounterFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("scheduled", "Scheduled"),
         ("running", "Running"),
@@ -109,6 +249,7 @@ class Match(models.Model):
 
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="matches")
     round = models.PositiveIntegerField(default=1)
+    slot = models.PositiveIntegerField(null=True, blank=True)
     team_a = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name="matches_as_a")
     team_b = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name="matches_as_b")
 
@@ -131,12 +272,26 @@ class Match(models.Model):
     veto_turn = models.CharField(max_length=1, choices=(("A", "A"), ("B", "B")), default="A")
     final_map_code = models.CharField(max_length=50, choices=MAP_POOL, null=True, blank=True)
     server_addr = models.CharField(max_length=64, blank=True, default="")
+    # Veto state mirrored from map_bans: bit i is set once MAP_POOL[i] is banned or picked.
+    banned_mask = models.PositiveBigIntegerField(default=0, editable=False)
+    ban_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    # match_stamp() of the last result, progression or veto change.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    COUNTER_FIELDS = ("banned_mask", "ban_count", "version")
+    VETO_FIELDS = (
+        "veto_state", "veto_turn", "veto_deadline", "final_map_code", "server_addr",
+        "banned_mask", "ban_count",
+    )
 
     class Meta:
         ordering = ["round", "id"]
         indexes = [
             models.Index(fields=["tournament", "round"]),
             models.Index(fields=["tournament", "status"]),
+            models.Index(fields=["tournament", "round", "slot"]),
+            models.Index(fields=["tournament", "version"]),
         ]
         constraints = [
             models.CheckConstraint(
@@ -148,6 +303,16 @@ class Match(models.Model):
     def __str__(self):
         return f"{self.team_a or '—'} vs {self.team_b or '—'} ({self.tournament})"
 
+    @property
+    def parent_slot(self) -> int | None:
+        return None if self.slot is None else self.slot // 2
+
+    @property
+    def parent_side(self) -> str | None:
+        if self.slot is None:
+            return None
+        return "team_a" if self.slot % 2 == 0 else "team_b"
+
     @property
     def is_finished(self):
         return self.status == "finished"
@@ -160,14 +325,18 @@ class Match(models.Model):
     def current_team(self) -> Team | None:
         if not (self.team_a and self.team_b):
             return None
-        count = self.map_bans.count()
-        return self.team_a if count % 2 == 0 else self.team_b
+        return self.team_a if self.ban_count % 2 == 0 else self.team_b
+
+    def is_map_banned(self, code: str) -> bool:
+        return bool(self.banned_mask & MAP_BITS.get(code, 0))
+
+    def unbanned_map_codes(self) -> list[str]:
+        return [code for code, _ in MAP_POOL if not self.is_map_banned(code)]
 
     def available_map_codes(self) -> list[str]:
         if self.final_map_code:
             return []
-        banned = set(self.map_bans.values_list("map_name", flat=True))
-        return [code for code, _ in MAP_POOL if code not in banned]
+        return self.unbanned_map_codes()
 
     def start_veto(self, now: timezone.datetime | None = None):
         if self.veto_state != "idle":
@@ -177,36 +346,60 @@ class Match(models.Model):
         self.veto_started_at = now
         self.veto_deadline = now + timezone.timedelta(seconds=self.veto_timeout)
         self.veto_turn = "A" 
-        self.save(update_fields=["veto_state", "veto_started_at", "veto_deadline", "veto_turn"])
-
-    def _after_action_tick(self, now: timezone.datetime | None = None):
-        now = now or timezone.now()
-        avail = self.available_map_codes()
-        if len(avail) == 1:
-            self.final_map_code = avail[0]
-            self.veto_state = "done"
-            self.veto_deadline = None
-
-            if not self.server_addr:
-                self.server_addr = "192.168.1.56:27015"
+        Match.objects.filter(pk=self.pk).update(
+            veto_state=self.veto_state, veto_started_at=now, veto_deadline=self.veto_deadline,
+            veto_turn=self.veto_turn, **match_stamp(),
+        )
 
-            self.save(update_fields=["final_map_code", "veto_state", "veto_deadline", "server_addr"])
+    def _next_veto_state(self, code: str, now: timezone.datetime) -> dict:
+        mask = self.banned_mask | MAP_BITS[code]
+        left = [c for c, _ in MAP_POOL if not mask & MAP_BITS[c]]
+        state = {"banned_mask": mask, "ban_count": self.ban_count + 1}
+        if len(left) == 1:
+            state.update(
+                final_map_code=left[0],
+                veto_state="done",
+                veto_deadline=None,
+                server_addr=self.server_addr or "192.168.1.56:27015",
+            )
         else:
-            self.veto_turn = "B" if self.veto_turn == "A" else "A"
-            self.veto_deadline = now + timezone.timedelta(seconds=self.veto_timeout)
-            self.save(update_fields=["veto_turn", "veto_deadline"])
-
-    def ban_map(self, code: str, team: Team, action="ban") -> bool:
+            state.update(
+                veto_turn="B" if self.veto_turn == "A" else "A",
+                veto_deadline=now + timezone.timedelta(seconds=self.veto_timeout),
+            )
+        return state
+
+    def _claim_ban(self, code: str, team: Team, action: str, now: timezone.datetime) -> "BanResult":
+        """Record one veto step if the row still holds the state this instance was read at."""
+        state = self._next_veto_state(code, now)
+        with transaction.atomic():
+            claimed = Match.objects.filter(
+                pk=self.pk, veto_state="running",
+                ban_count=self.ban_count, banned_mask=self.banned_mask,
+            ).update(**state, **match_stamp())
+            if claimed:
+                # bulk_create skips MapBan.save(): the claim above already moved the counters.
+                MapBan.objects.bulk_create([
+                    MapBan(match=self, team=team, map_name=code, order=self.ban_count + 1, action=action)
+                ])
+        if not claimed:
+            self.refresh_from_db(fields=self.VETO_FIELDS)
+            return BanResult.FINISHED if self.veto_state != "running" else BanResult.STALE
+        for field, value in state.items():
+            setattr(self, field, value)
+        return BanResult.APPLIED
+
+    def apply_ban(self, code: str, team: Team, action="ban", now: timezone.datetime | None = None) -> "BanResult":
         if self.veto_state != "running":
-            return False
-        if team != self.current_team:
-            return False
+            return BanResult.FINISHED
+        if team is None or team != self.current_team:
+            return BanResult.NOT_YOUR_TURN
         if code not in self.available_map_codes():
-            return False
-        order = self.map_bans.count() + 1
-        MapBan.objects.create(match=self, team=team, map_name=code, order=order, action=action)
-        self._after_action_tick()
-        return True
+            return BanResult.STALE
+        return self._claim_ban(code, team, action, now or timezone.now())
+
+    def ban_map(self, code: str, team: Team, action="ban") -> bool:
+        return self.apply_ban(code, team, action=action) is BanResult.APPLIED
 
     def auto_ban_if_expired(self, now: timezone.datetime | None = None) -> bool:
         if self.veto_state != "running" or not self.veto_deadline:
@@ -217,14 +410,12 @@ class Match(models.Model):
         avail = self.available_map_codes()
         if not avail:
             return False
-        team = self.current_team
         choice = random.choice(avail)
-        order = self.map_bans.count() + 1
-        MapBan.objects.create(match=self, team=team, map_name=choice, order=order, action=MapBan.Action.BAN)
-        self._after_action_tick(now=now)
-        return True
+        return self._claim_ban(choice, self.current_team, MapBan.Action.BAN, now) is BanResult.APPLIED
 
-    def set_result(self, a: int, b: int):
+    def set_result(self, a: int, b: int) -> list["Match"]:
+        from .services import advance_bracket
+        from .snapshots import bump_bracket_version
         self.score_a = max(0, int(a))
         self.score_b = max(0, int(b))
         if self.score_a == self.score_b:
@@ -234,4 +425,7 @@ class Match(models.Model):
         else:
             self.winner = self.team_a if self.score_a > self.score_b else self.team_b
             self.status = "finished"
-        self.save(update_fields=["score_a", "score_b", "winner", "status"])
+        with transaction.atomic():
+            self.save(update_fields=["score_a", "score_b", "winner", "status"])
+            bump_bracket_version(self.tournament_id, [self.pk])
+            return advance_bracket(self)
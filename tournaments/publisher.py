@@ -0,0 +1,115 @@
+import inspect
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .replay import stamp
+
+logger = logging.getLogger(__name__)
+
+
+def _coalesce_key(payload: dict):
+    return payload.get("type"), payload.get("match_id")
+
+
+def _merge(old: dict, new: dict) -> dict:
+    if new.get("type") == "bracket_batch_update":
+        updates = {u["match_id"]: u for u in old.get("updates", [])}
+        updates.update((u["match_id"], u) for u in new.get("updates", []))
+        return {**new, "updates": list(updates.values())}
+    return new
+
+
+class Publisher:
+    """Channel-layer publishes for views.
+
+    Messages are handed over only once the surrounding transaction commits, and
+    messages to the same group with the same type (and match) that arrive within
+    ``WS_PUBLISH_COALESCE_MS`` are merged into one; the newest payload wins, batch
+    updates are merged per match. Each sent message is sequence-stamped for replay.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self.published = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.flushes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def window(self) -> float:
+        return getattr(settings, "WS_PUBLISH_COALESCE_MS", 50) / 1000
+
+    def publish(self, group: str, payload: dict):
+        transaction.on_commit(lambda: self._enqueue(group, payload))
+
+    def _enqueue(self, group: str, payload: dict):
+        key = (group, _coalesce_key(payload))
+        window = self.window
+        with self._lock:
+            if key in self._pending:
+                old, queued_at = self._pending[key]
+                self._pending[key] = (_merge(old, payload), queued_at)
+                self.coalesced += 1
+            else:
+                self._pending[key] = (payload, time.perf_counter())
+            if window > 0 and self._timer is None:
+                self._timer = threading.Timer(window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if window <= 0:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+        if not pending:
+            return
+        layer = get_channel_layer()
+        send = layer.group_send
+        if inspect.iscoroutinefunction(send):
+            send = async_to_sync(send)
+        for (group, _), (payload, queued_at) in pending.items():
+            try:
+                send(group, stamp(group, payload))
+            except Exception:
+                logger.exception("Publishing %s to %s failed", payload.get("type"), group)
+                with self._lock:
+                    self.failed += 1
+                continue
+            latency = time.perf_counter() - queued_at
+            with self._lock:
+                self.published += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+        with self._lock:
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "published": self.published,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "pending": len(self._pending),
+                "avg_latency_ms": round(1000 * self.latency_total / self.published, 3) if self.published else 0.0,
+                "max_latency_ms": round(1000 * self.latency_max, 3),
+            }
+
+
+publisher = Publisher()
+
+
+def publish(group: str, payload: dict):
+    publisher.publish(group, payload)
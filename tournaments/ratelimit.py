@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class FrameLimiter:
+    """Token buckets for incoming websocket frames.
+
+    Each connection gets its own bucket (``WS_FRAME_RATE``/``WS_FRAME_BURST``) and
+    every authenticated user one more, shared by all of their connections in this
+    process (``WS_USER_FRAME_RATE``/``WS_USER_FRAME_BURST``). Dropped frames are
+    counted per reason.
+    """
+
+    MAX_USERS = 10_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+        self.accepted = 0
+        self.dropped = Counter()
+
+    def connection_bucket(self) -> TokenBucket:
+        return TokenBucket(getattr(settings, "WS_FRAME_RATE", 5), getattr(settings, "WS_FRAME_BURST", 10))
+
+    def _user_bucket(self, user_id) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(
+                getattr(settings, "WS_USER_FRAME_RATE", 10), getattr(settings, "WS_USER_FRAME_BURST", 20)
+            )
+            if len(self._users) > self.MAX_USERS:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    def allow(self, bucket: TokenBucket, user_id=None) -> bool:
+        with self._lock:
+            ok = bucket.take() and (user_id is None or self._user_bucket(user_id).take())
+            if ok:
+                self.accepted += 1
+            else:
+                self.dropped["rate_limited"] += 1
+            return ok
+
+    def drop(self, reason: str):
+        with self._lock:
+            self.dropped[reason] += 1
+
+    def reset(self):
+        with self._lock:
+            self._users.clear()
+            self.accepted = 0
+            self.dropped.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"accepted": self.accepted, "dropped": dict(self.dropped), "tracked_users": len(self._users)}
+
+
+frame_limiter = FrameLimiter()
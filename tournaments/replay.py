@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+
+REPLAY_TTL = 15 * 60
+
+
+def _buffer_size() -> int:
+    return getattr(settings, "WS_REPLAY_BUFFER", 256)
+
+
+def _seq_key(group: str) -> str:
+    return f"ws:seq:{group}"
+
+
+def _event_key(group: str, seq: int) -> str:
+    return f"ws:event:{group}:{seq}"
+
+
+def current_seq(group: str) -> int:
+    return cache.get(_seq_key(group), 0)
+
+
+def stamp(group: str, payload: dict) -> dict:
+    """Tag ``payload`` with the group's next sequence number and keep it for replay."""
+    key = _seq_key(group)
+    cache.add(key, 0, timeout=None)
+    seq = cache.incr(key)
+    event = {**payload, "seq": seq}
+    cache.set(_event_key(group, seq), event, REPLAY_TTL)
+    return event
+
+
+def missed_events(group: str, resume_from: int) -> list[dict] | None:
+    """Events published after ``resume_from``, or None when they can't all be replayed
+    (too far behind, expired, or the counter was reset) and a snapshot is needed."""
+    seq = current_seq(group)
+    if resume_from > seq or seq - resume_from > _buffer_size():
+        return None
+    wanted = range(resume_from + 1, seq + 1)
+    found = cache.get_many([_event_key(group, s) for s in wanted])
+    if len(found) != len(wanted):
+        return None
+    return [found[_event_key(group, s)] for s in wanted]
+
@@ -2,6 +2,18 @@ from rest_framework import serializers
 from .models import Tournament, Match
 from teams.models import Team
 
+class SparseFieldsMixin:
+    """Honours ``?fields=a,b`` on the request; unknown names are ignored."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        wanted = request.query_params.get("fields") if request is not None else None
+        if wanted:
+            keep = {f.strip() for f in wanted.split(",")}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
 class TeamSerializer(serializers.ModelSerializer):
     class Meta:
         model = Team
@@ -15,12 +27,36 @@ class MatchSerializer(serializers.ModelSerializer):
         model = Match
         fields = ['id', 'round', 'team_a', 'team_b', 'score_a', 'score_b', 'status']
 
-class TournamentSerializer(serializers.ModelSerializer):
-    matches = MatchSerializer(many=True, read_only=True)
+class MatchListSerializer(SparseFieldsMixin, MatchSerializer):
+    class Meta(MatchSerializer.Meta):
+        fields = ['id', 'round', 'slot', 'team_a', 'team_b', 'score_a', 'score_b', 'status', 'winner', 'version']
+
+class TournamentListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Tournament
+        fields = [
+            'id', 'name', 'status', 'start_date', 'end_date', 'registration_open',
+            'max_teams', 'participants_count', 'bracket_version',
+        ]
 
+class TournamentHeaderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tournament
-        fields = ['id', 'name', 'description', 'status', 'start_date', 'end_date', 'matches']
+        fields = ['id', 'name', 'description', 'status', 'start_date', 'end_date', 'bracket_version']
+
+def snapshot_match_data(m: dict) -> dict:
+    """MatchSerializer-shaped dict built from a bracket snapshot entry."""
+    def team(t):
+        return {'id': t['id'], 'name': t['name'], 'tag': t['tag']} if t else None
+    return {
+        'id': m['id'],
+        'round': m['round'],
+        'team_a': team(m['team_a']),
+        'team_b': team(m['team_b']),
+        'score_a': m['score_a'],
+        'score_b': m['score_b'],
+        'status': m['status'],
+    }
 
 class ReportMatchSerializer(serializers.Serializer):
     match_id = serializers.IntegerField()
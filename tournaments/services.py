@@ -1,20 +1,12 @@
 import math
 import random
 from django.db import transaction
-from .models import Match, Tournament, MapBan, MAP_POOL
+from django.db.models import Max, Q
+from .models import Match, Tournament, MAP_POOL
+from .snapshots import bump_bracket_version
 
 def get_available_maps(match):
-    banned = set(match.map_bans.values_list("map_name", flat=True))
-    return [m for m, _ in MAP_POOL if m not in banned]
-
-
-def perform_ban(match, team, map_name):
-    available = get_available_maps(match)
-    if map_name not in available:
-        return False
-    order = match.map_bans.count() + 1
-    MapBan.objects.create(match=match, team=team, map_name=map_name, order=order)
-    return True
+    return match.unbanned_map_codes()
 
 
 def get_final_map(match):
@@ -26,51 +18,42 @@ def get_final_map(match):
     return None
 
 def generate_full_bracket(tournament: Tournament):
-    participants = list(tournament.participants.all())
-    teams = [p.team for p in participants]
+    team_ids = list(tournament.participants.values_list("team_id", flat=True))
 
-    if len(teams) < 2:
+    if len(team_ids) < 2:
         raise ValueError("Not enough teams to generate the bracket")
 
-    random.shuffle(teams)
-    n = len(teams)
+    random.shuffle(team_ids)
+    n = len(team_ids)
     rounds = math.ceil(math.log2(n))
     bracket_size = 2 ** rounds
-    while len(teams) < bracket_size:
-        teams.append(None)
-
-    tournament.matches.all().delete()
-    matches_by_round = {}
-    matches = []
-    for i in range(0, bracket_size, 2):
-        team_a = teams[i]
-        team_b = teams[i + 1]
-        m = Match.objects.create(
-            tournament=tournament,
-            round=1,
-            team_a=team_a,
-            team_b=team_b,
-            status="scheduled",
-        )
-        if (team_a and not team_b) or (team_b and not team_a):
-            m.winner = team_a or team_b
+    byes = bracket_size - n
+
+    matches_by_round = {r: [] for r in range(1, rounds + 1)}
+    for r in range(1, rounds + 1):
+        for slot in range(2 ** (rounds - r)):
+            matches_by_round[r].append(
+                Match(tournament=tournament, round=r, slot=slot, status="scheduled")
+            )
+
+    seeds = iter(team_ids)
+    for m in matches_by_round[1]:
+        m.team_a_id = next(seeds)
+        if m.slot < byes:
+            m.winner_id = m.team_a_id
             m.status = "finished"
-            m.save(update_fields=["winner", "status"])
-        matches.append(m)
-    matches_by_round[1] = matches
-
-    for r in range(2, rounds + 1):
-        matches = []
-        num_matches = 2 ** (rounds - r)
-        for _ in range(num_matches):
-            matches.append(Match.objects.create(
-                tournament=tournament,
-                round=r,
-                team_a=None,
-                team_b=None,
-                status="scheduled",
-            ))
-        matches_by_round[r] = matches
+            if rounds > 1:
+                _advance_into(matches_by_round[2][m.parent_slot], m, m.parent_side)
+        else:
+            m.team_b_id = next(seeds)
+
+    with transaction.atomic():
+        tournament.matches.all().delete()
+        created = Match.objects.bulk_create(
+            [m for r in range(1, rounds + 1) for m in matches_by_round[r]],
+            batch_size=500,
+        )
+        bump_bracket_version(tournament.pk, [m.pk for m in created], reset=True)
 
     return matches_by_round
 
@@ -81,18 +64,84 @@ def set_match_result(match: Match, score_a: int, score_b: int):
     if score_a == score_b:
         match.status = "scheduled"
         match.winner = None
+    else:
+        if match.team_a and match.team_b:
+            match.winner = match.team_a if score_a > score_b else match.team_b
+        else:
+            match.winner = None
+        match.status = "finished"
+    with transaction.atomic():
         match.save(update_fields=["score_a", "score_b", "status", "winner"])
+        bump_bracket_version(match.tournament_id, [match.pk])
+
+def _finish_tournament(tournament: Tournament, final: Match):
+    if final.status != "finished" or not final.winner_id:
         return
+    if tournament.winner_id != final.winner_id or tournament.status != "finished":
+        tournament.winner_id = final.winner_id
+        tournament.status = "finished"
+        tournament.end_date = tournament.end_date or final.scheduled_at
+        tournament.save(update_fields=["winner", "status", "end_date"])
+
+
+def _advance_into(parent: Match, child: Match, side: str) -> bool:
+    field = f"{side}_id"
+    if getattr(parent, field) == child.winner_id:
+        return False
+    setattr(parent, field, child.winner_id)
+    return True
+
+
+def _write_sides(changed: list[tuple[Match, str]]):
+    """Write back only the side each parent was fed from: sibling matches feed the
+    other side of the same parent, and writing both columns from a stale read
+    would put back the sibling's old team."""
+    for side in ("team_a", "team_b"):
+        parents = [parent for parent, s in changed if s == side]
+        if parents:
+            Match.objects.bulk_update(parents, [side])
 
-    if match.team_a and match.team_b:
-        match.winner = match.team_a if score_a > score_b else match.team_b
-    else:
-        match.winner = None
 
-    match.status = "finished"
-    match.save(update_fields=["score_a", "score_b", "status", "winner"])
+def advance_bracket(match: Match) -> list[Match]:
+    """Push the winner of ``match`` up its parent chain to the final.
 
-def update_bracket_progression(tournament: Tournament):
+    Only the ancestors of ``match`` are read (one row per remaining round) and
+    every slot that changed is written back with a single bulk update. Returns
+    the matches whose teams were changed.
+    """
+    if match.slot is None:
+        return update_bracket_progression(match.tournament)
+
+    tournament = match.tournament
+    with transaction.atomic():
+        max_round = tournament.matches.aggregate(m=Max("round"))["m"] or match.round
+        parents = {}
+        if max_round > match.round:
+            chain = Q()
+            for depth in range(1, max_round - match.round + 1):
+                chain |= Q(round=match.round + depth, slot=match.slot >> depth)
+            parents = {m.round: m for m in tournament.matches.filter(chain)}
+
+        changed = []
+        child = match
+        while child.status == "finished" and child.winner_id:
+            parent = parents.get(child.round + 1)
+            if parent is None:
+                break
+            if _advance_into(parent, child, child.parent_side):
+                changed.append((parent, child.parent_side))
+            child = parent
+
+        if changed:
+            _write_sides(changed)
+            bump_bracket_version(tournament.pk, [m.pk for m, _ in changed])
+        if child.round == max_round:
+            _finish_tournament(tournament, child)
+    return [m for m, _ in changed]
+
+
+def update_bracket_progression(tournament: Tournament) -> list[Match]:
+    """Full pass over the bracket; prefer ``advance_bracket`` after a single result."""
     with transaction.atomic():
         matches = (
             tournament.matches
@@ -100,45 +149,36 @@ def update_bracket_progression(tournament: Tournament):
             .order_by("round", "id")
         )
 
-        if not matches.exists():
-            return
-
         by_round = {}
         for m in matches:
             by_round.setdefault(m.round, []).append(m)
+        if not by_round:
+            return []
 
         max_round = max(by_round.keys())
+        changed = {}
 
         for rnd in range(1, max_round):
-            current_round_matches = by_round.get(rnd, [])
-            next_round_matches = by_round.get(rnd + 1, [])
-
-            for i, m in enumerate(current_round_matches):
-                if m.status != "finished" or not m.winner:
+            next_by_slot = {
+                (m.slot if m.slot is not None else i): m
+                for i, m in enumerate(by_round.get(rnd + 1, []))
+            }
+            for i, m in enumerate(by_round.get(rnd, [])):
+                if m.status != "finished" or not m.winner_id:
                     continue
-
-                next_index = i // 2
-                if next_index >= len(next_round_matches):
+                slot = m.slot if m.slot is not None else i
+                target = next_by_slot.get(slot // 2)
+                if target is None:
                     continue
-                target = next_round_matches[next_index]
-                updated = False
-                if i % 2 == 0:
-                    if target.team_a_id != m.winner_id:
-                        target.team_a = m.winner
-                        updated = True
-                else:
-                    if target.team_b_id != m.winner_id:
-                        target.team_b = m.winner
-                        updated = True
-                if updated:
-                    target.save(update_fields=["team_a", "team_b"])
+                side = "team_a" if slot % 2 == 0 else "team_b"
+                if _advance_into(target, m, side):
+                    changed[(target.pk, side)] = target
+
+        if changed:
+            _write_sides([(target, side) for (_, side), target in changed.items()])
+            bump_bracket_version(tournament.pk, list({pk for pk, _ in changed}))
 
         finals = by_round.get(max_round, [])
         if len(finals) == 1:
-            fm = finals[0]
-            if fm.status == "finished" and fm.winner_id:
-                if tournament.winner_id != fm.winner_id or tournament.status != "finished":
-                    tournament.winner = fm.winner
-                    tournament.status = "finished"
-                    tournament.end_date = tournament.end_date or fm.scheduled_at
-                    tournament.save(update_fields=["winner", "status", "end_date"])
+            _finish_tournament(tournament, finals[0])
+    return list({m.pk: m for m in changed.values()}.values())
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db.models import F
+from .models import Match, Tournament, match_stamp
+
+SNAPSHOT_TTL = 60 * 60
+
+
+def round_label(r: int, max_r: int) -> str:
+    dist = max_r - r
+    if dist == 0:
+        return "Final"
+    if dist == 1:
+        return "Semi finals"
+    if dist == 2:
+        return "Quarter finals"
+    return f"Round of {2 ** (dist + 1)}"
+
+
+def snapshot_key(tournament_id: int, version: int) -> str:
+    return f"bracket:snapshot:{tournament_id}:{version}"
+
+
+def bump_bracket_version(tournament_id: int, match_ids=(), reset: bool = False):
+    """Invalidate every cached snapshot of the tournament's bracket and stamp the
+    changed matches for delta polling; ``reset`` marks every older match as gone."""
+    stamp = match_stamp()
+    if match_ids:
+        Match.objects.filter(pk__in=match_ids).update(**stamp)
+    also = {"matches_reset_version": stamp["version"]} if reset else {}
+    Tournament.objects.filter(pk=tournament_id).update(bracket_version=F("bracket_version") + 1, **also)
+
+
+def _team(team):
+    if team is None:
+        return None
+    return {
+        "id": team.id,
+        "name": team.name,
+        "tag": team.tag,
+        "logo": {"url": team.logo.url} if team.logo else None,
+    }
+
+
+def serialize_match(m) -> dict:
+    return {
+        "id": m.id,
+        "tournament_id": m.tournament_id,
+        "round": m.round,
+        "slot": m.slot,
+        "status": m.status,
+        "team_a_id": m.team_a_id,
+        "team_b_id": m.team_b_id,
+        "team_a": _team(m.team_a),
+        "team_b": _team(m.team_b),
+        "score_a": m.score_a,
+        "score_b": m.score_b,
+        "winner_id": m.winner_id,
+    }
+
+
+def build_bracket_snapshot(tournament: Tournament, version: int | None = None) -> dict:
+    matches = (
+        tournament.matches
+        .select_related("team_a", "team_b")
+        .order_by("round", "slot", "id")
+    )
+    by_round = {}
+    for m in matches:
+        by_round.setdefault(m.round, []).append(serialize_match(m))
+    max_round = max(by_round, default=1)
+    return {
+        "tournament_id": tournament.pk,
+        "version": tournament.bracket_version if version is None else version,
+        "rounds": [
+            {"num": r, "label": round_label(r, max_round), "matches": by_round[r]}
+            for r in sorted(by_round)
+        ],
+    }
+
+
+def get_bracket_snapshot(tournament: Tournament) -> dict:
+    """Cached bracket of ``tournament`` at its current ``bracket_version``."""
+    key = snapshot_key(tournament.pk, tournament.bracket_version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_bracket_snapshot(tournament)
+        cache.set(key, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def get_bracket_snapshot_by_id(tournament_id: int) -> dict | None:
+    tournament = Tournament.objects.filter(pk=tournament_id).only("id", "bracket_version").first()
+    if tournament is None:
+        return None
+    return get_bracket_snapshot(tournament)
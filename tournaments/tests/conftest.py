@@ -38,3 +38,32 @@ def two_registered_teams(db, tournament, make_team):
     TournamentTeam.objects.create(tournament=tournament, team=a)
     TournamentTeam.objects.create(tournament=tournament, team=b)
     return (a, b)
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def _fresh_consumer_db_pool():
+    # Pool threads keep their DB connections; don't let them leak into the next test.
+    from tournaments.db_executor import consumer_db_executor
+    yield
+    consumer_db_executor.shutdown()
+
+@pytest.fixture(autouse=True)
+def _fresh_frame_limiter():
+    from tournaments.ratelimit import frame_limiter
+    frame_limiter.reset()
+
+@pytest.fixture(autouse=True)
+def _fresh_query_stats():
+    from tournaments.instrumentation import query_stats
+    query_stats.reset()
+
+@pytest.fixture(autouse=True)
+def _fresh_fragment_cache():
+    from tournaments.veto_protocol import fragment_cache
+    fragment_cache.reset()
@@ -1,3 +1,4 @@
+import time
 import pytest
 from django.utils import timezone
 from django.urls import reverse
@@ -12,9 +13,130 @@ def test_api_tournament_list(client):
     resp = client.get(url)
     assert resp.status_code == 200
     data = resp.json()
-    names = {item["name"] for item in data}
+    names = {item["name"] for item in data["results"]}
     assert {"Alpha Cup", "Beta Cup"} <= names
 
+@pytest.mark.django_db
+def test_api_tournament_list_is_light_paginated_and_sparse(client, make_team, django_assert_num_queries):
+    for i in range(3):
+        t = Tournament.objects.create(name=f"Cup {i}", start_date=timezone.now(), status="running" if i else "upcoming")
+        Match.objects.create(tournament=t, team_a=make_team(f"A{i}", f"A{i}"), team_b=make_team(f"B{i}", f"B{i}"))
+    url = reverse("tournaments:api_tournament_list")
+
+    with django_assert_num_queries(1):
+        page = client.get(url, {"page_size": 2, "fields": "id,name,participants_count"}).json()
+    assert [set(item) for item in page["results"]] == [{"id", "name", "participants_count"}] * 2
+    assert [item["name"] for item in page["results"]] == ["Cup 2", "Cup 1"]
+    rest = client.get(page["next"]).json()
+    assert [item["name"] for item in rest["results"]] == ["Cup 0"] and rest["next"] is None
+
+    running = client.get(url, {"status": "running"}).json()["results"]
+    assert {item["name"] for item in running} == {"Cup 1", "Cup 2"}
+    assert "matches" not in running[0]
+
+@pytest.mark.django_db
+def test_api_tournament_matches_filters_without_n_plus_one(client, make_team, django_assert_num_queries):
+    t = Tournament.objects.create(name="Matches Cup", start_date=timezone.now())
+    teams = [make_team(f"Team {i}", f"T{i}") for i in range(4)]
+    r1 = [
+        Match.objects.create(tournament=t, round=1, slot=0, team_a=teams[0], team_b=teams[1], status="finished"),
+        Match.objects.create(tournament=t, round=1, slot=1, team_a=teams[2], team_b=teams[3]),
+    ]
+    final = Match.objects.create(tournament=t, round=2, slot=0)
+    url = reverse("tournaments:api_tournament_matches", args=[t.pk])
+
+    with django_assert_num_queries(2):
+        data = client.get(url).json()
+    assert [m["id"] for m in data["results"]] == [r1[0].id, r1[1].id, final.id]
+    assert data["results"][0]["team_a"] == {"id": teams[0].id, "name": "Team 0", "tag": "T0"}
+
+    assert [m["id"] for m in client.get(url, {"round": 1, "status": "scheduled"}).json()["results"]] == [r1[1].id]
+    sparse = client.get(url, {"round": 2, "fields": "id,status"}).json()["results"]
+    assert sparse == [{"id": final.id, "status": "scheduled"}]
+    assert client.get(reverse("tournaments:api_tournament_matches", args=[t.pk + 100])).status_code == 404
+
+@pytest.mark.django_db
+def test_api_tournament_matches_since_returns_only_changed_matches(client, make_team, settings):
+    from tournaments.models import MAP_POOL
+    from tournaments.services import advance_bracket, generate_full_bracket, set_match_result
+
+    settings.MATCHES_DELTA_WINDOW = 0
+
+    def next_tick():
+        # Versions come from the database clock, which SQLite keeps in milliseconds.
+        time.sleep(0.002)
+
+    t = Tournament.objects.create(name="Delta Cup", start_date=timezone.now(), max_teams=4)
+    for i in range(4):
+        t.register_team(make_team(f"Team {i}", f"D{i}"))
+    generate_full_bracket(t)
+    url = reverse("tournaments:api_tournament_matches", args=[t.pk])
+
+    full = client.get(url, {"since": 0}).json()
+    assert full["reset"] is True
+    assert len(full["results"]) == 3
+    version = full["version"]
+    assert client.get(url, {"since": version}).json()["results"] == []
+
+    semi = Match.objects.filter(tournament=t, round=1).order_by("slot").first()
+    next_tick()
+    set_match_result(semi, 2, 0)
+    advance_bracket(semi)
+    delta = client.get(url, {"since": version}).json()
+    final = Match.objects.get(tournament=t, round=2)
+    assert {m["id"] for m in delta["results"]} == {semi.id, final.id}
+    assert delta["reset"] is False
+    assert delta["version"] >= max(m["version"] for m in delta["results"]) > version
+    version = delta["version"]
+
+    other = Match.objects.get(tournament=t, round=1, slot=1)
+    next_tick()
+    other.start_veto()
+    other.ban_map(MAP_POOL[0][0], other.team_a)
+    delta = client.get(url, {"since": version}).json()
+    assert [m["id"] for m in delta["results"]] == [other.id]
+    assert delta["version"] >= delta["results"][0]["version"] > version
+
+    next_tick()
+    generate_full_bracket(t)
+    delta = client.get(url, {"since": delta["version"]}).json()
+    assert delta["reset"] is True
+    assert {m["id"] for m in delta["results"]} == set(Match.objects.filter(tournament=t).values_list("id", flat=True))
+    assert other.id not in {m["id"] for m in delta["results"]}
+    assert client.get(url, {"since": delta["version"]}).json()["reset"] is False
+
+@pytest.mark.django_db
+def test_api_tournament_matches_since_repeats_changes_inside_the_window(client, make_team, settings):
+    from tournaments.services import generate_full_bracket
+
+    settings.MATCHES_DELTA_WINDOW = 60
+    t = Tournament.objects.create(name="Window Cup", start_date=timezone.now(), max_teams=2)
+    for i in range(2):
+        t.register_team(make_team(f"Team {i}", f"W{i}"))
+    generate_full_bracket(t)
+    url = reverse("tournaments:api_tournament_matches", args=[t.pk])
+    version = client.get(url, {"since": 0}).json()["version"]
+
+    # A change stamped inside the window may still be committing elsewhere: it is sent again.
+    match = Match.objects.get(tournament=t)
+    match.start_veto()
+    delta = client.get(url, {"since": version}).json()
+    assert [m["id"] for m in delta["results"]] == [match.id]
+    assert delta["version"] < delta["results"][0]["version"]
+    assert [m["id"] for m in client.get(url, {"since": delta["version"]}).json()["results"]] == [match.id]
+
+@pytest.mark.django_db
+def test_match_versions_come_from_the_database_clock(make_team, monkeypatch):
+    t = Tournament.objects.create(name="Skew Cup", start_date=timezone.now())
+    m = Match.objects.create(tournament=t, team_a=make_team("Team A", "SKA"), team_b=make_team("Team B", "SKB"))
+    # This app server's clock runs an hour fast; the stamp must not follow it.
+    skewed = timezone.now() + timezone.timedelta(hours=1)
+    monkeypatch.setattr(timezone, "now", lambda: skewed)
+    m.start_veto()
+    m.refresh_from_db()
+    assert abs(m.version - time.time_ns() // 1000) < 60_000_000
+    assert abs((m.updated_at - skewed).total_seconds() + 3600) < 60
+
 @pytest.mark.django_db
 def test_api_tournament_detail_includes_matches(client, make_team):
     t = Tournament.objects.create(name="Detail Cup", start_date=timezone.now())
@@ -63,4 +185,20 @@ def test_api_report_match_validation_error_returns_400(client, staff, make_team)
     resp = client.post(url, data=payload, content_type="application/json")
     assert resp.status_code == 400
     data = resp.json()
-    assert "score_b" in data
\ No newline at end of file
+    assert "score_b" in data
+
+@pytest.mark.django_db
+def test_api_report_match_advances_winner(client, staff, make_team):
+    t = Tournament.objects.create(name="Advance Cup", start_date=timezone.now())
+    a = make_team("Alpha")
+    b = make_team("Bravo")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, round=1, slot=1)
+    Match.objects.create(tournament=t, round=1, slot=0)
+    final = Match.objects.create(tournament=t, round=2, slot=0)
+
+    client.force_login(staff)
+    url = reverse("tournaments:api_report_match", args=[t.pk])
+    resp = client.post(url, data={"match_id": m.id, "score_a": 3, "score_b": 16}, content_type="application/json")
+    assert resp.status_code == 200
+    final.refresh_from_db()
+    assert final.team_b_id == b.id
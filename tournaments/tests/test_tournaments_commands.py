@@ -0,0 +1,79 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from teams.models import Team
+from tournaments.models import Tournament, TournamentTeam, Match
+
+pytestmark = pytest.mark.django_db
+
+
+def _drifted(make_team, name, status="running"):
+    t = Tournament.objects.create(name=name, start_date=timezone.now(), status=status)
+    a = make_team(f"{name}A", f"{name}A"); b = make_team(f"{name}B", f"{name}B")
+    Match.objects.create(tournament=t, round=1, slot=0, team_a=a, team_b=b, status="finished", winner=a)
+    Match.objects.create(tournament=t, round=1, slot=1)
+    final = Match.objects.create(tournament=t, round=2, slot=0)
+    return t, a, final
+
+
+def test_reconcile_brackets_fixes_running_tournaments_only(make_team):
+    t, a, final = _drifted(make_team, "Run")
+    _, _, upcoming_final = _drifted(make_team, "Up", status="upcoming")
+
+    out = StringIO()
+    call_command("reconcile_brackets", stdout=out)
+
+    final.refresh_from_db(); upcoming_final.refresh_from_db()
+    assert final.team_a_id == a.id
+    assert upcoming_final.team_a_id is None
+    assert "Reconciled 1 tournament(s)" in out.getvalue()
+
+
+def test_reconcile_brackets_by_id_and_noop_second_run(make_team):
+    t, a, final = _drifted(make_team, "Ids", status="upcoming")
+    call_command("reconcile_brackets", str(t.id), stdout=StringIO())
+    final.refresh_from_db()
+    assert final.team_a_id == a.id
+
+    out = StringIO()
+    call_command("reconcile_brackets", "--all", stdout=out)
+    assert "Reconciled 0 tournament(s)" in out.getvalue()
+
+
+def test_reconcile_participants_fixes_drifted_counters(make_team):
+    drifted = Tournament.objects.create(name="Drift", start_date=timezone.now())
+    TournamentTeam.objects.bulk_create(
+        TournamentTeam(tournament=drifted, team=make_team(f"D{i}", f"D{i}")) for i in range(3)
+    )
+    ok = Tournament.objects.create(name="Ok", start_date=timezone.now())
+    TournamentTeam.objects.create(tournament=ok, team=make_team("Okay", "OK"))
+    emptied = Tournament.objects.create(name="Emptied", start_date=timezone.now())
+    Tournament.objects.filter(pk=emptied.pk).update(participants_count=5)
+
+    out = StringIO()
+    call_command("reconcile_participants", stdout=out)
+
+    counts = dict(Tournament.objects.values_list("name", "participants_count"))
+    assert counts == {"Drift": 3, "Ok": 1, "Emptied": 0}
+    assert "Reconciled 2 tournament(s)" in out.getvalue()
+
+
+def test_bench_bracket_reports_each_size():
+    out = StringIO()
+    call_command("bench_bracket", "--sizes", "4", "8", stdout=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].split() == ["teams", "matches", "queries", "ms"]
+    assert [l.split()[:2] for l in lines[1:]] == [["4", "3"], ["8", "7"]]
+    assert not Tournament.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_veto_reports_both_executors_and_cleans_up():
+    out = StringIO()
+    call_command("bench_veto", "--matches", "1", stdout=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].split() == ["executor", "p50", "ms", "p95", "ms", "max", "ms"]
+    assert [l.split()[0] for l in lines[1:3]] == ["shared", "pool"]
+    assert not Tournament.objects.exists()
+    assert not Team.objects.exists()
@@ -4,6 +4,11 @@ import pytest
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from tournaments.models import BanResult
+from tournaments.ratelimit import frame_limiter
+from tournaments.replay import stamp
+from tournaments.veto_protocol import fragment_cache
+
 pytestmark = pytest.mark.asyncio
 
 class DummyChannelLayer:
@@ -34,7 +39,6 @@ def make_fake_match(
     team_a=None,
     team_b=None,
     final_map_code=None,
-    auto_ban_changed=False,
     ban_ok=True,
     ban_count=0,
     bans=None,
@@ -46,9 +50,11 @@ def make_fake_match(
     fake.team_a = team_a
     fake.team_b = team_b
     fake.final_map_code = final_map_code
-    fake.auto_ban_if_expired = MagicMock(return_value=auto_ban_changed)
-    fake.ban_map = MagicMock(return_value=ban_ok)
+    fake.veto_state = "running"
+    fake.veto_deadline = None
+    fake.apply_ban = MagicMock(return_value=BanResult.APPLIED if ban_ok else BanResult.STALE)
     fake.map_bans = FakeMapBans(count=ban_count, bans=bans or [])
+    fake.ban_count = ban_count
     return fake
 
 
@@ -63,6 +69,7 @@ def scope_base():
 
 import importlib
 consumers = importlib.import_module("tournaments.consumers") 
+from tournaments import veto_protocol
 
 
 async def test_bracket_consumer_connect_disconnect_and_update(channel_layer, scope_base, monkeypatch):
@@ -75,39 +82,38 @@ async def test_bracket_consumer_connect_disconnect_and_update(channel_layer, sco
     consumer.accept = AsyncMock()
     consumer.send = AsyncMock()
 
-    fake_match = make_fake_match()
-    monkeypatch.setattr(consumer, "get_match", AsyncMock(return_value=fake_match))
+    monkeypatch.setattr(consumer, "get_snapshot", AsyncMock(return_value={"version": 3, "rounds": []}))
 
-    with patch("tournaments.consumers.render_to_string", return_value="<div>html</div>") as rts:
+    with patch("tournaments.veto_protocol.render_to_string", return_value="<div>html</div>") as rts:
         await consumer.connect()
         assert ("tournament_1", "ch123") in channel_layer.added
+        snap = json.loads(consumer.send.call_args.kwargs["text_data"])
+        assert snap == {"type": "bracket_snapshot", "version": 3, "rounds": []}
         consumer.group_name = f"tournament_{scope['url_route']['kwargs']['tournament_id']}"
-        await consumer.bracket_update({"match_id": 777})
+        await consumer.bracket_update({"match_id": 777, "html": "<div>html</div>"})
         consumer.send.assert_awaited()
         payload = json.loads(consumer.send.call_args.kwargs["text_data"])
         assert payload["type"] == "bracket_update"
         assert payload["match_id"] == 777
         assert payload["html"] == "<div>html</div>"
-        rts.assert_called()
+        rts.assert_not_called()
         await consumer.disconnect(1000)
         assert ("tournament_1", "ch123") in channel_layer.discarded
 
 
-async def test_bracket_consumer_get_match_sync_to_async(monkeypatch):
-    fake_get_called = {"ok": False}
-    class _Sel:
-        def get(self, pk):
-            fake_get_called["ok"] = (pk == 5)
-            return "MATCH"
-    class _Mgr:
-        def select_related(self, *args, **kwargs):
-            return _Sel()
-    class _Match:
-        objects = _Mgr()
-    monkeypatch.setattr(consumers, "Match", _Match)
-    got = await consumers.BracketConsumer(None).get_match(5)
-    assert got == "MATCH"
-    assert fake_get_called["ok"] is True
+async def test_bracket_update_forwards_payload_without_db_or_render(channel_layer, scope_base):
+    # No django_db mark: pytest-django fails any query made inside the handler.
+    consumer = consumers.BracketConsumer(scope=scope_base)
+    consumer.channel_layer = channel_layer
+    consumer.channel_name = "ch1"
+    consumer.send = AsyncMock()
+    match = {"id": 5, "score_a": 16, "score_b": 3}
+
+    with patch("tournaments.veto_protocol.render_to_string", side_effect=AssertionError("rendered")):
+        await consumer.bracket_update({"type": "bracket_update", "match_id": 5, "html": "<m/>", "match": match, "seq": 7})
+
+    payload = json.loads(consumer.send.call_args.kwargs["text_data"])
+    assert payload == {"type": "bracket_update", "match_id": 5, "html": "<m/>", "match": match, "seq": 7}
 
 async def test_matches_consumer_flow(channel_layer, scope_base, capsys):
     scope = {**scope_base}
@@ -121,9 +127,9 @@ async def test_matches_consumer_flow(channel_layer, scope_base, capsys):
     await consumer.connect()
     assert ("tournament_matches_1", "ch456") in channel_layer.added
 
-    await consumer.matches_update({"action": "created", "message": "ok"})
+    await consumer.matches_update({"action": "created", "message": "ok", "seq": 2})
     payload = json.loads(consumer.send.call_args.kwargs["text_data"])
-    assert payload == {"type": "matches_update", "action": "created", "message": "ok"}
+    assert payload == {"type": "matches_update", "action": "created", "message": "ok", "seq": 2}
 
     await consumer.disconnect(1000)
     assert ("tournament_matches_1", "ch456") in channel_layer.discarded
@@ -145,23 +151,25 @@ async def _setup_match_consumer(monkeypatch, channel_layer, scope):
     c.send = AsyncMock()
     fake_match = make_fake_match()
     monkeypatch.setattr(c, "_get_match", AsyncMock(return_value=fake_match))
-    monkeypatch.setattr(c, "_ban_count", AsyncMock(side_effect=lambda m: m.map_bans.count()))
-    monkeypatch.setattr(c, "_get_bans", AsyncMock(side_effect=lambda m: list(m.map_bans.order_by("order"))))
+    monkeypatch.setattr(consumers, "veto_scheduler", SimpleNamespace(ensure=AsyncMock(), schedule=MagicMock()))
     await c.connect()
 
     return c, fake_match
 
 
-async def test_match_consumer_connect_disconnect(channel_layer):
+async def test_match_consumer_connect_disconnect(monkeypatch, channel_layer):
     scope = _make_scope_for_match()
     c = consumers.MatchConsumer(scope=scope)
     c.scope = scope
     c.channel_layer = channel_layer
     c.channel_name = "ch789"
     c.accept = AsyncMock()
+    scheduler = SimpleNamespace(ensure=AsyncMock(), schedule=MagicMock())
+    monkeypatch.setattr(consumers, "veto_scheduler", scheduler)
 
     await c.connect()
     assert ("match_42", "ch789") in channel_layer.added
+    scheduler.ensure.assert_awaited_once_with(42)
     await c.disconnect(1000)
     assert ("match_42", "ch789") in channel_layer.discarded
 
@@ -178,26 +186,14 @@ async def test_match_consumer_receive_unknown_type_ignored(monkeypatch, channel_
     c.send.assert_not_called()
 
 
-async def test_match_consumer_heartbeat_no_change(monkeypatch, channel_layer):
-    c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
-    match.auto_ban_if_expired.return_value = False
+async def test_match_consumer_heartbeat_is_noop_without_db(monkeypatch, channel_layer):
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
     await c.receive(json.dumps({"type": "heartbeat"}))
+    c._get_match.assert_not_awaited()
+    c.send.assert_not_called()
     assert channel_layer.sent == []
 
 
-async def test_match_consumer_heartbeat_with_change_broadcast(monkeypatch, channel_layer):
-    c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
-    match.auto_ban_if_expired.return_value = True
-
-    with patch("tournaments.consumers.render_to_string", return_value="<x/>"), \
-         patch("tournaments.consumers.get_available_maps", return_value=["de_inferno", "de_mirage"]):
-        await c.receive(json.dumps({"type": "heartbeat"}))
-        assert channel_layer.sent
-        name, message = channel_layer.sent[-1]
-        assert name == "match_42"
-        assert message["type"] == "match_update"
-
-
 async def test_match_consumer_ban_map_no_map_ignored(monkeypatch, channel_layer):
     c, _ = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
     await c.receive(json.dumps({"type": "ban_map"}))
@@ -237,12 +233,14 @@ async def test_match_consumer_ban_map_bad_ok_false(monkeypatch, channel_layer):
     ))
     match.team_a.captain_id = 10
     match.map_bans = FakeMapBans(count=0)
-    match.ban_map.return_value = False
+    match.apply_ban.return_value = BanResult.NOT_YOUR_TURN
 
     await c.receive(json.dumps({"type": "ban_map", "map_name": "de_ancient"}))
     payload = json.loads(c.send.call_args.kwargs["text_data"])
     assert payload["type"] == "error"
-    assert "This map is no longer available for banning or it is not your turn" in payload["message"]
+    assert payload["code"] == "not_your_turn"
+    assert payload["message"] == BanResult.NOT_YOUR_TURN.label
+    assert channel_layer.sent == []
 
 
 async def test_match_consumer_ban_map_success_broadcast(monkeypatch, channel_layer):
@@ -250,42 +248,98 @@ async def test_match_consumer_ban_map_success_broadcast(monkeypatch, channel_lay
     c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match(user=user))
     match.team_a.captain_id = 10
     match.map_bans = FakeMapBans(count=0)
-    match.ban_map.return_value = True
+    match.apply_ban.return_value = BanResult.APPLIED
+    monkeypatch.setattr(consumers, "veto_state_event", lambda m: {"type": "veto_state", "state": {"v": 1, "turn": 2}})
 
-    with patch("tournaments.consumers.render_to_string", return_value="<ok/>"), \
-         patch("tournaments.consumers.get_available_maps", return_value=["de_mirage", "de_overpass"]):
+    with patch("tournaments.veto_protocol.render_to_string") as rts:
         await c.receive(json.dumps({"type": "ban_map", "map_name": "de_overpass"}))
-        assert channel_layer.sent, "ожидали broadcast после удачного бана"
-        last = channel_layer.sent[-1][1]
-        assert last["type"] == "match_update"
+    assert channel_layer.sent == [("match_42", {"type": "veto_state", "state": {"v": 1, "turn": 2}, "seq": 1})]
+    rts.assert_not_called()
+    consumers.veto_scheduler.schedule.assert_called_once_with(42, match.veto_deadline)
 
 
-async def test_match_consumer_broadcast_final_map_from_code(monkeypatch, channel_layer):
+async def test_match_consumer_html_fallback_final_map_from_code(monkeypatch, channel_layer):
     c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
     match.final_map_code = "de_cbble"
     match.map_bans = FakeMapBans(count=1)
-    monkeypatch.setattr(consumers, "MAP_POOL", (("de_cbble", "Cobblestone"),))
-    with patch("tournaments.consumers.render_to_string", return_value="<X/>") as rts, \
-         patch("tournaments.consumers.get_available_maps", return_value=["de_cbble", "de_dust2"]):
-        await c._broadcast_update()
-        assert channel_layer.sent[-1][1]["type"] == "match_update"
+    match.ban_count = 1
+    monkeypatch.setattr(veto_protocol, "MAP_POOL", (("de_cbble", "Cobblestone"),))
+    with patch("tournaments.veto_protocol.render_to_string", return_value="<X/>") as rts, \
+         patch("tournaments.veto_protocol.get_available_maps", return_value=["de_cbble", "de_dust2"]):
+        await c._send_html()
+        assert json.loads(c.send.call_args.kwargs["text_data"])["type"] == "match_update"
         assert rts.call_count >= 2
 
 
-async def test_match_consumer_broadcast_final_map_when_one_left(monkeypatch, channel_layer):
+async def test_match_consumer_html_fallback_final_map_when_one_left(monkeypatch, channel_layer):
     c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
     match.final_map_code = None
     match.map_bans = FakeMapBans(count=6)
-    monkeypatch.setattr(consumers, "MAP_POOL", (("de_train", "Train"),))
-    with patch("tournaments.consumers.render_to_string", return_value="<Y/>") as rts, \
-         patch("tournaments.consumers.get_available_maps", return_value=["de_train"]):
-        await c._broadcast_update()
-        sent = channel_layer.sent[-1][1]
+    match.ban_count = 6
+    monkeypatch.setattr(veto_protocol, "MAP_POOL", (("de_train", "Train"),))
+    with patch("tournaments.veto_protocol.render_to_string", return_value="<Y/>") as rts, \
+         patch("tournaments.veto_protocol.get_available_maps", return_value=["de_train"]):
+        await c._send_html()
+        sent = json.loads(c.send.call_args.kwargs["text_data"])
         assert sent["type"] == "match_update"
         assert sent["show_veto_btn"] is True
         assert rts.call_count >= 2
 
 
+async def test_match_consumer_forwards_veto_state_to_protocol_clients(monkeypatch, channel_layer):
+    scope = {**_make_scope_for_match(), "query_string": b"v=1"}
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, scope)
+    state = {"v": 1, "match_id": 42, "available": 5, "turn": 1}
+
+    await c.veto_state({"type": "veto_state", "state": state, "seq": 3})
+
+    assert json.loads(c.send.call_args.kwargs["text_data"]) == {"type": "veto_state", **state, "seq": 3}
+    c._get_match.assert_not_awaited()
+
+
+async def test_match_consumer_renders_html_for_legacy_clients(monkeypatch, channel_layer):
+    scope = {**_make_scope_for_match(), "query_string": b"v=99"}
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, scope)
+
+    with patch("tournaments.veto_protocol.render_to_string", return_value="<h/>"), \
+         patch("tournaments.veto_protocol.get_available_maps", return_value=["de_mirage", "de_nuke"]):
+        await c.veto_state({"type": "veto_state", "state": {"v": 1}})
+        await c.receive(json.dumps({"type": "veto_html"}))
+
+    payloads = [json.loads(call.kwargs["text_data"]) for call in c.send.call_args_list]
+    assert [p["type"] for p in payloads] == ["match_update", "match_update"]
+    assert payloads[0]["html"] == "<h/>" and payloads[0]["show_veto_btn"] is False
+    assert channel_layer.sent == []
+
+
+async def test_match_consumer_renders_fragments_once_per_veto_step(monkeypatch, channel_layer):
+    legacy = [(await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match()))[0] for _ in range(3)]
+    proto, _ = await _setup_match_consumer(monkeypatch, channel_layer, {**_make_scope_for_match(), "query_string": b"v=1"})
+    event = {"type": "veto_state", "state": {"v": 1, "bans": [["de_nuke", 1, "ban"]], "final_map": "de_inferno"}, "seq": 4}
+
+    with patch("tournaments.veto_protocol.render_to_string", return_value="<h/>") as rts, \
+         patch("tournaments.veto_protocol.get_available_maps", return_value=["de_inferno"]):
+        for c in (*legacy, proto):
+            await c.veto_state(event)
+    assert rts.call_count == 2
+    assert fragment_cache.stats()["renders"] == 1
+
+    for c in legacy:
+        assert [json.loads(call.kwargs["text_data"]) for call in c.send.call_args_list] == [
+            {"type": "match_update", "html": "<h/>", "veto_html": "<h/>", "show_veto_btn": True, "seq": 4},
+        ]
+    assert [json.loads(call.kwargs["text_data"])["type"] for call in proto.send.call_args_list] == [
+        "veto_state", "match_update",
+    ]
+
+    # Mid-veto, protocol clients patch the page themselves and nothing is rendered.
+    proto.send.reset_mock()
+    with patch("tournaments.veto_protocol.render_to_string") as rts:
+        await proto.veto_state({"type": "veto_state", "state": {"v": 1, "bans": [], "final_map": None}})
+    rts.assert_not_called()
+    assert [json.loads(call.kwargs["text_data"])["type"] for call in proto.send.call_args_list] == ["veto_state"]
+
+
 async def test_match_consumer_match_update_sends(channel_layer):
     c = consumers.MatchConsumer(scope=_make_scope_for_match())
     c.channel_layer = channel_layer
@@ -325,20 +379,107 @@ async def test_match_consumer__get_match_hits_orm(monkeypatch):
     assert called["pk"] == 99
 
 
-async def test_match_consumer__ban_count_counts():
-    fake_match = SimpleNamespace(map_bans=FakeMapBans(count=3))
-    c = consumers.MatchConsumer(scope=_make_scope_for_match())
-    assert await c._ban_count(fake_match) == 3
+async def test_bracket_batch_update_forwards_all_updates(channel_layer, scope_base):
+    consumer = consumers.BracketConsumer(scope=scope_base)
+    consumer.channel_layer = channel_layer
+    consumer.send = AsyncMock()
+    updates = [{"match_id": 1, "html": "<a/>"}, {"match_id": 2, "html": "<b/>"}]
 
+    await consumer.bracket_batch_update({"type": "bracket_batch_update", "updates": updates, "seq": 9})
 
-async def test_match_consumer__get_bans_returns_list():
-    expected = ["b1", "b2"]
-    class _Bans(FakeMapBans):
-        def select_related(self, *args, **kwargs):
-            return self
-        def order_by(self, *args, **kwargs):
-            return expected
+    consumer.send.assert_awaited_once()
+    payload = json.loads(consumer.send.call_args.kwargs["text_data"])
+    assert payload == {"type": "bracket_batch_update", "updates": updates, "seq": 9}
 
-    fake_match = SimpleNamespace(map_bans=_Bans(count=2))
-    c = consumers.MatchConsumer(scope=_make_scope_for_match())
-    assert await c._get_bans(fake_match) == expected
+
+async def test_bracket_consumer_resume_replays_missed_events(channel_layer, scope_base, monkeypatch):
+    for match_id in (1, 2, 3):
+        stamp("tournament_1", {"type": "bracket_update", "match_id": match_id, "html": f"<{match_id}/>"})
+    scope = {**scope_base, "query_string": b"resume_from=1"}
+    consumer = consumers.BracketConsumer(scope=scope)
+    consumer.scope = scope
+    consumer.channel_layer = channel_layer
+    consumer.channel_name = "ch"
+    consumer.accept = AsyncMock()
+    consumer.send = AsyncMock()
+    monkeypatch.setattr(consumer, "get_snapshot", AsyncMock(side_effect=AssertionError("snapshot")))
+
+    await consumer.connect()
+
+    payloads = [json.loads(call.kwargs["text_data"]) for call in consumer.send.call_args_list]
+    assert [(p["type"], p["match_id"], p["seq"]) for p in payloads] == [
+        ("bracket_update", 2, 2), ("bracket_update", 3, 3),
+    ]
+
+
+async def test_bracket_consumer_resume_falls_back_to_snapshot(channel_layer, scope_base, monkeypatch):
+    stamp("tournament_1", {"type": "bracket_update", "match_id": 1})
+    scope = {**scope_base, "query_string": b"resume_from=5"}
+    consumer = consumers.BracketConsumer(scope=scope)
+    consumer.scope = scope
+    consumer.channel_layer = channel_layer
+    consumer.channel_name = "ch"
+    consumer.accept = AsyncMock()
+    consumer.send = AsyncMock()
+    monkeypatch.setattr(consumer, "get_snapshot", AsyncMock(return_value={"version": 2, "rounds": [], "seq": 1}))
+
+    await consumer.connect()
+
+    consumer.send.assert_awaited_once()
+    assert json.loads(consumer.send.call_args.kwargs["text_data"])["type"] == "bracket_snapshot"
+
+
+async def test_match_consumer_resume_sends_latest_state_only(monkeypatch, channel_layer):
+    for turn in (1, 2, 1):
+        stamp("match_42", {"type": "veto_state", "state": {"v": 1, "turn": turn}})
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, {**_make_scope_for_match(), "query_string": b"v=1"})
+    c.scope["query_string"] = b"v=1&resume_from=0"
+    c.send.reset_mock()
+    monkeypatch.setattr(c, "_state_snapshot", AsyncMock(side_effect=AssertionError("snapshot")))
+
+    await c.connect()
+
+    c.send.assert_awaited_once()
+    assert json.loads(c.send.call_args.kwargs["text_data"]) == {"type": "veto_state", "v": 1, "turn": 1, "seq": 3}
+
+
+async def test_match_consumer_resume_gap_sends_state_snapshot(monkeypatch, channel_layer):
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, {**_make_scope_for_match(), "query_string": b"v=1"})
+    c.scope["query_string"] = b"v=1&resume_from=8"
+    snapshot = {"type": "veto_state", "state": {"v": 1, "turn": 2}, "seq": 0}
+    monkeypatch.setattr(c, "_state_snapshot", AsyncMock(return_value=snapshot))
+
+    await c.connect()
+
+    assert json.loads(c.send.call_args.kwargs["text_data"]) == {"type": "veto_state", "v": 1, "turn": 2, "seq": 0}
+
+
+async def test_match_consumer_rate_limits_frames_before_db(monkeypatch, channel_layer, settings):
+    settings.WS_FRAME_RATE = 0
+    settings.WS_FRAME_BURST = 2
+    user = SimpleNamespace(is_authenticated=True, id=10, is_staff=False)
+    c, match = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match(user=user))
+    match.apply_ban.return_value = BanResult.STALE
+
+    for _ in range(5):
+        await c.receive(json.dumps({"type": "ban_map", "map_name": "de_nuke"}))
+
+    assert c._get_match.await_count == 2
+    codes = [json.loads(call.kwargs["text_data"])["code"] for call in c.send.call_args_list]
+    assert codes == ["stale", "stale", "rate_limited", "rate_limited", "rate_limited"]
+    assert frame_limiter.stats()["dropped"] == {"rate_limited": 3}
+
+
+async def test_match_consumer_rejects_bad_and_anonymous_ban_frames_without_db(monkeypatch, channel_layer):
+    c, _ = await _setup_match_consumer(monkeypatch, channel_layer, _make_scope_for_match())
+
+    await c.receive("not json")
+    await c.receive(json.dumps(["ban_map"]))
+    await c.receive(json.dumps({"type": "ban_map", "map_name": "de_nowhere"}))
+    await c.receive(json.dumps({"type": "ban_map", "map_name": "x" * 2000}))
+    await c.receive(json.dumps({"type": "ban_map", "map_name": "de_nuke"}))
+
+    c._get_match.assert_not_awaited()
+    payload = json.loads(c.send.call_args.kwargs["text_data"])
+    assert payload["type"] == "error" and payload["code"] == "unauthenticated"
+    assert frame_limiter.stats()["dropped"] == {"invalid": 4, "unauthenticated": 1}
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import pytest
+from channels.db import DatabaseSyncToAsync
+from django.urls import reverse
+from tournaments.db_executor import ConsumerDBExecutor, consumer_db_executor, db_sync_to_async
+
+
+@pytest.mark.asyncio
+async def test_db_sync_to_async_runs_calls_in_parallel_on_a_bounded_pool(settings):
+    settings.CONSUMER_DB_POOL_SIZE = 3
+    executor = ConsumerDBExecutor()
+    release = threading.Event()
+    threads = set()
+
+    def slow():
+        threads.add(threading.current_thread().name)
+        release.wait(2)
+
+    call = DatabaseSyncToAsync(slow, thread_sensitive=False, executor=executor)
+    tasks = [asyncio.create_task(call()) for _ in range(5)]
+    await asyncio.sleep(0.1)
+
+    stats = executor.stats()
+    assert stats["pool_size"] == 3
+    assert stats["active"] == 3
+    assert stats["queued"] == 2
+    release.set()
+    await asyncio.gather(*tasks)
+
+    stats = executor.stats()
+    assert stats["completed"] == 5 and stats["active"] == 0 and stats["queued"] == 0
+    assert stats["max_queued"] >= 2
+    assert len(threads) == 3 and all(n.startswith("consumer-db") for n in threads)
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_db_sync_to_async_uses_the_shared_consumer_pool():
+    before = consumer_db_executor.stats()["completed"]
+    name = await db_sync_to_async(lambda: threading.current_thread().name)()
+    assert name.startswith("consumer-db")
+    assert consumer_db_executor.stats()["completed"] == before + 1
+
+
+@pytest.mark.django_db
+def test_ops_metrics_reports_pool_stats_to_staff(client, staff, user):
+    url = reverse("tournaments:ops_metrics")
+    client.force_login(user)
+    assert client.get(url).status_code == 302
+    client.force_login(staff)
+    data = client.get(url).json()
+    assert set(data["consumer_db_pool"]) >= {"pool_size", "queued", "active", "completed"}
+    assert set(data["ws_frames"]) == {"accepted", "dropped", "tracked_users"}
+    assert set(data["veto_fragments"]) == {"renders", "hits", "entries"}
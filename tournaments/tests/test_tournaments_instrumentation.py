@@ -0,0 +1,60 @@
+import logging
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from tournaments.db_executor import db_sync_to_async
+from tournaments.instrumentation import instrument_handler, query_stats, record_queries
+from tournaments.models import Tournament
+
+TEMPLATES_OVERRIDE = [{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {
+        "loaders": [("django.template.loaders.locmem.Loader", {
+            "tournaments/tournament_list.html": "{% for t in tournaments %}{{ t.participants.count }}{% endfor %}",
+        })],
+    },
+}]
+
+
+@pytest.mark.django_db
+def test_record_queries_counts_time_duplicates_and_slowest():
+    with record_queries("job") as recorder:
+        Tournament.objects.count()
+        Tournament.objects.count()
+        list(Tournament.objects.all())
+
+    assert recorder.count == 3 and recorder.duplicates == 1
+    assert recorder.slowest and recorder.seconds >= recorder.slowest_seconds > 0
+    stats = query_stats.stats()["job"]
+    assert stats["calls"] == 1 and stats["queries"] == 3 and stats["duplicates"] == 1
+    assert stats["over_budget"] == 0
+
+
+@pytest.mark.django_db
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE, QUERY_BUDGETS={"tournaments:list": 2})
+def test_middleware_records_views_and_warns_over_budget(client, caplog):
+    for i in range(3):
+        Tournament.objects.create(name=f"T{i}", start_date=timezone.now())
+
+    with caplog.at_level(logging.WARNING, logger="tournaments.instrumentation"):
+        assert client.get(reverse("tournaments:list")).status_code == 200
+
+    stats = query_stats.stats()["tournaments:list"]
+    assert stats["calls"] == 1 and stats["queries"] >= 4
+    assert stats["duplicates"] >= 2 and stats["over_budget"] == 1
+    assert "tournaments:list ran" in caplog.text and "budget 2" in caplog.text
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_instrument_handler_records_queries_made_on_the_pool():
+    @instrument_handler
+    async def handler():
+        await db_sync_to_async(Tournament.objects.count)()
+        await db_sync_to_async(Tournament.objects.count)()
+
+    await handler()
+
+    (label, stats), = query_stats.stats().items()
+    assert label.startswith("ws:") and label.endswith("handler")
+    assert stats["queries"] == 2 and stats["duplicates"] == 1
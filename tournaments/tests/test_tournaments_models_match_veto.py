@@ -1,6 +1,11 @@
+import asyncio
+import time
 import pytest
+from django.db import OperationalError
 from django.utils import timezone
-from tournaments.models import Tournament, Match, MAP_POOL, MapBan
+import random
+from tournaments.db_executor import db_sync_to_async
+from tournaments.models import Tournament, Match, MAP_POOL, MapBan, BanResult
 
 @pytest.mark.django_db
 def test_start_veto_sets_state_deadline_and_turn_A(make_team):
@@ -69,3 +74,145 @@ def test_connect_string_property(make_team):
     b = make_team("Bravo")
     m = Match.objects.create(tournament=t, team_a=a, team_b=b, server_addr="10.0.0.1:27015")
     assert m.connect_string == "connect 10.0.0.1:27015"
+
+
+@pytest.mark.django_db
+def test_ban_map_keeps_bitmask_and_counter_on_the_row(make_team, django_assert_num_queries):
+    t = Tournament.objects.create(name="Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=30)
+    m.start_veto()
+    code = MAP_POOL[2][0]
+
+    with django_assert_num_queries(0):
+        assert m.current_team == a
+        assert code in m.available_map_codes()
+    # Conditional UPDATE (which also stamps the match) + audit INSERT, inside a savepoint;
+    # the tournament row is not touched.
+    with django_assert_num_queries(4) as ctx:
+        assert m.ban_map(code, a) is True
+    assert not [q for q in ctx.captured_queries if "tournaments_tournament" in q["sql"]]
+
+    stale = Match.objects.get(pk=m.pk)
+    assert stale.banned_mask == 1 << 2 and stale.ban_count == 1
+    with django_assert_num_queries(0):
+        assert m.current_team == b
+        assert code not in m.available_map_codes()
+
+    MapBan.objects.create(match=stale, team=b, map_name=MAP_POOL[0][0], order=2)
+    m.save()
+    m.refresh_from_db()
+    assert m.ban_count == 2
+    assert m.banned_mask == (1 << 2) | 1
+
+
+@pytest.mark.django_db
+def test_apply_ban_returns_typed_results(make_team):
+    t = Tournament.objects.create(name="Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=30)
+    code = MAP_POOL[0][0]
+
+    assert m.apply_ban(code, a) is BanResult.FINISHED
+    m.start_veto()
+    assert m.apply_ban(code, b) is BanResult.NOT_YOUR_TURN
+    assert m.apply_ban("de_not_exists", a) is BanResult.STALE
+
+    stale = Match.objects.get(pk=m.pk)
+    assert m.apply_ban(code, a) is BanResult.APPLIED
+    assert stale.apply_ban(MAP_POOL[1][0], a) is BanResult.STALE
+    assert stale.ban_count == 1 and stale.veto_turn == "B"
+    assert stale.apply_ban(MAP_POOL[1][0], b) is BanResult.APPLIED
+
+
+@pytest.mark.django_db
+def test_expired_turn_is_auto_banned_once_from_stale_instances(make_team):
+    t = Tournament.objects.create(name="Cup", start_date=timezone.now())
+    m = Match.objects.create(tournament=t, team_a=make_team("Alpha", tag="ALP"), team_b=make_team("Bravo", tag="BRV"), veto_timeout=30)
+    m.start_veto()
+    first, second = Match.objects.get(pk=m.pk), Match.objects.get(pk=m.pk)
+    later = m.veto_deadline + timezone.timedelta(seconds=1)
+
+    assert first.auto_ban_if_expired(now=later) is True
+    assert second.auto_ban_if_expired(now=later) is False
+    assert MapBan.objects.filter(match=m).count() == 1
+
+
+@pytest.mark.django_db
+def test_hundreds_of_racing_bans_apply_one_step_per_state(make_team):
+    t = Tournament.objects.create(name="Stress Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=30)
+    m.start_veto()
+    rng = random.Random(7)
+    results = []
+
+    # Every racer reads the row before any of its batch writes, as concurrent consumers would;
+    # captain clicks and timer expiries are then applied in random order.
+    for _ in range(10):
+        racers = [Match.objects.select_related("team_a", "team_b").get(pk=m.pk) for _ in range(30)]
+        rng.shuffle(racers)
+        for i, racer in enumerate(racers):
+            if i % 5 == 0:
+                later = timezone.now() + timezone.timedelta(seconds=60)
+                results.append(BanResult.APPLIED if racer.auto_ban_if_expired(now=later) else BanResult.STALE)
+            else:
+                results.append(racer.apply_ban(rng.choice(MAP_POOL)[0], rng.choice([a, b])))
+
+    m.refresh_from_db()
+    bans = list(m.map_bans.order_by("order"))
+    assert len(results) == 300
+    assert results.count(BanResult.APPLIED) == len(bans) == m.ban_count == len(MAP_POOL) - 1
+    assert [ban.order for ban in bans] == list(range(1, len(bans) + 1))
+    assert [ban.team_id for ban in bans] == [(a, b)[i % 2].id for i in range(len(bans))]
+    assert m.veto_state == "done"
+    assert m.final_map_code == m.unbanned_map_codes()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hundreds_of_concurrent_bans_apply_one_step_per_state(make_team, settings):
+    settings.CONSUMER_DB_POOL_SIZE = 8
+    t = Tournament.objects.create(name="Concurrent Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=30)
+    m.start_veto()
+
+    def racer(i):
+        # The in-memory test database refuses a contended table instead of blocking
+        # like a server database would; retry the whole step, as a client would.
+        while True:
+            try:
+                return attempt(i)
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                time.sleep(0.001)
+
+    def attempt(i):
+        # Each call reads the row on a pool thread and races the others' claims.
+        match = Match.objects.select_related("team_a", "team_b").get(pk=m.pk)
+        time.sleep(0.002)  # let the other pool threads read the same state
+        if i % 5 == 0:
+            later = timezone.now() + timezone.timedelta(seconds=60)
+            return BanResult.APPLIED if match.auto_ban_if_expired(now=later) else BanResult.STALE
+        codes = match.available_map_codes() or [MAP_POOL[0][0]]
+        return match.apply_ban(codes[i % len(codes)], (match.team_a, match.team_b)[i % 2])
+
+    async def storm():
+        return await asyncio.gather(*(db_sync_to_async(racer)(i) for i in range(300)))
+
+    results = asyncio.run(storm())
+
+    m.refresh_from_db()
+    bans = list(m.map_bans.order_by("order"))
+    assert len(results) == 300
+    assert results.count(BanResult.APPLIED) == len(bans) == m.ban_count == len(MAP_POOL) - 1
+    assert [ban.order for ban in bans] == list(range(1, len(bans) + 1))
+    assert [ban.team_id for ban in bans] == [(a, b)[i % 2].id for i in range(len(bans))]
+    assert len({ban.map_name for ban in bans}) == len(bans)
+    assert m.veto_state == "done"
+    assert m.final_map_code == m.unbanned_map_codes()[0]
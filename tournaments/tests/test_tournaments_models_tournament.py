@@ -1,6 +1,6 @@
 import pytest
 from django.utils import timezone
-from tournaments.models import Tournament, TournamentTeam, Match, MapBan
+from tournaments.models import Tournament, TournamentTeam, Match, MapBan, RegistrationResult
 from teams.models import Team
 from django.db import IntegrityError
 
@@ -104,4 +104,65 @@ def test_slots_left_clamped_to_zero_when_full_or_overfilled(make_team):
     TournamentTeam.objects.create(tournament=t, team=c)
     t.refresh_from_db()
     assert t.participants.count() == 3
-    assert t.slots_left == 0 
\ No newline at end of file
+    assert t.slots_left == 0 
+
+def test_participants_count_follows_registrations(make_team):
+    t = Tournament.objects.create(name="Count", start_date=timezone.now(), max_teams=4)
+    entry = TournamentTeam.objects.create(tournament=t, team=make_team("Alpha"))
+    TournamentTeam.objects.create(tournament=t, team=make_team("Bravo"))
+    assert t.participants_count == 2
+
+    TournamentTeam.objects.get(pk=entry.pk).delete()
+    t.refresh_from_db()
+    assert t.participants_count == 1
+    t.name = "Renamed"
+    Tournament.objects.get(pk=t.pk).save()  # a full save of a stale copy must not reset it
+    t.refresh_from_db()
+    assert t.participants_count == 1
+
+
+def test_register_team_results(make_team):
+    t = Tournament.objects.create(name="Reg", start_date=timezone.now(), max_teams=1)
+    alpha, bravo = make_team("Alpha"), make_team("Bravo")
+
+    assert t.register_team(alpha) is RegistrationResult.REGISTERED
+    assert t.participants_count == 1
+    assert t.register_team(alpha) is RegistrationResult.ALREADY_REGISTERED
+    assert t.register_team(bravo) is RegistrationResult.FULL
+    Tournament.objects.filter(pk=t.pk).update(registration_open=False, max_teams=4)
+    assert t.register_team(bravo) is RegistrationResult.CLOSED
+    assert list(t.participants.values_list("team", flat=True)) == [alpha.id]
+    t.refresh_from_db()
+    assert t.participants_count == 1
+
+
+def test_deleting_a_registered_team_frees_its_slot(make_team):
+    t = Tournament.objects.create(name="Two", start_date=timezone.now(), max_teams=2)
+    alpha, bravo, charlie = make_team("Alpha"), make_team("Bravo"), make_team("Charlie")
+    assert t.register_team(alpha) is RegistrationResult.REGISTERED
+    assert t.register_team(bravo) is RegistrationResult.REGISTERED
+
+    bravo.delete()  # cascades to its TournamentTeam row
+
+    t.refresh_from_db()
+    assert t.participants_count == t.participants.count() == 1
+    assert t.is_open_for_registration
+    assert t.register_team(charlie) is RegistrationResult.REGISTERED
+
+    TournamentTeam.objects.filter(tournament=t).delete()
+    t.refresh_from_db()
+    assert t.participants_count == 0
+
+
+def test_register_team_never_overfills_from_stale_reads(make_team):
+    Tournament.objects.create(name="Burst", start_date=timezone.now(), max_teams=3)
+    # Every captain loaded the page while the tournament was still empty.
+    stale = [Tournament.objects.get(name="Burst") for _ in range(6)]
+    teams = [make_team(f"Team{i}", f"T{i}") for i in range(6)]
+
+    results = [t.register_team(team) for t, team in zip(stale, teams)]
+
+    assert results.count(RegistrationResult.REGISTERED) == 3
+    assert results.count(RegistrationResult.FULL) == 3
+    t = Tournament.objects.get(name="Burst")
+    assert t.participants_count == t.participants.count() == 3
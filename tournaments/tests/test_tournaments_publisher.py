@@ -0,0 +1,89 @@
+import time
+import pytest
+from tournaments.publisher import Publisher
+
+pytestmark = pytest.mark.django_db
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, payload):
+        self.sent.append((group, payload))
+
+
+@pytest.fixture
+def layer(monkeypatch):
+    layer = RecordingLayer()
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: layer)
+    return layer
+
+
+def test_publish_waits_for_commit(layer, django_capture_on_commit_callbacks):
+    pub = Publisher()
+    with django_capture_on_commit_callbacks() as callbacks:
+        pub.publish("match_1", {"type": "veto_state", "state": {"turn": 1}})
+        assert layer.sent == []
+    assert len(callbacks) == 1
+    callbacks[0]()
+    assert layer.sent == [("match_1", {"type": "veto_state", "state": {"turn": 1}, "seq": 1})]
+
+
+def test_updates_inside_the_window_are_coalesced(settings, layer, django_capture_on_commit_callbacks):
+    settings.WS_PUBLISH_COALESCE_MS = 60_000
+    pub = Publisher()
+    with django_capture_on_commit_callbacks(execute=True):
+        pub.publish("match_1", {"type": "veto_state", "state": {"turn": 1}})
+        pub.publish("match_1", {"type": "veto_state", "state": {"turn": 2}})
+        pub.publish("tournament_5", {"type": "bracket_batch_update", "updates": [{"match_id": 1, "html": "a"}]})
+        pub.publish("tournament_5", {"type": "bracket_batch_update", "updates": [
+            {"match_id": 1, "html": "b"}, {"match_id": 2, "html": "c"},
+        ]})
+        pub.publish("tournament_5", {"type": "bracket_update", "match_id": 3, "html": "x"})
+        pub.publish("tournament_5", {"type": "bracket_update", "match_id": 4, "html": "y"})
+    assert layer.sent == []
+    pub.flush()
+
+    assert layer.sent == [
+        ("match_1", {"type": "veto_state", "state": {"turn": 2}, "seq": 1}),
+        ("tournament_5", {"type": "bracket_batch_update", "updates": [
+            {"match_id": 1, "html": "b"}, {"match_id": 2, "html": "c"},
+        ], "seq": 1}),
+        ("tournament_5", {"type": "bracket_update", "match_id": 3, "html": "x", "seq": 2}),
+        ("tournament_5", {"type": "bracket_update", "match_id": 4, "html": "y", "seq": 3}),
+    ]
+    stats = pub.stats()
+    assert stats["published"] == 4 and stats["coalesced"] == 2 and stats["flushes"] == 1
+    assert stats["pending"] == 0 and stats["max_latency_ms"] >= stats["avg_latency_ms"] > 0
+
+
+def test_failed_publish_is_counted_and_does_not_block_others(monkeypatch, django_capture_on_commit_callbacks):
+    sent = []
+
+    class FlakyLayer:
+        def group_send(self, group, payload):
+            if group == "bad":
+                raise RuntimeError("layer down")
+            sent.append(group)
+
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: FlakyLayer())
+    pub = Publisher()
+    with django_capture_on_commit_callbacks(execute=True):
+        pub.publish("bad", {"type": "matches_update"})
+        pub.publish("good", {"type": "matches_update"})
+
+    assert sent == ["good"]
+    assert pub.stats()["failed"] == 1 and pub.stats()["published"] == 1
+
+
+def test_window_timer_flushes_on_its_own(settings, layer, django_capture_on_commit_callbacks):
+    settings.WS_PUBLISH_COALESCE_MS = 20
+    pub = Publisher()
+    with django_capture_on_commit_callbacks(execute=True):
+        pub.publish("match_1", {"type": "veto_state", "state": {}})
+    for _ in range(50):
+        if layer.sent:
+            break
+        time.sleep(0.02)
+    assert layer.sent == [("match_1", {"type": "veto_state", "state": {}, "seq": 1})]
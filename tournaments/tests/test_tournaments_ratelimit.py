@@ -0,0 +1,34 @@
+from tournaments.ratelimit import FrameLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=2, capacity=3)
+    start = bucket.updated
+    assert [bucket.take(start) for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(start + 0.25) is False
+    assert bucket.take(start + 0.5) is True
+    assert bucket.take(start + 100) and bucket.tokens == 2
+
+
+def test_user_bucket_is_shared_across_connections(settings):
+    settings.WS_FRAME_BURST = 5
+    settings.WS_USER_FRAME_RATE = 0
+    settings.WS_USER_FRAME_BURST = 3
+    limiter = FrameLimiter()
+    first, second = limiter.connection_bucket(), limiter.connection_bucket()
+
+    results = [limiter.allow(first, 7), limiter.allow(second, 7), limiter.allow(first, 7), limiter.allow(second, 7)]
+
+    assert results == [True, True, True, False]
+    assert limiter.allow(second, 8) is True
+    assert limiter.allow(second) is True  # anonymous: connection bucket only
+    assert limiter.stats() == {"accepted": 5, "dropped": {"rate_limited": 1}, "tracked_users": 2}
+
+
+def test_user_buckets_are_bounded(monkeypatch):
+    limiter = FrameLimiter()
+    monkeypatch.setattr(FrameLimiter, "MAX_USERS", 2)
+    bucket = TokenBucket(rate=0, capacity=10)
+    for user_id in (1, 2, 1, 3):
+        limiter.allow(bucket, user_id)
+    assert list(limiter._users) == [1, 3]
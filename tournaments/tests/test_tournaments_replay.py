@@ -0,0 +1,29 @@
+from tournaments.replay import current_seq, missed_events, stamp
+
+
+def test_stamp_numbers_events_per_group():
+    assert current_seq("tournament_1") == 0
+    assert stamp("tournament_1", {"type": "bracket_update"})["seq"] == 1
+    assert stamp("tournament_1", {"type": "bracket_update"})["seq"] == 2
+    assert stamp("tournament_2", {"type": "bracket_update"})["seq"] == 1
+    assert current_seq("tournament_1") == 2
+
+
+def test_missed_events_returns_only_the_gap():
+    for i in range(4):
+        stamp("match_1", {"type": "veto_state", "state": {"n": i}})
+
+    missed = missed_events("match_1", 2)
+
+    assert [(e["seq"], e["state"]["n"]) for e in missed] == [(3, 2), (4, 3)]
+    assert missed_events("match_1", 4) == []
+
+
+def test_missed_events_needs_snapshot_when_gap_cannot_be_replayed(settings):
+    settings.WS_REPLAY_BUFFER = 3
+    for _ in range(5):
+        stamp("match_1", {"type": "veto_state", "state": {}})
+
+    assert missed_events("match_1", 1) is None  # older than the buffer
+    assert missed_events("match_1", 9) is None  # counter was reset under the client
+    assert len(missed_events("match_1", 2)) == 3
@@ -1,12 +1,11 @@
 import pytest
 from django.utils import timezone
-from tournaments.models import Tournament, TournamentTeam, Match, MAP_POOL
+from tournaments.models import BanResult, Tournament, TournamentTeam, Match, MAP_POOL
 from tournaments.services import (
     generate_full_bracket,
     update_bracket_progression,
     set_match_result,
     get_available_maps,
-    perform_ban,
     get_final_map,
 )
 from tournaments import services
@@ -98,7 +97,8 @@ def test_available_maps_and_ban_flow(make_team):
     codes = [c for c, _ in MAP_POOL]
     assert get_available_maps(m) == codes
 
-    assert perform_ban(m, a, codes[0]) is True
+    m.start_veto()
+    assert m.apply_ban(codes[0], a) is BanResult.APPLIED
     assert codes[0] not in get_available_maps(m)
 
 @pytest.mark.django_db
@@ -109,8 +109,9 @@ def test_get_final_map_when_one_left(make_team):
     m = Match.objects.create(tournament=t, round=1, team_a=a, team_b=b, status="scheduled")
 
     codes = [c for c, _ in MAP_POOL]
+    m.start_veto()
     for code in codes[:-1]:
-        perform_ban(m, a, code)
+        assert m.apply_ban(code, m.current_team) is BanResult.APPLIED
 
     fm = get_final_map(m)
     assert fm is not None
@@ -127,15 +128,16 @@ def test_get_final_map_is_none_when_multiple_maps_left(make_team):
     assert get_final_map(m) is None
 
 @pytest.mark.django_db
-def test_perform_ban_duplicate_returns_false(make_team):
+def test_apply_ban_duplicate_is_stale(make_team):
     t = Tournament.objects.create(name="DupBan", start_date=timezone.now())
     a = make_team("A", "A")
     b = make_team("B", "B")
     m = Match.objects.create(tournament=t, round=1, team_a=a, team_b=b, status="scheduled")
 
     first_code = MAP_POOL[0][0]
-    assert perform_ban(m, a, first_code) is True 
-    assert perform_ban(m, a, first_code) is False
+    m.start_veto()
+    assert m.apply_ban(first_code, a) is BanResult.APPLIED
+    assert m.apply_ban(first_code, b) is BanResult.STALE
 
 @pytest.mark.django_db
 def test_update_bracket_progression_sets_tournament_winner(make_team):
@@ -241,12 +243,12 @@ def test_set_match_result_when_one_team_missing_sets_no_winner(make_team):
 
 
 @pytest.mark.django_db
-def test_perform_ban_rejects_invalid_map(make_team):
+def test_apply_ban_rejects_invalid_map(make_team):
     t = Tournament.objects.create(name="Cup", start_date=timezone.now())
     a = make_team("A"); b = make_team("B")
     m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=10)
     m.start_veto(now=timezone.now())
-    assert perform_ban(m, a, "de_not_exist") is False
+    assert m.apply_ban("de_not_exist", a) is BanResult.STALE
 
 @pytest.mark.django_db
 def test_update_bracket_progression_does_not_save_when_slots_already_set(make_team):
@@ -311,4 +313,129 @@ def test_update_bracket_progression_multiple_finals_len_not_one_exits():
     t.refresh_from_db()
 
     assert t.status in (None, "upcoming", "created", "draft", "scheduled")
-    assert t.winner_id is None
\ No newline at end of file
+    assert t.winner_id is None
+
+@pytest.mark.django_db
+def test_advance_bracket_fills_parent_slot_and_returns_changed(make_team):
+    from tournaments.services import advance_bracket
+    t = Tournament.objects.create(name="Adv", start_date=timezone.now())
+    for n in ["A", "B", "C", "D", "E", "F", "G", "H"]:
+        TournamentTeam.objects.create(tournament=t, team=make_team(n, n))
+    generate_full_bracket(t)
+
+    m = Match.objects.get(tournament=t, round=1, slot=3)
+    set_match_result(m, 16, 3)
+    changed = advance_bracket(m)
+
+    parent = Match.objects.get(tournament=t, round=2, slot=1)
+    assert [c.pk for c in changed] == [parent.pk]
+    assert parent.team_b_id == m.winner_id
+    assert parent.team_a_id is None
+    assert advance_bracket(m) == []
+
+
+@pytest.mark.django_db
+def test_sibling_results_advancing_together_keep_both_sides(make_team, monkeypatch):
+    from tournaments.services import advance_bracket
+    t = Tournament.objects.create(name="Siblings", start_date=timezone.now())
+    for n in ["A", "B", "C", "D"]:
+        TournamentTeam.objects.create(tournament=t, team=make_team(n, n))
+    generate_full_bracket(t)
+    first, second = Match.objects.filter(tournament=t, round=1).order_by("slot")
+    set_match_result(first, 16, 3)
+    set_match_result(second, 2, 16)
+
+    # The second sibling advances after the first has read the parent but before it writes.
+    real = services._advance_into
+    interleaved = []
+
+    def advance_into(parent, child, side):
+        if child.pk == first.pk and not interleaved:
+            interleaved.append(advance_bracket(second))
+        return real(parent, child, side)
+
+    monkeypatch.setattr(services, "_advance_into", advance_into)
+    advance_bracket(first)
+
+    final = Match.objects.get(tournament=t, round=2)
+    assert (final.team_a_id, final.team_b_id) == (first.winner_id, second.winner_id)
+
+
+@pytest.mark.django_db
+def test_advance_bracket_reads_only_the_parent_chain(make_team, django_assert_max_num_queries):
+    from tournaments.services import advance_bracket
+    t = Tournament.objects.create(name="Chain", start_date=timezone.now())
+    for i in range(16):
+        TournamentTeam.objects.create(tournament=t, team=make_team(f"T{i}", f"T{i}"))
+    generate_full_bracket(t)
+
+    m = Match.objects.select_related("tournament").get(tournament=t, round=1, slot=0)
+    set_match_result(m, 16, 0)
+    with django_assert_max_num_queries(7):
+        advance_bracket(m)
+    assert Match.objects.get(tournament=t, round=2, slot=0).team_a_id == m.winner_id
+
+
+@pytest.mark.django_db
+def test_advance_bracket_final_sets_tournament_winner(make_team):
+    from tournaments.services import advance_bracket
+    t = Tournament.objects.create(name="AdvFinal", start_date=timezone.now())
+    a, b = make_team("A", "A"), make_team("B", "B")
+    TournamentTeam.objects.create(tournament=t, team=a)
+    TournamentTeam.objects.create(tournament=t, team=b)
+    generate_full_bracket(t)
+
+    final = Match.objects.get(tournament=t, round=1)
+    set_match_result(final, 16, 8)
+    assert advance_bracket(final) == []
+    t.refresh_from_db()
+    assert t.status == "finished"
+    assert t.winner_id == final.winner_id
+
+
+@pytest.mark.django_db
+def test_advance_bracket_without_slot_falls_back_to_full_pass(make_team):
+    from tournaments.services import advance_bracket
+    t = Tournament.objects.create(name="Legacy", start_date=timezone.now())
+    a, b = make_team("A", "A"), make_team("B", "B")
+    c, d = make_team("C", "C"), make_team("D", "D")
+    m1 = Match.objects.create(tournament=t, round=1, team_a=a, team_b=b)
+    Match.objects.create(tournament=t, round=1, team_a=c, team_b=d)
+    nx = Match.objects.create(tournament=t, round=2)
+
+    set_match_result(m1, 16, 0)
+    changed = advance_bracket(m1)
+    nx.refresh_from_db()
+    assert [x.pk for x in changed] == [nx.pk]
+    assert nx.team_a_id == a.id
+
+
+@pytest.mark.django_db
+def test_generate_bracket_places_byes_and_advances_them(make_team):
+    t = Tournament.objects.create(name="Byes", start_date=timezone.now())
+    for i in range(5):
+        TournamentTeam.objects.create(tournament=t, team=make_team(f"T{i}", f"T{i}"))
+
+    by_round = generate_full_bracket(t)
+
+    assert [len(by_round[r]) for r in (1, 2, 3)] == [4, 2, 1]
+    r1 = list(Match.objects.filter(tournament=t, round=1).order_by("slot"))
+    byes = [m for m in r1 if m.team_b_id is None]
+    assert len(byes) == 3
+    assert all(m.team_a_id and m.status == "finished" and m.winner_id == m.team_a_id for m in byes)
+    r2 = {m.slot: m for m in Match.objects.filter(tournament=t, round=2)}
+    assert r2[0].team_a_id == r1[0].winner_id and r2[0].team_b_id == r1[1].winner_id
+    assert r2[1].team_a_id == r1[2].winner_id and r2[1].team_b_id is None
+
+
+@pytest.mark.django_db
+def test_generate_bracket_query_count_does_not_grow_per_match(make_team, django_assert_max_num_queries):
+    t = Tournament.objects.create(name="Bulk", start_date=timezone.now())
+    for i in range(32):
+        TournamentTeam.objects.create(tournament=t, team=make_team(f"T{i}", f"T{i}"))
+    generate_full_bracket(t)
+
+    with django_assert_max_num_queries(9):
+        generate_full_bracket(t)
+    assert Match.objects.filter(tournament=t).count() == 31
+
@@ -0,0 +1,77 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from tournaments.models import Tournament, TournamentTeam, Match
+from tournaments.services import generate_full_bracket, set_match_result, advance_bracket
+from tournaments.snapshots import get_bracket_snapshot, get_bracket_snapshot_by_id, round_label
+
+pytestmark = pytest.mark.django_db
+
+
+def _bracket(make_team, n=4):
+    t = Tournament.objects.create(name="Snap", start_date=timezone.now())
+    for i in range(n):
+        TournamentTeam.objects.create(tournament=t, team=make_team(f"S{i}", f"S{i}"))
+    generate_full_bracket(t)
+    t.refresh_from_db()
+    return t
+
+
+def test_round_label():
+    assert [round_label(r, 5) for r in (5, 4, 3, 2, 1)] == [
+        "Final", "Semi finals", "Quarter finals", "Round of 16", "Round of 32",
+    ]
+
+
+def test_snapshot_is_built_once_per_version(make_team):
+    t = _bracket(make_team)
+    snap = get_bracket_snapshot(t)
+    assert [r["label"] for r in snap["rounds"]] == ["Semi finals", "Final"]
+    assert [m["slot"] for m in snap["rounds"][0]["matches"]] == [0, 1]
+    assert snap["version"] == t.bracket_version
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_bracket_snapshot(t) == snap
+    assert len(ctx.captured_queries) == 0
+
+
+def test_result_and_progression_bump_version_and_refresh_snapshot(make_team):
+    t = _bracket(make_team)
+    before = get_bracket_snapshot(t)
+
+    m = Match.objects.get(tournament=t, round=1, slot=0)
+    set_match_result(m, 16, 2)
+    advance_bracket(m)
+
+    after = get_bracket_snapshot_by_id(t.id)
+    assert after["version"] > before["version"]
+    final = after["rounds"][1]["matches"][0]
+    assert final["team_a"]["id"] == m.winner_id
+    assert after["rounds"][0]["matches"][0]["score_a"] == 16
+
+
+def test_full_save_of_stale_instance_keeps_version(make_team):
+    t = _bracket(make_team)
+    stale = Tournament.objects.get(pk=t.pk)
+    set_match_result(Match.objects.get(tournament=t, round=1, slot=0), 16, 0)
+
+    stale.name = "Renamed"
+    stale.save()
+    t.refresh_from_db()
+    assert t.name == "Renamed"
+    assert t.bracket_version > stale.bracket_version
+
+
+def test_api_detail_is_served_from_snapshot(client, make_team):
+    t = _bracket(make_team)
+    url = reverse("tournaments:api_tournament_detail", args=[t.pk])
+    first = client.get(url).json()
+    assert len(first["matches"]) == 3
+    assert first["bracket_version"] == t.bracket_version
+
+    with CaptureQueriesContext(connection) as ctx:
+        second = client.get(url).json()
+    assert second == first
+    assert not [q for q in ctx.captured_queries if "tournaments_match" in q["sql"]]
@@ -18,6 +18,7 @@ ROUTES = [
     ("tournaments:match_veto",      {"pk": 1, "match_id": 2}),
     ("tournaments:api_tournament_list", {}),
     ("tournaments:api_tournament_detail", {"pk": 1}),
+    ("tournaments:api_tournament_matches", {"pk": 1}),
     ("tournaments:api_report_match", {"pk": 1}),
     ("tournaments:settings",        {"pk": 1}),
 ]
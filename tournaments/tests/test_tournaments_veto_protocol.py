@@ -0,0 +1,81 @@
+import json
+import pytest
+from django.utils import timezone
+from tournaments.models import Tournament, Match, MAP_POOL
+from tournaments.veto_protocol import (
+    ALL_MAPS_MASK, VETO_PROTOCOL_VERSION, build_match_update, fragment_cache, fragment_key, veto_state,
+    veto_state_event,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def vetoing_match(make_team):
+    t = Tournament.objects.create(name="Proto Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=30)
+    m.start_veto()
+    return m
+
+
+def test_veto_state_describes_the_running_veto(vetoing_match):
+    m = vetoing_match
+    m.ban_map(MAP_POOL[1][0], m.team_a)
+
+    state = veto_state(m)
+
+    assert state == {
+        "v": VETO_PROTOCOL_VERSION,
+        "match_id": m.id,
+        "state": "running",
+        "bans": [[MAP_POOL[1][0], m.team_a_id, "ban"]],
+        "available": ALL_MAPS_MASK & ~0b10,
+        "turn": m.team_b_id,
+        "deadline": int(m.veto_deadline.timestamp() * 1000),
+        "final_map": None,
+        "server": None,
+    }
+
+
+def test_veto_state_reports_final_map_and_server(vetoing_match):
+    m = vetoing_match
+    for i, (code, _) in enumerate(MAP_POOL[:-1]):
+        assert m.ban_map(code, (m.team_a, m.team_b)[i % 2])
+
+    state = veto_state(m)
+
+    assert state["state"] == "done"
+    assert state["final_map"] == MAP_POOL[-1][0]
+    assert state["available"] == 0 and state["turn"] is None and state["deadline"] is None
+    assert state["server"] == m.server_addr
+    assert len(state["bans"]) == len(MAP_POOL) - 1
+
+
+def test_veto_state_frame_is_much_smaller_than_the_html_update(vetoing_match):
+    m = Match.objects.select_related("tournament", "team_a", "team_b").get(pk=vetoing_match.pk)
+    event = veto_state_event(m)
+    assert event["type"] == "veto_state"
+    frame = {"type": "veto_state", **event["state"]}
+    assert len(json.dumps(frame)) * 10 < len(json.dumps(build_match_update(m)))
+
+
+def test_veto_state_event_carries_only_the_state(vetoing_match, django_assert_num_queries):
+    m = Match.objects.select_related("tournament", "team_a", "team_b").get(pk=vetoing_match.pk)
+    with django_assert_num_queries(1):
+        event = veto_state_event(m)
+    assert event == {"type": "veto_state", "state": veto_state(m)}
+
+
+def test_fragment_cache_renders_each_veto_step_once(vetoing_match):
+    m = Match.objects.select_related("tournament", "team_a", "team_b").get(pk=vetoing_match.pk)
+    key = fragment_key(m.id, veto_state(m))
+    assert fragment_cache.peek(key) is None
+    fragments = fragment_cache.get(key, m)
+    assert fragments == build_match_update(m)
+    assert fragment_cache.get(key, m) is fragments and fragment_cache.peek(key) is fragments
+
+    assert m.ban_map(MAP_POOL[0][0], m.team_a)
+    assert fragment_key(m.id, veto_state(m)) != key
+    assert fragment_cache.stats() == {"renders": 1, "hits": 2, "entries": 1}
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from tournaments.models import Tournament, Match, MapBan
+from tournaments.veto_scheduler import VetoScheduler
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.django_db(transaction=True)]
+
+
+@pytest.fixture
+def running_match(make_team):
+    t = Tournament.objects.create(name="Veto Cup", start_date=timezone.now())
+    a = make_team("Alpha", tag="ALP")
+    b = make_team("Bravo", tag="BRV")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, veto_timeout=60)
+    m.start_veto()
+    return m
+
+
+def _set_deadline(match, deadline):
+    Match.objects.filter(pk=match.pk).update(veto_deadline=deadline)
+
+
+async def test_expired_deadline_fires_one_auto_ban_across_schedulers(running_match):
+    deadline = timezone.now() + timezone.timedelta(milliseconds=100)
+    await sync_to_async(_set_deadline)(running_match, deadline)
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    await layer.group_add(f"match_{running_match.pk}", channel)
+
+    # Two schedulers stand in for two ASGI workers watching the same match.
+    first, second = VetoScheduler(), VetoScheduler()
+    first.schedule(running_match.pk, deadline)
+    second.schedule(running_match.pk, deadline)
+
+    message = await asyncio.wait_for(layer.receive(channel), timeout=2)
+    await asyncio.sleep(0.2)
+
+    assert message["type"] == "veto_state"
+    assert message["state"]["turn"] == running_match.team_b_id
+    assert await sync_to_async(MapBan.objects.filter(match=running_match).count)() == 1
+    m = await sync_to_async(Match.objects.get)(pk=running_match.pk)
+    assert m.veto_turn == "B"
+    assert running_match.pk in first and running_match.pk in second
+    first.schedule(running_match.pk, None)
+    second.schedule(running_match.pk, None)
+
+
+async def test_moved_deadline_rearms_without_banning(running_match):
+    scheduler = VetoScheduler()
+    scheduler.schedule(running_match.pk, timezone.now() - timezone.timedelta(seconds=1))
+    await asyncio.sleep(0.2)
+
+    assert await sync_to_async(MapBan.objects.filter(match=running_match).count)() == 0
+    assert running_match.pk in scheduler
+    scheduler.schedule(running_match.pk, None)
+    assert running_match.pk not in scheduler
+
+
+async def test_ensure_ignores_matches_without_running_veto(make_team):
+    t = await sync_to_async(Tournament.objects.create)(name="Idle Cup", start_date=timezone.now())
+    m = await sync_to_async(Match.objects.create)(tournament=t)
+    scheduler = VetoScheduler()
+
+    await scheduler.ensure(m.pk)
+
+    assert m.pk not in scheduler
+
+
+async def test_failed_expiry_rearms_instead_of_dropping_the_timer(running_match, monkeypatch):
+    from tournaments import veto_scheduler
+
+    def locked(match_id):
+        raise RuntimeError("database table is locked")
+
+    monkeypatch.setattr(veto_scheduler, "_load_match", locked)
+    scheduler = VetoScheduler()
+    scheduler.schedule(running_match.pk, timezone.now() - timezone.timedelta(seconds=1))
+    await asyncio.sleep(0.2)
+
+    assert running_match.pk in scheduler
+    assert await sync_to_async(MapBan.objects.filter(match=running_match).count)() == 0
+    scheduler.schedule(running_match.pk, None)
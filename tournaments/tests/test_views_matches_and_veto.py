@@ -5,7 +5,8 @@ from django.utils import timezone
 from django.urls import reverse
 from django.http import HttpResponse
 from django.contrib.auth import get_user_model
-from tournaments.models import Tournament, TournamentTeam, Match, MapBan, MAP_POOL
+from django.contrib.messages import get_messages
+from tournaments.models import BanResult, Tournament, TournamentTeam, Match, MapBan, MAP_POOL
 from teams.models import Team
 from tournaments import views as V
 
@@ -15,6 +16,7 @@ LOC_TPL = {
     "tournaments/matches.html": "MATCHES {{ matches|length }}",
     "tournaments/teams.html": "TEAMS {{ participants|length }}",
     "tournaments/results.html": "RESULTS {{ matches|length }}",
+    "tournaments/_match.html": "<div>M{{ match.id }}</div>",
     "tournaments/_report_form.html": "REPORT {% if error %}ERR:{{ error }}{% endif %}",
     "tournaments/match_detail.html": "DETAIL {{ match.id }} {% if final_map %}FINAL{{ final_map.0 }}{% endif %}",
     "tournaments/match_detail_inner.html": "INNER {{ match.id }} {% if final_map %}FINAL{{ final_map.0 }}{% endif %}",
@@ -78,8 +80,8 @@ def test_report_match_result_get_and_post_paths(make_team, monkeypatch):
 
     sm = {"called": 0}; up = {"called": 0}
     monkeypatch.setattr(V, "set_match_result", lambda _m, a, b: sm.__setitem__("called", 1))
-    monkeypatch.setattr(V, "update_bracket_progression", lambda _t: up.__setitem__("called", 1))
-    monkeypatch.setattr(V, "send_ws_update", lambda _m: None)
+    monkeypatch.setattr(V, "advance_bracket", lambda _m: up.__setitem__("called", 1) or [])
+    monkeypatch.setattr(V, "send_ws_batch", lambda _tid, _ms: None)
 
     r_ok = c.post(reverse("tournaments:report_match", args=[t.id, m.id]), data={"score_a": "2", "score_b": "1"})
     assert r_ok.status_code == 302 and reverse("tournaments:matches", args=[t.id]) in r_ok["Location"]
@@ -89,6 +91,23 @@ def test_report_match_result_get_and_post_paths(make_team, monkeypatch):
     assert r_ok_h.status_code == 204 and r_ok_h["HX-Trigger"] == "match-updated"
 
 
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_report_match_result_rolls_back_when_advancing_fails(make_team, monkeypatch):
+    t = Tournament.objects.create(name="R", start_date=timezone.now())
+    m = Match.objects.create(tournament=t, team_a=make_team("A"), team_b=make_team("B"))
+    from django.test import Client
+    c = Client(raise_request_exception=False); c.force_login(_staff())
+
+    def crash(_m):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(V, "advance_bracket", crash)
+    r = c.post(reverse("tournaments:report_match", args=[t.id, m.id]), data={"score_a": "2", "score_b": "1"})
+    assert r.status_code == 500
+    m.refresh_from_db()
+    assert (m.score_a, m.score_b, m.status, m.winner_id) == (0, 0, "scheduled", None)
+
+
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_register_team_all_branches(make_team):
     u = User.objects.create_user("cap", password="x")
@@ -118,7 +137,7 @@ def test_match_detail_get_and_post(make_team, monkeypatch):
     m = Match.objects.create(tournament=t, team_a=a, team_b=b)
     class Layer:
         async def group_send(self, *a, **k): pass
-    monkeypatch.setattr(V, "get_channel_layer", lambda: Layer())
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: Layer())
     from django.test import Client
     c = Client(); c.force_login(_staff())
     r_get = c.get(reverse("tournaments:match_detail", args=[t.id, m.id]))
@@ -132,11 +151,31 @@ def test_match_detail_get_and_post(make_team, monkeypatch):
         MapBan.objects.create(match=m, team=a, map_name=code, order=i, action=MapBan.Action.BAN)
     m.start_veto(now=timezone.now())
     curr = a if (m.map_bans.count() % 2 == 0) else b
-    V.perform_ban(m, curr, keep[0])
+    m.apply_ban(keep[0], curr)
     r_post2 = c.post(reverse("tournaments:match_detail", args=[t.id, m.id]), data={"map_name": keep[0]})
     assert r_post2.status_code == 302  
 
 
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_match_detail_leaves_expired_turns_to_the_scheduler(make_team, monkeypatch):
+    t = Tournament.objects.create(name="MD-EXP", start_date=timezone.now())
+    m = Match.objects.create(tournament=t, team_a=make_team("A"), team_b=make_team("B"))
+    sent = []
+    monkeypatch.setattr("tournaments.views.publish", lambda group, event: sent.append(event["state"]["state"]))
+    from django.test import Client
+    c = Client(); c.force_login(_staff())
+    url = reverse("tournaments:match_detail", args=[t.id, m.id])
+
+    assert c.get(url).status_code == 200
+    assert sent == ["running"]  # starting the veto is broadcast
+
+    Match.objects.filter(pk=m.pk).update(veto_deadline=timezone.now() - timezone.timedelta(seconds=5))
+    assert c.get(url).status_code == 200
+    assert c.post(url, data={}).status_code == 302
+    assert sent == ["running"]
+    assert m.map_bans.count() == 0
+
+
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_match_veto_get_and_post_paths(make_team):
     uA = User.objects.create_user("capA", password="x")
@@ -174,14 +213,6 @@ def test_get_final_map_single_available(make_team):
     assert only[0] == keep 
 
 
-@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
-def test_perform_ban_returns_false_for_unavailable_map(make_team):
-    t = Tournament.objects.create(name="PBFalse", start_date=timezone.now())
-    a = make_team("A"); b = make_team("B")
-    m = Match.objects.create(tournament=t, team_a=a, team_b=b)
-    assert V.perform_ban(m, a, "de_not_exists") is False
-
-
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_match_veto_post_map_already_unavailable_shows_error(make_team):
     uA = User.objects.create_user("capA", password="x")
@@ -210,21 +241,48 @@ def test_match_veto_sets_current_team_on_get(make_team):
     assert r.status_code == 200
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
-def test_match_veto_map_already_unavailable_error_branch(make_team, monkeypatch):
+def test_match_veto_map_already_unavailable_error_branch(make_team):
     uA = User.objects.create_user("capA", password="x")
     uB = User.objects.create_user("capB", password="x")
     a = make_team("A", captain=uA); b = make_team("B", captain=uB)
     t = Tournament.objects.create(name="V2", start_date=timezone.now())
     m = Match.objects.create(tournament=t, team_a=a, team_b=b)
     chosen = MAP_POOL[0][0]
-    other  = MAP_POOL[1][0]
-    monkeypatch.setattr(V, "get_available_maps", lambda match: [(chosen, "X"), (other, "Y")])
-    monkeypatch.setattr(V, "perform_ban", lambda match, team, mapname: False)
+    m.start_veto()
+    m.apply_ban(chosen, a)
     from django.test import Client
-    c = Client(); c.force_login(uA)
+    c = Client(); c.force_login(uB)
     r = c.post(reverse("tournaments:match_veto", args=[t.id, m.id]), data={"map_name": chosen})
+    assert [str(msg) for msg in get_messages(r.wsgi_request)] == [BanResult.STALE.label]
+    assert MapBan.objects.filter(match=m).count() == 1
+
+
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_match_veto_post_goes_through_the_veto_state_machine(make_team, monkeypatch, django_capture_on_commit_callbacks):
+    uA = User.objects.create_user("capA", password="x")
+    a = make_team("A", captain=uA); b = make_team("B")
+    t = Tournament.objects.create(name="V3", start_date=timezone.now())
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b)
+    sent = []
+    class Layer:
+        def group_send(self, group, payload):
+            sent.append((group, payload["type"]))
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: Layer())
+    from django.test import Client
+    c = Client(); c.force_login(uA)
+    with django_capture_on_commit_callbacks(execute=True):
+        r = c.post(reverse("tournaments:match_veto", args=[t.id, m.id]), data={"map_name": MAP_POOL[0][0]})
     assert r.status_code == 302
-    assert reverse("tournaments:match_veto", args=[t.id, m.id]) in r["Location"]
+
+    m.refresh_from_db()
+    assert (m.veto_state, m.veto_turn, m.ban_count) == ("running", "B", 1)
+    assert m.veto_deadline is not None and m.version > 0
+    assert sent == [(f"match_{m.id}", "veto_state")]
+
+    # A's second ban is refused: it is B's turn now.
+    r = c.post(reverse("tournaments:match_veto", args=[t.id, m.id]), data={"map_name": MAP_POOL[1][0]})
+    assert MapBan.objects.filter(match=m).count() == 1
+
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_match_veto_post_without_teams_skips_current_team_branch(make_team):
@@ -234,4 +292,32 @@ def test_match_veto_post_without_teams_skips_current_team_branch(make_team):
     u = make_team("X").captain 
     c = Client(); c.force_login(u)
     r = c.post(reverse("tournaments:match_veto", args=[t.id, m.id]), data={"map_name": "de_mirage"})
-    assert r.status_code == 302 and reverse("tournaments:match_veto", args=[t.id, m.id]) in r["Location"]
\ No newline at end of file
+    assert r.status_code == 302 and reverse("tournaments:match_veto", args=[t.id, m.id]) in r["Location"]
+
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_report_match_result_publishes_one_batch_with_changed_matches(make_team, monkeypatch, django_capture_on_commit_callbacks):
+    t = Tournament.objects.create(name="Batch", start_date=timezone.now())
+    teams = [make_team(n, n) for n in ("A", "B", "C", "D")]
+    m0 = Match.objects.create(tournament=t, round=1, slot=0, team_a=teams[0], team_b=teams[1])
+    Match.objects.create(tournament=t, round=1, slot=1, team_a=teams[2], team_b=teams[3])
+    final = Match.objects.create(tournament=t, round=2, slot=0)
+
+    sent = []
+    class Layer:
+        def group_send(self, group, payload):
+            sent.append((group, payload))
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: Layer())
+
+    from django.test import Client
+    c = Client(); c.force_login(_staff())
+    with django_capture_on_commit_callbacks(execute=True):
+        r = c.post(reverse("tournaments:report_match", args=[t.id, m0.id]), data={"score_a": "16", "score_b": "4"})
+    assert r.status_code == 302
+
+    assert len(sent) == 1
+    group, payload = sent[0]
+    assert group == f"tournament_{t.id}"
+    assert payload["type"] == "bracket_batch_update"
+    assert sorted(u["match_id"] for u in payload["updates"]) == sorted([m0.id, final.id])
+    by_id = {u["match_id"]: u for u in payload["updates"]}
+    assert by_id[final.id]["match"]["team_a_id"] == teams[0].id
@@ -1,3 +1,4 @@
+import html
 import types
 import pytest
 from datetime import timedelta
@@ -18,6 +19,7 @@ User = get_user_model()
 LOC_TPL = {
     "tournaments/tournament_form.html": "FORM {{ title }}",
     "tournaments/tournament_list.html": "LIST {{ tournaments|length }}",
+    "tournaments/_tournament_page.html": "{% for t in tournaments %}{{ t.name }},{% endfor %}|{{ next_url|default:'' }}",
     "tournaments/overview.html": "OVERVIEW {{ tournament.id }} {{ registered_count }} {{ registered_pct }} {% if joined_team %}JOINED:{{ joined_team.id }}{% endif %} CAN_JOIN={{ can_join }}",
     "tournaments/bracket.html": "{% for r in rounds %}[{{ r.num }}|{{ r.label }}]{% endfor %}",
     "tournaments/matches.html": "MATCHES {{ matches|length }}",
@@ -27,6 +29,7 @@ LOC_TPL = {
     "tournaments/_match.html": "<div>MATCH {{ match.id }}</div>",
     "tournaments/match_detail.html": "MATCH_DETAIL {{ final_map.0|default:'-' }} {{ final_map.1|default:'-' }}",
     "tournaments/match_detail_inner.html": "INNER {{ final_map.0|default:'-' }} {{ final_map.1|default:'-' }}",
+    "tournaments/_veto_panel.html": "VETO",
 }
 
 TEMPLATES_OVERRIDE = [{
@@ -111,6 +114,27 @@ def test_tournament_list_and_overview_anonymous_and_joined(make_team):
     assert f"JOINED:{team.id}" in r3.content.decode()
 
 
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_tournament_list_pages_by_keyset_with_status_filter(client, monkeypatch, django_assert_max_num_queries):
+    monkeypatch.setattr(V, "TOURNAMENT_PAGE_SIZE", 2)
+    now = timezone.now()
+    for i, (days, status) in enumerate([(0, "upcoming"), (1, "running"), (1, "upcoming"), (1, "upcoming"), (3, "finished")]):
+        Tournament.objects.create(name=f"T{i}", start_date=now - timedelta(days=days), status=status)
+
+    def walk(url):
+        names = []
+        while url:
+            with django_assert_max_num_queries(2):
+                body = client.get(url, HTTP_HX_REQUEST="true").content.decode()
+            page, url = html.unescape(body).split("|")
+            names += page.rstrip(",").split(",")
+        return names
+
+    assert walk(reverse("tournaments:list")) == ["T0", "T3", "T2", "T1", "T4"]
+    assert walk(reverse("tournaments:list") + "?status=upcoming") == ["T0", "T3", "T2"]
+    assert client.get(reverse("tournaments:list") + "?after=junk&status=nope").content.decode() == "LIST 2"
+
+
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_hero_ctx_can_join_and_already_registered(make_team):
     u = User.objects.create_user("cap", password="x", email="c@c.c")
@@ -131,6 +155,38 @@ def test_hero_ctx_can_join_and_already_registered(make_team):
     assert "CAN_JOIN=False" in r2.content.decode()
 
 
+def test_hero_context_comes_from_one_query_per_request(make_team, django_assert_num_queries):
+    from django.test import RequestFactory
+    cap = User.objects.create_user("hero_cap", password="x", email="h@h.h")
+    admin = User.objects.create_user("hero_admin", password="x", email="ha@h.h")
+    team = make_team("HeroTeam", "HT", captain=cap)
+    t = Tournament.objects.create(name="HERO", start_date=timezone.now(), max_teams=4)
+    t.admins.add(admin)
+    TournamentTeam.objects.create(tournament=t, team=make_team("Other", "OT"))
+
+    request = RequestFactory().get("/")
+    request.user = cap
+    with django_assert_num_queries(1):
+        loaded = V._get_tournament(request, t.pk)
+        hero = V._hero_ctx(request, t=loaded)
+        assert V._get_tournament(request, t.pk) is loaded
+        assert V._can_manage(cap, loaded) is False
+        assert loaded.slots_left == 3
+    assert hero["can_join"] is True and hero["already_registered"] is False
+    assert list(hero["captain_teams"]) == [team]
+
+    TournamentTeam.objects.create(tournament=t, team=team)
+    request = RequestFactory().get("/")
+    request.user = cap
+    hero = V._hero_ctx(request, V._get_tournament(request, t.pk))
+    assert hero["already_registered"] is True and hero["can_join"] is False
+
+    request.user = admin
+    request.__dict__.pop("_hero_tournaments")
+    with django_assert_num_queries(1):
+        assert V._can_manage(admin, V._get_tournament(request, t.pk)) is True
+
+
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_tournament_bracket_round_labels(make_team, monkeypatch):
     t = Tournament.objects.create(name="B", start_date=timezone.now())
@@ -360,7 +416,7 @@ def test_generate_tournament_bracket_sends_ws(monkeypatch):
 
     class DummyLayer:
         async def group_send(self, *a, **k): pass
-    monkeypatch.setattr(V, "get_channel_layer", lambda: DummyLayer())
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: DummyLayer())
     monkeypatch.setattr(V, "generate_full_bracket", lambda _t: None)
 
     r = c.get(reverse("tournaments:generate_bracket", args=[t.id]))
@@ -368,22 +424,27 @@ def test_generate_tournament_bracket_sends_ws(monkeypatch):
 
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
-def test_send_ws_update_async_and_sync(monkeypatch, make_team):
+def test_send_ws_batch_async_and_sync(monkeypatch, make_team, django_capture_on_commit_callbacks):
     t = Tournament.objects.create(name="WS", start_date=timezone.now())
     a = make_team("A"); b = make_team("B")
     m = Match.objects.create(tournament=t, team_a=a, team_b=b)
+    sent = []
 
     class AsyncLayer:
         async def group_send(self, group, payload): 
-            assert "bracket_update" in payload["type"]
-    monkeypatch.setattr(V, "get_channel_layer", lambda: AsyncLayer())
-    V.send_ws_update(m)
+            sent.append(payload["type"])
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: AsyncLayer())
+    with django_capture_on_commit_callbacks(execute=True):
+        V.send_ws_batch(t.id, [m])
 
     class SyncLayer:
         def group_send(self, group, payload):
-            assert "bracket_update" in payload["type"]
-    monkeypatch.setattr(V, "get_channel_layer", lambda: SyncLayer())
-    V.send_ws_update(m) 
+            sent.append(payload["type"])
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: SyncLayer())
+    with django_capture_on_commit_callbacks(execute=True):
+        V.send_ws_batch(t.id, [m])
+        V.send_ws_batch(t.id, [])
+    assert sent == ["bracket_batch_update", "bracket_batch_update"]
 
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
@@ -401,7 +462,7 @@ def test_register_team_no_more_slots_branch(make_team):
     assert r.status_code == 302 and reverse("tournaments:overview", args=[t.id]) in r["Location"]
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
-def test_match_detail_post_with_code_calls_ban_and_builds_final_map(make_team, monkeypatch):
+def test_match_detail_post_with_code_calls_ban_and_builds_final_map(make_team, monkeypatch, django_capture_on_commit_callbacks):
     a = make_team("A"); b = make_team("B")
     t = Tournament.objects.create(name="MD", start_date=timezone.now())
     m = Match.objects.create(tournament=t, team_a=a, team_b=b)
@@ -416,18 +477,20 @@ def test_match_detail_post_with_code_calls_ban_and_builds_final_map(make_team, m
         return True
     monkeypatch.setattr(Match, "ban_map", _ban)
 
+    sent = []
     class DummyLayer:
         async def group_send(self, group, payload):
-            assert payload.get("type") == "match_update"
-            return None
+            sent.append(payload.get("type"))
 
-    monkeypatch.setattr(V, "get_channel_layer", lambda: DummyLayer())
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: DummyLayer())
     from django.test import Client
     c = Client()
     c.force_login(a.captain)
 
-    r = c.post(reverse("tournaments:match_detail", args=[t.id, m.id]), data={"code": chosen})
+    with django_capture_on_commit_callbacks(execute=True):
+        r = c.post(reverse("tournaments:match_detail", args=[t.id, m.id]), data={"code": chosen})
     assert r.status_code == 302 and reverse("tournaments:match_detail", args=[t.id, m.id]) in r["Location"]
+    assert sent == ["veto_state"]
 
 @override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
 def test_match_detail_get_builds_final_map_tuple(make_team):
@@ -461,7 +524,7 @@ def test_match_detail_post_without_code_skips_ban_block(monkeypatch, make_team):
     m = Match.objects.create(tournament=t, team_a=a, team_b=b)
     class DummyLayer:
         async def group_send(self, *a, **k): pass
-    monkeypatch.setattr(V, "get_channel_layer", lambda: DummyLayer())
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: DummyLayer())
 
     from django.test import Client
     c = Client(); c.force_login(a.captain)
@@ -566,4 +629,46 @@ def test_tournament_settings_bo_field_name_missing_skips_setattr(monkeypatch):
     assert r.status_code == 302
 
     t.refresh_from_db()
-    assert t.max_teams == 4
\ No newline at end of file
+    assert t.max_teams == 4
+
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_tournament_bracket_get_is_read_only(make_team):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    t = Tournament.objects.create(name="RO", start_date=timezone.now())
+    a = make_team("A"); b = make_team("B")
+    Match.objects.create(tournament=t, round=1, slot=0, team_a=a, team_b=b, status="finished", winner=a)
+    final = Match.objects.create(tournament=t, round=2, slot=0)
+
+    u = User.objects.create_user("viewer", password="x")
+    c = Client(); c.force_login(u)
+    with CaptureQueriesContext(connection) as ctx:
+        r = c.get(reverse("tournaments:bracket", args=[t.id]))
+    assert r.status_code == 200
+    writes = [q["sql"] for q in ctx.captured_queries if q["sql"].lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE"))]
+    assert [w for w in writes if "tournaments_" in w] == []
+    final.refresh_from_db()
+    assert final.team_a_id is None
+
+
+@override_settings(TEMPLATES=TEMPLATES_OVERRIDE)
+def test_send_ws_batch_renders_once_and_ships_structured_match(monkeypatch, make_team, django_capture_on_commit_callbacks):
+    t = Tournament.objects.create(name="WS1", start_date=timezone.now())
+    a = make_team("A"); b = make_team("B")
+    m = Match.objects.create(tournament=t, team_a=a, team_b=b, score_a=7)
+
+    sent = []
+    class SyncLayer:
+        def group_send(self, group, payload):
+            sent.append((group, payload))
+    monkeypatch.setattr("tournaments.publisher.get_channel_layer", lambda: SyncLayer())
+    with django_capture_on_commit_callbacks(execute=True):
+        V.send_ws_batch(t.id, [m])
+
+    group, payload = sent[0]
+    assert group == f"tournament_{t.id}"
+    update, = payload["updates"]
+    assert update["html"] == f"<div>MATCH {m.id}</div>"
+    assert update["match"]["score_a"] == 7
+    assert update["match"]["team_a"]["name"] == "A"
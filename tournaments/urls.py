@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .api_views import TournamentListAPIView, TournamentDetailAPIView, ReportMatchAPIView
+from .api_views import TournamentListAPIView, TournamentDetailAPIView, TournamentMatchesAPIView, ReportMatchAPIView
 
 app_name = "tournaments"
 
@@ -22,8 +22,10 @@ urlpatterns = [
     path("<int:pk>/matches/<int:match_id>/veto/", views.match_veto, name="match_veto"),
     path('api/tournaments/', TournamentListAPIView.as_view(), name='api_tournament_list'),
     path('api/tournaments/<int:pk>/', TournamentDetailAPIView.as_view(), name='api_tournament_detail'),
+    path('api/tournaments/<int:pk>/matches/', TournamentMatchesAPIView.as_view(), name='api_tournament_matches'),
     path('api/tournaments/<int:pk>/report/', ReportMatchAPIView.as_view(), name='api_report_match'),
     path("<int:pk>/settings/", views.tournament_settings, name="settings"),
+    path("ops/metrics/", views.ops_metrics, name="ops_metrics"),
 
 ]
 
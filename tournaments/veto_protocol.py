@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+
+from django.template.loader import render_to_string
+from .models import MAP_POOL
+from .services import get_available_maps
+
+# Bump when the shape of the veto_state message changes; clients that don't know
+# the version ask for the HTML fragments instead.
+VETO_PROTOCOL_VERSION = 1
+
+ALL_MAPS_MASK = (1 << len(MAP_POOL)) - 1
+
+
+def final_map_code(match) -> str | None:
+    if match.final_map_code:
+        return match.final_map_code
+    left = match.unbanned_map_codes()
+    return left[0] if len(left) == 1 else None
+
+
+def veto_state(match) -> dict:
+    """Compact veto snapshot; map bits follow MAP_POOL order, as in Match.banned_mask."""
+    final = final_map_code(match)
+    current = None if final else match.current_team
+    return {
+        "v": VETO_PROTOCOL_VERSION,
+        "match_id": match.id,
+        "state": match.veto_state,
+        "bans": [list(b) for b in match.map_bans.order_by("order").values_list("map_name", "team_id", "action")],
+        "available": 0 if final else ALL_MAPS_MASK & ~match.banned_mask,
+        "turn": current.id if current else None,
+        "deadline": int(match.veto_deadline.timestamp() * 1000) if match.veto_deadline else None,
+        "final_map": final,
+        "server": match.server_addr or None,
+    }
+
+
+def build_match_update(match) -> dict:
+    """HTML fragments for clients that don't speak the veto_state protocol."""
+    available_codes = get_available_maps(match)
+    code = match.final_map_code
+    if not code and len(available_codes) == 1:
+        code = available_codes[0]
+
+    final_map = None
+    if code:
+        label = dict(MAP_POOL).get(code, code)
+        final_map = (code, label)
+
+    bans = list(match.map_bans.select_related("team").order_by("order"))
+    current_team = match.team_a if (match.ban_count % 2 == 0) else match.team_b
+    ctx = {
+        "tournament": match.tournament,
+        "match": match,
+        "bans": bans,
+        "map_pool": MAP_POOL,
+        "available_codes": available_codes,
+        "final_map": final_map,
+        "current_team": current_team,
+    }
+    return {
+        "type": "match_update",
+        "html": render_to_string("tournaments/match_detail_inner.html", ctx),
+        "veto_html": render_to_string("tournaments/_veto_panel.html", ctx),
+        "show_veto_btn": bool(final_map),
+    }
+
+
+def veto_state_event(match) -> dict:
+    """The group event for a veto change: just the compact state. Subscribers that
+    need markup take it from ``fragment_cache``."""
+    return {"type": "veto_state", "state": veto_state(match)}
+
+
+def fragment_key(match_id, state: dict) -> tuple:
+    # Everything the fragments show that can change between two events.
+    return (match_id, len(state.get("bans") or ()), state.get("state"), state.get("deadline"))
+
+
+class FragmentCache:
+    """Rendered ``build_match_update`` fragments, one per veto step and process.
+
+    A change fanned out to many legacy subscribers (and the final-map markup every
+    protocol subscriber gets) is rendered by whichever of them asks first; the
+    rest wait for it and reuse the result.
+    """
+
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.renders = 0
+        self.hits = 0
+
+    def peek(self, key) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is None:
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def get(self, key, match) -> dict:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [threading.Lock(), None]
+                if len(self._entries) > self.MAX_ENTRIES:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = build_match_update(match)
+                with self._lock:
+                    self.renders += 1
+            else:
+                with self._lock:
+                    self.hits += 1
+            return entry[1]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.renders = 0
+            self.hits = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"renders": self.renders, "hits": self.hits, "entries": len(self._entries)}
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .db_executor import db_sync_to_async
+from .models import Match
+from .replay import stamp
+from .veto_protocol import veto_state_event
+
+logger = logging.getLogger(__name__)
+
+# auto_ban_if_expired treats the deadline itself as still open, so fire just after it.
+GRACE_SECONDS = 0.05
+# A failed expiry (e.g. a locked database) is retried this much later.
+RETRY_SECONDS = 1.0
+
+
+def running_deadline(match) -> timezone.datetime | None:
+    if match is None or match.veto_state != "running":
+        return None
+    return match.veto_deadline
+
+
+def _load_match(match_id: int) -> Match | None:
+    return Match.objects.select_related("team_a", "team_b").filter(pk=match_id).first()
+
+
+class VetoScheduler:
+    """Owns veto expiry for the matches this process serves: one timer per match, armed
+    for the current ``veto_deadline``, which applies the auto-ban and broadcasts it."""
+
+    def __init__(self):
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def __contains__(self, match_id: int) -> bool:
+        task = self._tasks.get(match_id)
+        return task is not None and not task.done()
+
+    def schedule(self, match_id: int, deadline: timezone.datetime | None):
+        task = self._tasks.pop(match_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        if deadline is not None:
+            self._tasks[match_id] = asyncio.create_task(self._fire_at(match_id, deadline))
+
+    async def ensure(self, match_id: int):
+        if match_id in self:
+            return
+        match = await db_sync_to_async(_load_match)(match_id)
+        if match_id not in self:
+            self.schedule(match_id, running_deadline(match))
+
+    async def _fire_at(self, match_id: int, deadline: timezone.datetime):
+        delay = (deadline - timezone.now()).total_seconds() + GRACE_SECONDS
+        await asyncio.sleep(max(delay, 0))
+        try:
+            match = await db_sync_to_async(_load_match)(match_id)
+            if match is not None and await db_sync_to_async(match.auto_ban_if_expired)():
+                group = f"match_{match_id}"
+                event = await db_sync_to_async(lambda: stamp(group, veto_state_event(match)))()
+                await get_channel_layer().group_send(group, event)
+        except Exception:
+            logger.exception("Veto expiry failed for match %s, retrying", match_id)
+            self.schedule(match_id, timezone.now() + timezone.timedelta(seconds=RETRY_SECONDS))
+            return
+        self.schedule(match_id, running_deadline(match))
+
+
+veto_scheduler = VetoScheduler()
@@ -1,32 +1,68 @@
-import inspect
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib import messages
 from django.urls import reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.db import transaction
+from django.db.models import Exists, IntegerField, OuterRef, Q, Subquery, Value
 from django.template.loader import render_to_string
 from django.templatetags.static import static
-from .models import Tournament, TournamentTeam, Match, MapBan, MAP_POOL
+from .models import BanResult, Tournament, TournamentTeam, Match, MAP_POOL, RegistrationResult
 from teams.models import Team
 from .forms import TournamentForm, TournamentSettingsForm
-from .services import generate_full_bracket, set_match_result, update_bracket_progression, get_available_maps, get_final_map, perform_ban
+from .services import generate_full_bracket, set_match_result, update_bracket_progression, advance_bracket, get_final_map
 from .permissions import staff_or_tadmin
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from datetime import timedelta
+from .snapshots import get_bracket_snapshot, serialize_match
+from .db_executor import consumer_db_executor
+from .instrumentation import query_stats
+from .veto_protocol import fragment_cache, veto_state_event
+from .publisher import publish, publisher
+from .ratelimit import frame_limiter
+from .replay import current_seq
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlencode
 from django.views.decorators.http import require_POST
 from django.conf import settings
-from django.db.models import Max
 
 def staff_required(fn):
     return user_passes_test(lambda u: u.is_staff)(fn)
 
 def _can_manage(user, tournament: Tournament) -> bool:
-    return user.is_authenticated and (
-        user.is_staff or tournament.admins.filter(id=user.id).exists()
+    if not user.is_authenticated:
+        return False
+    is_admin = getattr(tournament, "user_is_admin", None)
+    if is_admin is None:
+        is_admin = tournament.admins.filter(id=user.id).exists()
+    return user.is_staff or is_admin
+
+def _hero_queryset(user):
+    qs = Tournament.objects.all()
+    if not user.is_authenticated:
+        return qs.annotate(
+            user_is_admin=Value(False),
+            user_is_captain=Value(False),
+            user_team_id=Value(None, output_field=IntegerField()),
+        )
+    return qs.annotate(
+        user_is_admin=Exists(
+            Tournament.admins.through.objects.filter(tournament_id=OuterRef("pk"), user_id=user.id)
+        ),
+        user_is_captain=Exists(Team.objects.filter(captain_id=user.id)),
+        user_team_id=Subquery(
+            TournamentTeam.objects
+            .filter(tournament_id=OuterRef("pk"), team__captain_id=user.id)
+            .values("team_id")[:1]
+        ),
     )
 
+def _get_tournament(request, pk) -> Tournament:
+    """Tournament for the tab views, annotated with what the header needs about
+    ``request.user`` (see _hero_ctx/_can_manage); loaded once per request."""
+    loaded = request.__dict__.setdefault("_hero_tournaments", {})
+    if pk not in loaded:
+        loaded[pk] = get_object_or_404(_hero_queryset(request.user), pk=pk)
+    return loaded[pk]
+
 @staff_required
 def tournament_create(request):
     if request.method == "POST":
@@ -44,14 +80,54 @@ def tournament_create(request):
         "title": "Create tournament",
     })
 
+TOURNAMENT_PAGE_SIZE = 20
+
+def _list_cursor(t: Tournament) -> str:
+    delta = t.start_date - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return f"{delta // timedelta(microseconds=1)}_{t.pk}"
+
+def _parse_list_cursor(raw: str):
+    micros, _, pk = raw.partition("_")
+    try:
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
 def tournament_list(request):
-    tournaments = Tournament.objects.all().order_by("-start_date")
-    return render(request, "tournaments/tournament_list.html", {"tournaments": tournaments})
+    """Newest first, paged by seeking past the last (start_date, id) shown so
+    every page costs the same no matter how far back it is."""
+    status = request.GET.get("status")
+    if status not in dict(Tournament.STATUS_CHOICES):
+        status = None
+    tournaments = Tournament.objects.order_by("-start_date", "-id")
+    if status:
+        tournaments = tournaments.filter(status=status)
+    cursor = _parse_list_cursor(request.GET.get("after", ""))
+    if cursor:
+        start_date, pk = cursor
+        tournaments = tournaments.filter(Q(start_date__lt=start_date) | Q(start_date=start_date, pk__lt=pk))
+
+    page = list(tournaments[:TOURNAMENT_PAGE_SIZE + 1])
+    next_url = None
+    if len(page) > TOURNAMENT_PAGE_SIZE:
+        page = page[:TOURNAMENT_PAGE_SIZE]
+        query = {"after": _list_cursor(page[-1]), **({"status": status} if status else {})}
+        next_url = f"{reverse('tournaments:list')}?{urlencode(query)}"
+
+    ctx = {
+        "tournaments": page,
+        "next_url": next_url,
+        "status": status,
+        "status_choices": Tournament.STATUS_CHOICES,
+    }
+    if request.headers.get("HX-Request") == "true":
+        return render(request, "tournaments/_tournament_page.html", ctx)
+    return render(request, "tournaments/tournament_list.html", ctx)
 
 def tournament_overview(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     participants = t.participants.select_related("team")
-    registered_count = participants.count()
+    registered_count = t.participants_count
     ready_count = registered_count
     registered_pct = int(registered_count / t.max_teams * 100) if t.max_teams else 0
     start = t.start_date
@@ -81,36 +157,16 @@ def tournament_overview(request, pk):
 
 @login_required
 def tournament_bracket(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
-    update_bracket_progression(t)
-    matches = (
-        t.matches
-         .select_related("team_a", "team_b", "winner")
-         .order_by("round", "id")
-    )
-    by_round = {}
-    for m in matches:
-        by_round.setdefault(m.round, []).append(m)
-    max_round = matches.aggregate(m=Max("round"))["m"] or 1
-    def _round_label(r: int, max_r: int) -> str:
-        dist = max_r - r 
-        if dist == 0:
-            return "Final"
-        if dist == 1:
-            return "Semi finals"
-        if dist == 2:
-            return "Quarter finals"
-        size = 2 ** (dist + 1) 
-        return f"Round of {size}"
-    rounds = [
-        {"num": r, "label": _round_label(r, max_round), "matches": by_round.get(r, [])}
-        for r in sorted(by_round.keys())
-    ]
+    t = _get_tournament(request, pk)
+    ws_seq = current_seq(f"tournament_{t.pk}")
+    snapshot = get_bracket_snapshot(t)
     ctx = {
         "tournament": t,
         "active_tab": "bracket",
         "can_manage": _can_manage(request.user, t),
-        "rounds": rounds, 
+        "rounds": snapshot["rounds"],
+        "bracket_version": snapshot["version"],
+        "ws_seq": ws_seq,
     }
     ctx.update(_hero_ctx(request, t))
     return render(request, "tournaments/bracket.html", ctx)
@@ -118,21 +174,13 @@ def tournament_bracket(request, pk):
 def _hero_ctx(request, t):
     cover_url = t.cover.url if getattr(t, "cover", None) else static("img/tournaments/default.jpg")
     logo_url  = t.logo.url  if getattr(t, "logo",  None) else static("img/tournaments/logo.jpg")
-    captain_teams = (
-        request.user.captain_teams.all()
-        if request.user.is_authenticated
-        else Team.objects.none()
-    )
-    registered_count = t.participants.count()
-    can_join = (request.user.is_authenticated and t.is_open_for_registration and captain_teams.exists() and (registered_count < t.max_teams))
-    user_team_ids = set(captain_teams.values_list("id", flat=True))
-    already_registered = t.participants.filter(team_id__in=user_team_ids).exists() if user_team_ids else False
-    if already_registered:
-        can_join = False
+    already_registered = t.user_team_id is not None
+    can_join = t.user_is_captain and not already_registered and t.is_open_for_registration
     return {
         "cover_url": cover_url,
         "logo_url": logo_url,
-        "captain_teams": captain_teams.order_by("name"),
+        # Only the join modal lists them, and it can't be opened unless can_join.
+        "captain_teams": request.user.captain_teams.order_by("name") if can_join else Team.objects.none(),
         "can_join": can_join,
         "already_registered": already_registered,
     }
@@ -151,12 +199,12 @@ def toggle_registration(request, pk):
 @staff_or_tadmin
 @require_POST
 def start_tournament(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     if t.status == "running":
         return redirect("tournaments:bracket", pk=pk)
 
     min_teams = getattr(settings, "TOURNAMENT_MIN_TEAMS", 4)
-    if t.participants.count() < min_teams:
+    if t.participants_count < min_teams:
         messages.error(request, f"You need at least {min_teams} teams to start the tournament.")
         form = TournamentSettingsForm(instance=t)
         for name in ("start_date", "end_date"):
@@ -184,7 +232,7 @@ def start_tournament(request, pk):
 
 @login_required
 def tournament_matches(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     matches = (
         t.matches
          .select_related("team_a", "team_b")
@@ -201,7 +249,7 @@ def tournament_matches(request, pk):
 
 @login_required
 def tournament_teams(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     participants = t.participants.select_related("team", "team__captain").order_by("team__name")
     ctx = {
         "tournament": t,
@@ -214,7 +262,7 @@ def tournament_teams(request, pk):
 
 @login_required
 def tournament_results(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     matches = (
         t.matches
          .filter(status="finished")
@@ -232,7 +280,7 @@ def tournament_results(request, pk):
 
 @login_required
 def tournament_settings(request, pk):
-    t = get_object_or_404(Tournament, pk=pk)
+    t = _get_tournament(request, pk)
     if not _can_manage(request.user, t):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
@@ -304,8 +352,7 @@ def generate_tournament_bracket(request, pk):
     t = get_object_or_404(Tournament, pk=pk)
     generate_full_bracket(t)
     messages.success(request, "Bracket generated")
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
+    publish(
         f"tournament_matches_{t.id}",
         {
             "type": "matches_update",
@@ -315,19 +362,20 @@ def generate_tournament_bracket(request, pk):
     )
     return redirect("tournaments:bracket", pk=pk)
 
-def send_ws_update(match):
-    channel_layer = get_channel_layer()
-    payload = {
-        "type": "bracket_update",
+def _match_update(match):
+    return {
         "match_id": match.id,
         "html": render_to_string("tournaments/_match.html", {"match": match}),
+        "match": serialize_match(match),
     }
-    group = f"tournament_{match.tournament_id}"
 
-    if inspect.iscoroutinefunction(channel_layer.group_send):
-        async_to_sync(channel_layer.group_send)(group, payload)
-    else:
-        channel_layer.group_send(group, payload)
+def send_ws_batch(tournament_id, matches):
+    if not matches:
+        return
+    publish(
+        f"tournament_{tournament_id}",
+        {"type": "bracket_batch_update", "updates": [_match_update(m) for m in matches]},
+    )
 
 @staff_or_tadmin
 def report_match_result(request, pk, match_id):
@@ -359,12 +407,15 @@ def report_match_result(request, pk, match_id):
         messages.error(request, "Invalid score format")
         return redirect("tournaments:matches", pk=pk)
 
-    set_match_result(m, a, b)
-    m.refresh_from_db()
-    update_bracket_progression(t)
-    updated_matches = t.matches.all().select_related("team_a", "team_b", "winner")
-    for mm in updated_matches:
-        send_ws_update(mm)
+    # One transaction: a saved result is never left un-advanced.
+    with transaction.atomic():
+        set_match_result(m, a, b)
+        m.refresh_from_db()
+        changed_ids = [m.pk] + [c.pk for c in advance_bracket(m)]
+    send_ws_batch(
+        t.id,
+        t.matches.filter(pk__in=changed_ids).select_related("team_a", "team_b", "winner"),
+    )
     if is_htmx:
         resp = HttpResponse(status=204)
         resp["HX-Trigger"] = "match-updated"
@@ -380,13 +431,10 @@ def register_team(request, pk, team_id):
     if team.captain != request.user:
         messages.error(request, "Only the captain can register a team")
         return redirect("tournaments:overview", pk=pk)
-    if not t.is_open_for_registration:
-        messages.error(request, "Registration is closed")
-        return redirect("tournaments:overview", pk=pk)
-    if t.participants.count() >= t.max_teams:
-        messages.error(request, "No more slots available")
+    result = t.register_team(team)
+    if result is not RegistrationResult.REGISTERED:
+        messages.error(request, result.label)
         return redirect("tournaments:overview", pk=pk)
-    TournamentTeam.objects.get_or_create(tournament=t, team=team)
     url = reverse("tournaments:overview", args=[pk])
     return redirect(f"{url}?joined={team.id}")
 
@@ -396,9 +444,11 @@ def match_detail(request, pk, match_id):
     tournament = get_object_or_404(Tournament, pk=pk)
     match = get_object_or_404(Match, pk=match_id, tournament=tournament)
 
+    changed = False
     if match.veto_state == "idle" and match.team_a_id and match.team_b_id:
         match.start_veto()
-    match.auto_ban_if_expired()
+        changed = True
+    # Expired turns are left to veto_scheduler, which auto-bans and broadcasts them.
 
     if request.method == "POST":
         code = (
@@ -409,42 +459,12 @@ def match_detail(request, pk, match_id):
             or request.GET.get("map")
             or request.GET.get("code")
         )
+        if code and match.ban_map(code, match.current_team, action="ban"):
+            changed = True
 
-        if code:
-            match.auto_ban_if_expired()
-            team = match.current_team
-            if team and code in match.available_map_codes():
-                match.ban_map(code, team, action="ban")
-
-        final_map = None
-        if match.final_map_code:
-            final_map = (
-                match.final_map_code,
-                dict(MAP_POOL).get(match.final_map_code, match.final_map_code),
-            )
-        deadline_ts = int(match.veto_deadline.timestamp() * 1000) if match.veto_deadline else None
-
-        html = render_to_string(
-            "tournaments/match_detail_inner.html",
-            {
-                "tournament": tournament,
-                "match": match,
-                "bans": match.map_bans.select_related("team").order_by("order"),
-                "map_pool": MAP_POOL,
-                "available_codes": match.available_map_codes(),
-                "final_map": final_map,
-                "current_team": match.current_team if not final_map else None,
-                "deadline_ts": deadline_ts,
-                "server_addr": match.server_addr or "192.168.1.56:27015",
-                "connect_cmd": f"connect {match.server_addr or '192.168.1.56:27015'}",
-                "request": request,
-            },
-        )
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"match_{match.id}",
-            {"type": "match_update", "html": html},
-        )
+    if changed:
+        publish(f"match_{match.id}", veto_state_event(match))
+    if request.method == "POST":
         return redirect("tournaments:match_detail", pk=pk, match_id=match_id)
 
     final_map = None
@@ -454,6 +474,7 @@ def match_detail(request, pk, match_id):
             dict(MAP_POOL).get(match.final_map_code, match.final_map_code),
         )
     deadline_ts = int(match.veto_deadline.timestamp() * 1000) if match.veto_deadline else None
+    ws_seq = current_seq(f"match_{match.id}")
 
     return render(
         request,
@@ -471,42 +492,16 @@ def match_detail(request, pk, match_id):
             "server_addr": match.server_addr or "192.168.1.56:27015",
             "connect_cmd": f"connect {match.server_addr or '192.168.1.56:27015'}",
             "can_manage": _can_manage(request.user, tournament),
+            "ws_seq": ws_seq,
         },
     )
 
-def get_available_maps(match: Match):
-    banned = set(match.map_bans.values_list("map_name", flat=True))
-    return [(code, label) for code, label in MAP_POOL if code not in banned]
-
-def get_final_map(match: Match):
-    available = get_available_maps(match) 
-    if len(available) == 1:
-        return available[0]
-    return None
-
-def perform_ban(match: Match, team: Team, map_name: str) -> bool:
-    available_codes = [code for code, _ in get_available_maps(match)]
-    if map_name not in available_codes:
-        return False
-    MapBan.objects.create(
-        match=match,
-        team=team,
-        map_name=map_name,
-        order=match.map_bans.count() + 1,
-    )
-    return True
-
 @login_required
 def match_veto(request, pk, match_id):
     tournament = get_object_or_404(Tournament, pk=pk)
-    match = get_object_or_404(Match, pk=match_id, tournament=tournament)
-    available = get_available_maps(match)
-    available_codes = [x[0] if isinstance(x, (list, tuple)) else x for x in available]
+    match = get_object_or_404(Match.objects.select_related("team_a", "team_b"), pk=match_id, tournament=tournament)
     final_map = get_final_map(match)
-    ban_order = match.map_bans.count()
-    current_team = None
-    if not final_map and match.team_a and match.team_b:
-        current_team = match.team_a if ban_order % 2 == 0 else match.team_b
+    current_team = None if final_map else match.current_team
 
     if request.method == "POST" and not final_map:
         map_choice = request.POST.get("map_name")
@@ -514,11 +509,15 @@ def match_veto(request, pk, match_id):
             messages.error(request, "Select a map")
             return redirect("tournaments:match_veto", pk=pk, match_id=match.id)
 
-        if current_team and request.user == current_team.captain:
-            if perform_ban(match, current_team, map_choice):
+        if current_team and request.user.pk == current_team.captain_id:
+            if match.veto_state == "idle":
+                match.start_veto()
+            result = match.apply_ban(map_choice, current_team)
+            if result is BanResult.APPLIED:
                 messages.success(request, f"Map {map_choice} banned")
+                publish(f"match_{match.id}", veto_state_event(match))
             else:
-                messages.error(request, "This map is already unavailable")
+                messages.error(request, result.label)
         else:
             messages.error(request, "It’s not your turn to ban a map")
 
@@ -529,8 +528,7 @@ def match_veto(request, pk, match_id):
         {
             "tournament": tournament,
             "match": match,
-            "available_maps": available,
-            "available_codes": available_codes,
+            "available_codes": match.available_map_codes(),
             "bans": match.map_bans.select_related("team"),
             "final_map": final_map,
             "map_pool": MAP_POOL,
@@ -541,3 +539,12 @@ def match_veto(request, pk, match_id):
     )
     return HttpResponse(html)
 
+@staff_required
+def ops_metrics(request):
+    return JsonResponse({
+        "consumer_db_pool": consumer_db_executor.stats(),
+        "ws_publisher": publisher.stats(),
+        "ws_frames": frame_limiter.stats(),
+        "queries": query_stats.stats(),
+        "veto_fragments": fragment_cache.stats(),
+    })